@@ -0,0 +1,388 @@
+"""
+Compression benchmark: every algorithm in `algorithms` at several levels over reproducible synthetic corpora
+
+Each case runs in a fresh process, so peak RSS isn't inflated by previous cases
+
+python bench_sputchedtools.py -o bench_output.json
+python bench_sputchedtools.py --compare old.json new.json
+python bench_sputchedtools.py --images 100000
+python bench_sputchedtools.py --cdc
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from src.sputchedtools import algorithms, compress, decompress, compress_images_2d, decompress_images_2d, content_chunks, Codec, __version__
+
+levels = {
+	'gzip': [1, 6, 9],
+	'bzip2': [1, 9],
+	'bzip3': [None],
+	'lzma2': [0, 6, 9],
+	'deflate': [1, 6, 9],
+	'lz4': [0, 9, 16],
+	'zstd': [1, 3, 19],
+	'brotli': [1, 6, 11],
+}
+
+words = [
+	'lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do',
+	'eiusmod', 'tempor', 'incididunt', 'ut', 'labore', 'et', 'dolore', 'magna', 'aliqua', 'enim',
+	'minim', 'veniam', 'quis', 'nostrud', 'exercitation', 'ullamco', 'laboris', 'nisi', 'aliquip', 'commodo',
+]
+
+def text_corpus(size: int, rng: random.Random) -> bytes:
+	out, length = [], 0
+
+	while length < size:
+		line = ' '.join(rng.choices(words, k = rng.randint(5, 20))).capitalize() + '.\n'
+		out.append(line)
+		length += len(line)
+
+	return ''.join(out).encode()[:size]
+
+def json_corpus(size: int, rng: random.Random) -> bytes:
+	out, length, i = [], 0, 0
+
+	while length < size:
+		record = json.dumps({
+			'id': i,
+			'name': rng.choice(words) + str(rng.randint(0, 9999)),
+			'score': round(rng.random() * 100, 3),
+			'tags': rng.sample(words, 3),
+			'active': rng.random() > 0.5,
+		}) + '\n'
+
+		out.append(record)
+		length += len(record)
+		i += 1
+
+	return ''.join(out).encode()[:size]
+
+def binary_corpus(size: int, rng: random.Random) -> bytes:
+	# Half incompressible noise, half repeated structures
+	blocks, length = [], 0
+	pattern = rng.randbytes(4096)
+
+	while length < size:
+		block = rng.randbytes(4096) if rng.random() < 0.5 else pattern[:rng.randint(512, 4096)] * 2
+		blocks.append(block)
+		length += len(block)
+
+	return b''.join(blocks)[:size]
+
+def tree_corpus(size: int, rng: random.Random, path: str) -> str:
+	# Many small files (~1-8 KB) in nested folders
+	written, i = 0, 0
+
+	while written < size:
+		folder = os.path.join(path, f'dir{i % 16}', f'sub{i % 5}')
+		os.makedirs(folder, exist_ok = True)
+
+		make = text_corpus if i % 3 else json_corpus
+		content = make(rng.randint(1024, 8192), rng)
+
+		with open(os.path.join(folder, f'file{i}.txt'), 'wb') as f:
+			f.write(content)
+
+		written += len(content)
+		i += 1
+
+	return path
+
+corpora = {
+	'text': text_corpus,
+	'json': json_corpus,
+	'binary': binary_corpus,
+	'tree': tree_corpus,
+}
+
+def page_list(kind: str, pages: int, rng: random.Random) -> list[int]:
+	"""Sorted page numbers of `kind`: dense, sparse, grid, mixed"""
+
+	if kind == 'dense':
+		return sorted(rng.sample(range(pages * 5 // 4), pages))
+
+	if kind == 'sparse':
+		out, page = [], 0
+		for _ in range(pages):
+			page += rng.randint(8, 16)
+			out.append(page)
+		return out
+
+	if kind == 'grid':
+		out, page = [], 0
+		while len(out) < pages:
+			out.extend(range(page, page + 4))
+			page += rng.choice((10, 10, 10, 12))
+		return out[:pages]
+
+	out, page = [], 0
+	while len(out) < pages:
+		mode = rng.random()
+		if mode < 0.3:
+			out.extend(range(page, page + rng.randint(2, 50)))
+		elif mode < 0.6:
+			out.extend(p for p in range(page, page + 64) if rng.random() < 0.5)
+		else:
+			out.append(page + rng.randint(0, 100))
+		page = (out[-1] if out else page) + rng.randint(1, 40)
+	return out[:pages]
+
+page_kinds = ('dense', 'sparse', 'grid', 'mixed')
+
+def run_images(pages: int, repeat: int, seed: int, optimize: bool = False) -> list[dict]:
+	"""Times compress_images_2d / decompress_images_2d on `pages`-long lists of every kind"""
+
+	results = []
+
+	for kind in page_kinds:
+		numbers = [page + 1 for page in page_list(kind, pages, random.Random(f'{seed}:{kind}'))]
+		# Default extension is stored implicitly as the complement, so `numbers` go to the other one
+		page_amount = numbers[-1] * 2
+		numbers_set = set(numbers)
+		images = {'jpg': [page for page in range(1, page_amount + 1) if page not in numbers_set], 'png': numbers}
+		compress_times, decompress_times = [], []
+
+		for _ in range(repeat):
+			start = time.perf_counter()
+			data = compress_images_2d(images, page_amount, optimize = optimize)
+			compress_times.append(time.perf_counter() - start)
+
+			start = time.perf_counter()
+			assert decompress_images_2d(data) == images
+			decompress_times.append(time.perf_counter() - start)
+
+		results.append({
+			'kind': kind,
+			'pages': len(numbers),
+			'size_out': len(data),
+			'compress_time': min(compress_times),
+			'decompress_time': min(decompress_times),
+		})
+		print(
+			f"{kind:>7} {len(numbers):>8} pages: {len(data):>8} bytes, "
+			f"{min(compress_times) * 1e3:8.2f} ms comp, {min(decompress_times) * 1e3:8.2f} ms decomp",
+			file = sys.stderr
+		)
+
+	return results
+
+def run_cdc(size: int, repeat: int, seed: int) -> list[dict]:
+	"""Times content_chunks (incremental archive `cdc`) on binary corpus, with numpy and pure Python gear hash"""
+
+	try:
+		import numpy # type: ignore
+	except ImportError:
+		numpy = None
+
+	data = binary_corpus(size, random.Random(f'{seed}:cdc'))
+	results = []
+
+	for backend in ('numpy', 'python'):
+		if backend == 'numpy' and numpy is None:
+			print('numpy: not installed, skipping', file = sys.stderr)
+			continue
+
+		times = []
+		# Hidden numpy makes content_chunks fall back to pure Python loop
+		sys.modules['numpy'] = numpy if backend == 'numpy' else None
+
+		try:
+			for _ in range(repeat):
+				start = time.perf_counter()
+				chunks = sum(1 for _ in content_chunks(io.BytesIO(data)))
+				times.append(time.perf_counter() - start)
+
+		finally:
+			if numpy is None:
+				sys.modules.pop('numpy', None)
+			else:
+				sys.modules['numpy'] = numpy
+
+		results.append({'backend': backend, 'size_in': size, 'chunks': chunks, 'time': min(times), 'mbps': size / min(times) / 1e6})
+		print(f'{backend:>7}: {chunks} chunks, {size / min(times) / 1e6:8.1f} MB/s', file = sys.stderr)
+
+	return results
+
+def peak_rss() -> int | None:
+	"""Peak resident set size of current process, bytes"""
+
+	try:
+		import resource
+		rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+		return rss if sys.platform == 'darwin' else rss * 1024
+
+	except ImportError:
+		try:
+			import psutil # type: ignore
+			return psutil.Process().memory_info().peak_wset
+		except Exception:
+			return None
+
+def run_case(corpus: str, algorithm: str, level: int | None, size: int, repeat: int, seed: int) -> dict:
+	"""Runs single case, meant to be called in a fresh process"""
+
+	rng = random.Random(f'{seed}:{corpus}')
+	temp = None
+
+	if corpus == 'tree':
+		temp = tempfile.mkdtemp(prefix = 'sptbench-')
+		source = tree_corpus(size, rng, os.path.join(temp, 'tree'))
+		size_in = sum(os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(source) for file in files)
+	else:
+		source = corpora[corpus](size, rng)
+		size_in = len(source)
+
+	try:
+		baseline = peak_rss()
+		compress_times, decompress_times = [], []
+
+		for _ in range(repeat):
+			start = time.perf_counter()
+			compressed = compress(source, algorithm = algorithm, output = False, compression_level = level)
+			compress_times.append(time.perf_counter() - start)
+
+			start = time.perf_counter()
+			decompress(compressed, algorithm = algorithm, output = False)
+			decompress_times.append(time.perf_counter() - start)
+
+		compress_time, decompress_time = min(compress_times), min(decompress_times)
+		peak = peak_rss()
+
+		return {
+			'corpus': corpus,
+			'algorithm': algorithm,
+			'level': level,
+			'size_in': size_in,
+			'size_out': len(compressed),
+			'ratio': size_in / len(compressed),
+			'compress_time': compress_time,
+			'decompress_time': decompress_time,
+			'compress_mbps': size_in / compress_time / 1e6,
+			'decompress_mbps': size_in / decompress_time / 1e6,
+			'peak_rss': peak,
+			'peak_rss_delta': peak - baseline if peak is not None and baseline is not None else None,
+		}
+
+	finally:
+		if temp:
+			shutil.rmtree(temp, ignore_errors = True)
+
+def run(
+	selected_corpora: list[str],
+	selected_algorithms: list[str],
+	size: int,
+	repeat: int,
+	seed: int,
+	selected_levels: list[int] | None = None,
+) -> dict:
+	from concurrent.futures import ProcessPoolExecutor
+	import multiprocessing
+
+	results = []
+	context = multiprocessing.get_context('spawn')
+
+	for algorithm in selected_algorithms:
+		if not Codec.is_supported(algorithm):
+			print(f'{algorithm}: not supported, skipping', file = sys.stderr)
+			continue
+
+		for level in selected_levels or levels.get(algorithm, [None]):
+			for corpus in selected_corpora:
+				# max_tasks_per_child isn't available before 3.11, new pool per case instead
+				with ProcessPoolExecutor(1, mp_context = context) as executor:
+					result = executor.submit(run_case, corpus, algorithm, level, size, repeat, seed).result()
+
+				results.append(result)
+				print(
+					f"{algorithm:>8} {str(level):>4} {corpus:>7}: ratio {result['ratio']:7.2f}, "
+					f"{result['compress_mbps']:8.1f} MB/s comp, {result['decompress_mbps']:8.1f} MB/s decomp, "
+					f"peak RSS {(result['peak_rss'] or 0) / 1e6:.1f} MB",
+					file = sys.stderr
+				)
+
+	return {
+		'meta': {
+			'version': __version__,
+			'python': platform.python_version(),
+			'platform': platform.platform(),
+			'machine': platform.machine(),
+			'cpu_count': os.cpu_count(),
+			'size': size,
+			'repeat': repeat,
+			'seed': seed,
+			'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+		},
+		'results': results,
+	}
+
+def compare(old: dict, new: dict, keys: tuple[str, ...] = ('ratio', 'compress_mbps', 'decompress_mbps', 'peak_rss')) -> list[str]:
+	"""Returns lines with relative change of `keys` for cases present in both result files"""
+
+	def key(result: dict) -> tuple:
+		return result['corpus'], result['algorithm'], result['level']
+
+	old_results = {key(result): result for result in old['results']}
+	lines = [f"{old['meta']['version']} -> {new['meta']['version']}"]
+
+	for result in new['results']:
+		if (previous := old_results.get(key(result))) is None:
+			continue
+
+		changes = []
+		for name in keys:
+			before, after = previous.get(name), result.get(name)
+			if before and after is not None:
+				changes.append(f'{name} {(after - before) / before * 100:+6.1f}%')
+
+		corpus, algorithm, level = key(result)
+		lines.append(f'{algorithm:>8} {str(level):>4} {corpus:>7}: ' + ', '.join(changes))
+
+	return lines
+
+def main():
+	parser = argparse.ArgumentParser(description = 'sputchedtools compression benchmark')
+	parser.add_argument('-o', '--output', default = 'bench_output.json', help = 'JSON results file')
+	parser.add_argument('-a', '--algorithms', nargs = '+', default = algorithms)
+	parser.add_argument('-c', '--corpora', nargs = '+', default = list(corpora), choices = list(corpora))
+	parser.add_argument('-l', '--levels', nargs = '+', type = int, help = 'Levels for every algorithm (per-algorithm presets by default)')
+	parser.add_argument('-s', '--size', type = int, default = 8 << 20, help = 'Corpus size, bytes')
+	parser.add_argument('-r', '--repeat', type = int, default = 3, help = 'Runs per case, best time is recorded')
+	parser.add_argument('--seed', type = int, default = 0)
+	parser.add_argument('--images', type = int, metavar = 'PAGES', help = 'Benchmark compress_images_2d on page lists of this length instead')
+	parser.add_argument('--optimize', action = 'store_true', help = 'With --images, use optimize = True encoding')
+	parser.add_argument('--cdc', action = 'store_true', help = 'Benchmark content-defined chunking of `--size` bytes instead')
+	parser.add_argument('--compare', nargs = 2, metavar = ('OLD', 'NEW'), help = 'Print difference between two results files and exit')
+	args = parser.parse_args()
+
+	if args.compare:
+		old, new = (json.load(open(path)) for path in args.compare)
+		print('\n'.join(compare(old, new)))
+		return
+
+	if args.images:
+		run_images(args.images, args.repeat, args.seed, args.optimize)
+		return
+
+	if args.cdc:
+		run_cdc(args.size, args.repeat, args.seed)
+		return
+
+	data = run(args.corpora, args.algorithms, args.size, args.repeat, args.seed, args.levels)
+
+	with open(args.output, 'w') as f:
+		json.dump(data, f, indent = 2)
+
+	print(f'Results written to {args.output}', file = sys.stderr)
+
+if __name__ == '__main__':
+	main()
@@ -1146,6 +1146,118 @@ class BadFilterResult:
 	def __bool__(self):
 		return False
 
+class FetchResult(Object):
+	"""
+	`aio.fetch_many()` result for single url: its index in `urls`, `aio.request()` result (`RequestError` / `BadFilterResult` if failed) and elapsed time
+	"""
+
+	def __init__(self, index: int, url: str, result: Any, elapsed: float = 0.0):
+		self.index = index
+		self.url = url
+		self.result = result
+		self.elapsed = elapsed
+
+	@property
+	def ok(self) -> bool:
+		return not isinstance(self.result, (RequestError, BadFilterResult))
+
+	def __str__(self) -> str:
+		return f"{self.url}: {'ok' if self.ok else self.result} in {Timer.format_output(self.elapsed)}"
+
+class FetchStats(Object):
+	"""
+	`aio.fetch_many()` statistics, updated as results arrive: finished and failed requests, elapsed time and throughput
+	"""
+
+	def __init__(self):
+		self.requests = 0
+		self.failed = 0
+		self.elapsed = 0.0
+		self.requests_per_sec = 0.0
+
+	def update(self, ok: bool, elapsed: float):
+		self.requests += 1
+		self.failed += not ok
+		self.elapsed = elapsed
+
+		if elapsed > 0:
+			self.requests_per_sec = self.requests / elapsed
+
+	def __str__(self) -> str:
+		return f'{self.requests} requests ({self.failed} failed) in {Timer.format_output(self.elapsed)} ({num.decim_round(self.requests_per_sec)} requests/s)'
+
+class CircuitBreaker:
+	"""
+	Per-host circuit breaker for `aio.fuckoff()`, share single instance between calls (or set `aio.breaker`)
+
+	After `threshold` consecutive failures host's circuit opens: requests to it wait `reset_timeout` seconds instead of being sent,
+	then single trial request is let through (half-open) - success closes circuit, failure opens it again
+	"""
+
+	def __init__(self, threshold: int = 5, reset_timeout: float = 30.0):
+		self.threshold = threshold
+		self.reset_timeout = reset_timeout
+		self.hosts: dict[str, list] = {} # host: [consecutive failures, opened at, trial in flight]
+
+	def state(self, host: str) -> Literal['closed', 'open', 'half-open']:
+		from time import monotonic
+
+		entry = self.hosts.get(host)
+		if entry is None or entry[1] is None:
+			return 'closed'
+
+		return 'open' if monotonic() - entry[1] < self.reset_timeout else 'half-open'
+
+	def retry_in(self, host: str) -> float:
+		"""Seconds till request to `host` is allowed, 0 - allowed now (reserves trial request if half-open)"""
+
+		from time import monotonic
+
+		entry = self.hosts.get(host)
+		if entry is None or entry[1] is None:
+			return 0.0
+
+		remaining = entry[1] + self.reset_timeout - monotonic()
+		if remaining > 0:
+			return remaining
+
+		# Other trial is in flight, poll
+		if entry[2]:
+			return min(1.0, self.reset_timeout)
+
+		entry[2] = True
+		return 0.0
+
+	def success(self, host: str):
+		self.hosts.pop(host, None)
+
+	def failure(self, host: str):
+		from time import monotonic
+
+		entry = self.hosts.setdefault(host, [0, None, False])
+		entry[0] += 1
+		entry[2] = False
+
+		if entry[1] is not None or entry[0] >= self.threshold:
+			entry[1] = monotonic()
+
+	def release(self, host: str):
+		"""Releases trial reservation without outcome (e.g. cancelled request)"""
+
+		entry = self.hosts.get(host)
+		if entry:
+			entry[2] = False
+
+async def _session_pool_guard(loop, sessions: dict):
+	"""Parked in loop's async generators, so `asyncio.run()` closes loop's pooled sessions in `shutdown_asyncgens()`"""
+
+	try:
+		yield
+	finally:
+		await aio._close_pool(sessions)
+		if aio._pools.get(loop, (None,))[0] is sessions:
+			del aio._pools[loop]
+
 class aio:
 
 	"""
@@ -1153,10 +1265,129 @@ class aio:
 		- aio.get() - 'GET' wrapper for aio.request
 		- aio.post() - 'POST' wrapper for aio.request
 		- aio.request() - ikyk
+		- aio.session() - Pooled session for url host
+		- aio.close_sessions() - Closes pooled sessions
+		- aio.fetch_many() - Concurrent aio.request over many urls, yields results as they complete
+		- aio.stream() - Response body chunks, optionally decompressed
+		- aio.download() - Streams response body into file, resumable
+		- aio.download_segmented() - Parallel Range requests into single file
 		- aio.open() - aiofiles.open() wrapper
 		- aio.sem_task() - (asyncio.Semaphore, Coroutine) wrapper
 	"""
 
+	pool_limit: int = 100 # Connections per pooled session
+	pool_keepalive: float = 30.0 # Idle keep-alive connection lifetime, seconds
+	pool_max_sessions: int = 64 # Per-host sessions per backend, other hosts share single session
+	breaker: Optional[CircuitBreaker] = CircuitBreaker() # Default `aio.fuckoff()` circuit breaker, shared by all calls (None - disabled)
+
+	# {loop: ({(backend, origin): session}, guard)}
+	_pools: dict = {}
+
+	@staticmethod
+	def _new_session(backend: str):
+		# Pooled sessions are shared between unrelated callers, so they never store cookies.
+		# Per-request `cookies = ...` still work, pass own `session` to keep cookies between requests
+		from http.cookiejar import DefaultCookiePolicy
+
+		if backend == 'httpx':
+			import httpx # type: ignore
+			ses = httpx.AsyncClient(
+				http2 = True,
+				follow_redirects = True,
+				limits = httpx.Limits(
+					max_connections = aio.pool_limit,
+					max_keepalive_connections = aio.pool_limit,
+					keepalive_expiry = aio.pool_keepalive
+				)
+			)
+			ses.cookies.jar.set_policy(DefaultCookiePolicy(allowed_domains = []))
+			return ses
+
+		elif backend == 'niquests':
+			import niquests # type: ignore
+			ses = niquests.AsyncSession(pool_maxsize = aio.pool_limit)
+			ses.cookies.set_policy(DefaultCookiePolicy(allowed_domains = []))
+			return ses
+
+		import aiohttp
+		return aiohttp.ClientSession(
+			connector = aiohttp.TCPConnector(limit = aio.pool_limit, keepalive_timeout = aio.pool_keepalive),
+			cookie_jar = aiohttp.DummyCookieJar()
+		)
+
+	@staticmethod
+	async def _close_session(ses) -> None:
+		if hasattr(ses, 'aclose'): await ses.aclose()
+		else: await ses.close()
+
+	@staticmethod
+	async def _close_pool(sessions: dict) -> None:
+		import asyncio
+
+		pooled = list(sessions.values())
+		sessions.clear()
+		await asyncio.gather(*(aio._close_session(ses) for ses in pooled), return_exceptions = True)
+
+	@staticmethod
+	def _origin(url: str) -> str:
+		from urllib.parse import urlsplit
+		parts = urlsplit(url)
+		return f'{parts.scheme}://{parts.netloc}'.lower()
+
+	@staticmethod
+	async def session(
+		url: str = None,
+		httpx: bool = False,
+		niquests: bool = False,
+	):
+
+		"""
+		Returns running loop's pooled session of backend (aiohttp by default) for `url` scheme and host, creates one if needed
+
+		Sessions stay open between calls, so requests reuse warm connections (DNS, TCP and TLS handshakes are paid once).
+		Limits: `aio.pool_limit`, `aio.pool_keepalive`, `aio.pool_max_sessions`.
+		Closed by `aio.close_sessions()` or automatically when `asyncio.run()` finishes
+		"""
+
+		import asyncio
+
+		loop = asyncio.get_running_loop()
+		pool = aio._pools.get(loop)
+
+		if pool is None:
+			for old in [old for old in aio._pools if old.is_closed()]:
+				del aio._pools[old]
+
+			sessions = {}
+			guard = _session_pool_guard(loop, sessions)
+			await guard.asend(None)
+			pool = aio._pools[loop] = (sessions, guard)
+
+		sessions = pool[0]
+		backend = 'httpx' if httpx else 'niquests' if niquests else 'aiohttp'
+		key = (backend, aio._origin(url) if url else None)
+		ses = sessions.get(key)
+
+		if ses is not None and not (getattr(ses, 'closed', False) or getattr(ses, 'is_closed', False)):
+			return ses
+
+		if ses is None and sum(1 for other, _ in sessions if other == backend) >= aio.pool_max_sessions:
+			return await aio.session(None, httpx, niquests)
+
+		ses = sessions[key] = aio._new_session(backend)
+		return ses
+
+	@staticmethod
+	async def close_sessions() -> None:
+		"""Closes running loop's pooled sessions"""
+
+		import asyncio
+
+		pool = aio._pools.pop(asyncio.get_running_loop(), None)
+		if pool:
+			await aio._close_pool(pool[0])
+			await pool[1].aclose()
+
 	@staticmethod
 	async def request(
 		method: RequestMethods,
@@ -1168,6 +1399,7 @@ class aio:
 		niquests: bool = False,
 		*,
 		filter: Callable[[Any], bool] = None,
+		pool: bool = True,
 		**kwargs,
 	) -> Union[Any, list[Any], RequestError, BadFilterResult]:
 
@@ -1178,6 +1410,7 @@ class aio:
 			- url: str
 
 			- session: httpx/aiohttp Client Session
+			- pool: bool - If no `session`, use `aio.session()` pooled one instead of creating and closing new session per call
 			- toreturn: ReturnTypes - List or Str separated by `+` of response object methods/properties. Pass 'response' as str to return response object
 			- raise_exceptions: bool - Wether to raise occurred exceptions while making request or return list of None (or append to existing items) with same `toreturn` length
 			- filter: Callable - Filters received response right after getting one
@@ -1192,9 +1425,14 @@ class aio:
 
 		"""
 
+		own_session = not session and not pool
+
 		if session:
 			ses = session
 
+		elif pool:
+			ses = await aio.session(url, httpx, niquests)
+
 		else:
 			if httpx:
 				import httpx # type: ignore
@@ -1220,14 +1458,14 @@ class aio:
 		try:
 			response = await ses.request(method, url, **kwargs)
 			if return_response:
-				if not session:
+				if own_session:
 					if httpx: await ses.aclose()
 					else: await ses.close()
 
 				return response
 
 		except Exception as e:
-			if not session:
+			if own_session:
 				if httpx: await ses.aclose()
 				else: await ses.close()
 
@@ -1268,7 +1506,7 @@ class aio:
 
 			return_items.append(result)
 
-		if not session:
+		if own_session:
 			if httpx: await ses.aclose()
 			else: await ses.close()
 
@@ -1298,6 +1536,34 @@ class aio:
 	) -> Union[Any, list[Any], RequestError, BadFilterResult]:
 		return await aio.request('POST', url, session, toreturn, raise_exceptions, httpx, niquests, **kwargs)
 
+	@staticmethod
+	def _retry_after(response) -> Optional[float]:
+		"""`Retry-After` header of response in seconds (delay or HTTP date), None if absent or malformed"""
+
+		headers = getattr(response, 'headers', None)
+		value = headers.get('Retry-After') if headers else None
+
+		if not value:
+			return None
+
+		try:
+			return max(float(value), 0.0)
+		except ValueError:
+			pass
+
+		from email.utils import parsedate_to_datetime
+		from datetime import datetime, timezone
+
+		try:
+			date = parsedate_to_datetime(value)
+		except (TypeError, ValueError):
+			return None
+
+		if date.tzinfo is None:
+			date = date.replace(tzinfo = timezone.utc)
+
+		return max((date - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
 	@staticmethod
 	async def fuckoff(
 		method: RequestMethods,
@@ -1312,20 +1578,91 @@ class aio:
 		retries: int = -1,
 		filter_stop_flag: Any = None,
 		on_iter: Callable = None,
+		backoff: Literal['fixed', 'exponential', 'decorrelated'] = 'exponential',
+		max_interval: float = 60.0,
+		retry_after: Union[bool, float] = True,
+		deadline: Optional[float] = None,
+		breaker: Union[CircuitBreaker, Literal[False], None] = None,
 		**kwargs
 	) -> Union[Any, list[Any], None]:
 
-		import asyncio
+		"""
+		Repeats `aio.request()` until `filter` passes, returns its items.
+		Returns `filter_stop_flag` if filter returned it, None if `retries` or `deadline` ran out
+
+		Delay between attempts (`interval` - base, seconds):
+			- backoff 'fixed': `interval` (callers failing together retry in lockstep)
+			- backoff 'exponential' (default): random in [0, min(`max_interval`, `interval` * 2 ** attempt)] (full jitter)
+			- backoff 'decorrelated': random in [`interval`, previous delay * 3], capped by `max_interval`
+			- retry_after: waits at least response's `Retry-After`, up to `max_interval` (True) or given seconds (float, `float('inf')` - uncapped)
+
+		deadline: seconds for whole call, gives up instead of sleeping past it
+		breaker: `CircuitBreaker` (`aio.breaker` if None, shared by all calls by default; False - disabled) - connection errors,
+			429 and 5xx responses count as host failures, while host's circuit is open no requests are sent.
+			Exceptions raised by `filter` or response processing aren't host failures
+		"""
+
+		if backoff not in ('fixed', 'exponential', 'decorrelated'):
+			raise ValueError(f'Unknown backoff: {backoff}')
+
+		import asyncio, random
+		from time import monotonic
+
+		if breaker is None:
+			breaker = aio.breaker
+		host = aio._origin(url)
+		end = monotonic() + deadline if deadline is not None else None
+
+		base = interval or 0
+		delay = base
+		attempt = 0
+		last = {}
+
+		def capture(response):
+			last['response'] = response
+			return filter(response) if filter else True
+
+		def record(failed: bool, response):
+			status = getattr(response, 'status', getattr(response, 'status_code', None))
+			if failed or (status and (status == 429 or status >= 500)):
+				breaker.failure(host)
+			else:
+				breaker.success(host)
 
 		while retries != 0:
+			if breaker:
+				wait = breaker.retry_in(host)
+
+				if wait:
+					if end is not None and monotonic() + wait >= end:
+						return None
+
+					await asyncio.sleep(wait)
+					continue
+
 			retries -= 1
-			items = await aio.request(
-				method, url, session, toreturn,
-				raise_exceptions,
-				httpx, niquests,
-				filter = filter,
-				**kwargs
-			)
+			last.clear()
+
+			try:
+				items = await aio.request(
+					method, url, session, toreturn,
+					raise_exceptions,
+					httpx, niquests,
+					filter = capture,
+					**kwargs
+				)
+
+			except asyncio.CancelledError:
+				if breaker: breaker.release(host)
+				raise
+
+			except Exception:
+				# Response was received - exception comes from `filter` or response processing, not from host
+				if breaker: record('response' not in last, last.get('response'))
+				raise
+
+			response = last.get('response')
+			if breaker: record(isinstance(items, RequestError), response)
 
 			if isinstance(items, BadFilterResult):
 				if items.orig_val == filter_stop_flag:
@@ -1334,157 +1671,662 @@ class aio:
 			elif not isinstance(items, RequestError):
 				return items
 
-			if interval and retries != 0:
-				await asyncio.sleep(interval)
+			if retries == 0:
+				break
+
+			if backoff == 'exponential':
+				delay = random.uniform(0, min(max_interval, base * 2 ** min(attempt, 32)))
+			elif backoff == 'decorrelated':
+				delay = min(max_interval, random.uniform(base, delay * 3))
+
+			attempt += 1
+			wait = delay
+
+			if retry_after and response is not None:
+				wait = max(wait, min(max_interval if retry_after is True else retry_after, aio._retry_after(response) or 0))
+
+			if end is not None and monotonic() + wait >= end:
+				return None
+
+			if wait:
+				await asyncio.sleep(wait)
 				if on_iter: on_iter()
 
 	@staticmethod
-	async def open(
-		file: str,
-		action: ActionModes = 'read',
-		mode: 'OpenTextMode' = 'r',
-		content = None,
-		**kwargs
-	) -> Union[int, str, bytes]:
+	async def fetch_many(
+		urls: Iterable[str],
+		concurrency: int = 32,
+		per_host: Optional[int] = 8,
+		toreturn: Union[ReturnTypes, Iterable[ReturnTypes]] = 'text',
+		raise_exceptions: bool = False,
+		httpx: bool = False,
+		niquests: bool = False,
+		method: RequestMethods = 'GET',
+		session = None,
+		*,
+		stats: Optional[FetchStats] = None,
+		**kwargs,
+	):
 
 		"""
-		Accepts:
-
-			- file: str - File path
+		Runs `aio.request()` for every url with at most `concurrency` requests in flight, `per_host` of them per scheme://host (None - no host limit).
+		Async generator, yields `FetchResult` as requests complete (not in `urls` order, see `FetchResult.index`).
+		`urls` are consumed lazily, urls of busy hosts wait in a bounded backlog, so other hosts aren't blocked by them.
+
+		Without `session`, requests use `aio.session()` pooled sessions.
+		`stats` - `FetchStats` object, updated with every result.
+		Other arguments are passed to `aio.request()`, its return conventions apply to `FetchResult.result`;
+		with `raise_exceptions` first exception is raised and remaining requests are cancelled
+		"""
 
-			- action: str - Operation to perform ('read' or 'write')
+		import asyncio
+		from collections import deque
+		from time import perf_counter
 
-			- mode: str - File open mode ('r', 'w', 'rb', 'wb', etc.)
+		async def fetch(index: int, url: str) -> FetchResult:
+			start = perf_counter()
+			result = await aio.request(method, url, session, toreturn, raise_exceptions, httpx, niquests, **kwargs)
+			return FetchResult(index, url, result, perf_counter() - start)
 
-			- content: Any - Content to write (required for write operation)
+		urls = enumerate(urls)
+		started = perf_counter()
+		running: dict = {} # task: host
+		active: dict[str, int] = {}
+		backlog: dict[str, deque] = {}
+		backlog_len = 0
+		backlog_limit = concurrency * 4
+		exhausted = False
 
-			- Any other arguments for aiofiles.open()
+		def start(index: int, url: str, host: str):
+			running[asyncio.ensure_future(fetch(index, url))] = host
+			active[host] = active.get(host, 0) + 1
 
-		Returns:
-			- str | bytes: File content if action != 'write'
-			- int: Number of bytes written if action == 'write'
+		def host_free(host: str) -> bool:
+			return not per_host or active.get(host, 0) < per_host
 
-		Raises:
-			ValueError: If trying to write without content
+		def fill():
+			nonlocal backlog_len, exhausted
 
-		"""
+			for host in list(backlog):
+				queue = backlog[host]
+				while queue and len(running) < concurrency and host_free(host):
+					start(*queue.popleft(), host)
+					backlog_len -= 1
 
-		import aiofiles
+				if not queue:
+					del backlog[host]
 
-		async with aiofiles.open(file, mode, **kwargs) as f:
-			if action == 'write':
-				return await f.write(content)
-			else:
-				return await f.read()
+			while not exhausted and len(running) < concurrency and backlog_len < backlog_limit:
+				try:
+					index, url = next(urls)
+				except StopIteration:
+					exhausted = True
+					break
 
-	@staticmethod
-	async def sem_task(
-		semaphore,
-		coro: Coroutine,
-	) -> Any:
+				host = aio._origin(url)
+				if host not in backlog and host_free(host):
+					start(index, url, host)
+				else:
+					backlog.setdefault(host, deque()).append((index, url))
+					backlog_len += 1
 
-		async with semaphore:
-			return await coro
+		try:
+			while True:
+				fill()
+				if not running:
+					break
 
-class pyromisc:
+				done, _ = await asyncio.wait(running, return_when = asyncio.FIRST_COMPLETED)
 
-	@staticmethod
-	def get_md(message) -> Optional[str]:
-		return (message.caption or message.text, 'markdown', None)
+				for task in done:
+					host = running.pop(task)
+					active[host] -= 1
+					result = task.result()
 
-	@staticmethod
-	def get_user_name(user) -> Union[str, int]:
-		if user.username:
-			slug = f'@{user.username}'
+					if stats is not None:
+						stats.update(result.ok, perf_counter() - started)
 
-		elif user.first_name:
-			slug = user.first_name
-			if user.last_name:
-				slug += f' {user.last_name}'
+					yield result
 
-		else:
-			slug = user.id
+		finally:
+			for task in running:
+				task.cancel()
 
-		return slug
+			if running:
+				await asyncio.gather(*running, return_exceptions = True)
 
 	@staticmethod
-	def get_chat_name(chat) -> Union[str, int]:
-		if chat.username:
-			slug = f'@{chat.username}'
+	async def _response_stream(
+		url: str,
+		session,
+		method: RequestMethods,
+		httpx: bool,
+		niquests: bool,
+		chunk_size: int,
+		**kwargs
+	):
+		"""Wrapped in `contextlib.asynccontextmanager`, yields (response, status, async iterator of body chunks) and releases response on exit"""
 
-		elif chat.title:
-			slug = chat.title
+		ses = session or await aio.session(url, httpx, niquests)
 
-		elif chat.first_name:
-			slug = chat.first_name
-			if chat.last_name:
-				slug += f' {chat.last_name}'
+		if httpx:
+			async with ses.stream(method, url, **kwargs) as response:
+				yield response, response.status_code, response.aiter_bytes(chunk_size)
 
-		else:
-			slug = chat.id
+		elif niquests:
+			import inspect
 
-		return slug
+			response = await ses.request(method, url, stream = True, **kwargs)
 
+			try:
+				chunks = response.iter_content(chunk_size)
+				if inspect.isawaitable(chunks):
+					chunks = await chunks
 
-class num:
+				yield response, response.status_code, chunks
 
-	"""
-	Methods:
+			finally:
+				closed = response.close()
+				if inspect.isawaitable(closed):
+					await closed
 
-		- num.shorten() - Shortens float | int value, using expandable / editable num.suffixes dictionary
-			Example: num.shorten(10_000_000, 0) -> '10M'
+		else:
+			async with ses.request(method, url, **kwargs) as response:
+				yield response, response.status, response.content.iter_chunked(chunk_size)
 
-		- num.unshorten() - Unshortens str, using expandable / editable num.multipliers dictionary
-			Example: num.unshorten('1.63k', _round = False) -> 1630.0
+	@staticmethod
+	async def _decompress_chunks(chunks, algorithm: Union[Algorithms, Literal[True]]):
+		"""
+		Decompresses async iterator of chunks on the fly, concatenated streams are decompressed one after another. True - detect algorithm from first bytes
+		Empty body yields nothing, EOFError if body ends inside compressed stream (truncated)
+		"""
 
-		- num.decim_round() - Safely rounds decimals in float
-			Example: num.decim_round(2.000127493, 2, round_if_num_gt_1 = False) -> '2.00013'
+		decompressor = None
+		head = b''
+		done = False
 
-		- num.beautify() - returns decimal-rounded, shortened float-like string
-			Example: num.beautify(4349.567, -1) -> 4.35K
-	"""
+		while not done:
+			try:
+				data = await chunks.__anext__()
+			except StopAsyncIteration:
+				data, done = b'', True
 
-	suffixes: list[Union[str, int]] = ['', 'K', 'M', 'B', 'T', 1000]
-	fileSize_suffixes: list[Union[str, int]] = ['B', 'KB', 'MB', 'GB', 'TB', 1024]
-	sfx = fileSize_suffixes
-	deshorteners: dict[str, int] = {'k': 10**3, 'm': 10**6, 'b': 10**9, 't': 10**12}
-	decims: list[int] = [1000, 100, 10, 5] # List is iterated using enumerate(), so by each iter. decimal amount increases by 1 (starting from 0)
+			if decompressor is None:
+				head += data
 
-	@staticmethod
-	def shorten(
-		value: Union[int, float],
-		decimals: int = -1,
-		round_decimals: bool = False,
-		precission: int = 14,
-		sep: str = '',
-		suffixes: Optional[list[Union[str, int]]] = None
-	) -> str:
+				# Enough for magic, brotli probe isn't waited for
+				if len(head) < 16 and not done:
+					continue
 
-		"""
-		Accepts:
+				if not head:
+					return
 
-			- value: int - big value
-			- decimals: int = -1 - round digit amount
+				if algorithm is True:
+					algorithm = detect_algorithm(head)
 
-			- suffixes: list[str] - Use case: File Size calculation: pass num.fileSize_suffixes
+					if not algorithm or algorithm == 'zip':
+						raise ValueError(f"Couldn't detect streamable compression algorithm. First 10 bytes: {head[:10]}")
 
-		Returns:
-			Shortened float or int-like str
+				decompressor = get_decompressobj(algorithm)
+				data, head = head, b''
 
-		"""
+			while data:
+				if decompressor.eof:
+					decompressor = get_decompressobj(algorithm)
 
-		absvalue = abs(value)
-		suffixes: list[str] = suffixes or num.suffixes
-		magnitude = suffixes[-1]
+				chunk = decompressor.decompress(data)
+				if chunk:
+					yield chunk
 
-		for i, suffix in enumerate(suffixes[:-1]):
-			unit = magnitude ** i
-			if absvalue < unit * magnitude:
-				break
+				data = decompressor.unused_data if decompressor.eof else b''
 
-		value /= unit
-		formatted: str = num.decim_round(value, decimals, round_decimals, precission, decims = [100, 10, 1])
-		return formatted + sep + suffix
+		if not decompressor.eof:
+			raise EOFError(f'Compressed ({algorithm}) body ended before end of stream')
+
+	@staticmethod
+	async def stream(
+		url: str,
+		session = None,
+		chunk_size: int = 1 << 16,
+		decompress: Union[Algorithms, bool, None] = None,
+		httpx: bool = False,
+		niquests: bool = False,
+		method: RequestMethods = 'GET',
+		**kwargs
+	):
+
+		"""
+		Async generator of response body chunks (aiohttp `content.iter_chunked`, httpx `aiter_bytes`), body is never buffered whole
+
+		decompress: algorithm or True (detect by header) - decompresses body on the fly, raises EOFError at the end of truncated body
+		Without `session`, `aio.session()` pooled one is used.
+		Raises backend's HTTP error on 4xx/5xx status
+		"""
+
+		from contextlib import asynccontextmanager
+
+		async with asynccontextmanager(aio._response_stream)(url, session, method, httpx, niquests, chunk_size, **kwargs) as (response, status, chunks):
+			if status >= 400:
+				response.raise_for_status()
+
+			if decompress:
+				chunks = aio._decompress_chunks(chunks, decompress)
+
+			async for chunk in chunks:
+				yield chunk
+
+	@staticmethod
+	async def download(
+		url: str,
+		path: str,
+		session = None,
+		resume: bool = True,
+		decompress: Union[Algorithms, bool, None] = None,
+		chunk_size: int = 1 << 16,
+		httpx: bool = False,
+		niquests: bool = False,
+		method: RequestMethods = 'GET',
+		progress: Optional[ProgressBar] = None,
+		**kwargs
+	) -> str:
+
+		"""
+		Streams response body into `path` through aiofiles (written to `path`.part, renamed once complete), returns `path`
+
+		resume: continues existing `.part` file with `Range: bytes=<size>-` and `Accept-Encoding: identity` request,
+			starts over if server ignores it (200) or answers with other range. Not used with `decompress`, since `.part` holds decompressed bytes
+		decompress: algorithm or True (detect by header) - decompresses body on the fly, EOFError if body is truncated (`path` isn't written)
+		progress: `ProgressBar`, updated with written bytes
+		Raises backend's HTTP error on 4xx/5xx status
+		"""
+
+		import os, re, aiofiles
+		from contextlib import asynccontextmanager
+
+		part = path + '.part'
+		offset = os.path.getsize(part) if resume and not decompress and os.path.isfile(part) else 0
+		headers = dict(kwargs.pop('headers', None) or {})
+
+		if offset:
+			headers['Range'] = f'bytes={offset}-'
+			# `.part` holds decoded body, so Range has to address identity encoding too
+			headers['Accept-Encoding'] = 'identity'
+
+		async with asynccontextmanager(aio._response_stream)(url, session, method, httpx, niquests, chunk_size, headers = headers, **kwargs) as (response, status, chunks):
+			content_range = re.match(r'bytes (\*|(\d+)-\d+)/(\d+|\*)', response.headers.get('Content-Range', ''))
+			restart = False
+
+			if offset and status == 416:
+				# Range starts at the end - .part is complete, otherwise start over
+				restart = not content_range or content_range[3] != str(offset)
+				chunks = None
+
+			elif status >= 400:
+				response.raise_for_status()
+
+			elif offset and (status != 206 or not content_range or content_range[2] != str(offset)):
+				offset = 0
+
+			if chunks is not None:
+				if decompress:
+					chunks = aio._decompress_chunks(chunks, decompress)
+
+				async with aiofiles.open(part, 'ab' if offset else 'wb') as f:
+					async for chunk in chunks:
+						await f.write(chunk)
+						if progress: progress.update(len(chunk))
+
+		if restart:
+			os.remove(part)
+			headers.pop('Range')
+			return await aio.download(url, path, session, False, decompress, chunk_size, httpx, niquests, method, progress, headers = headers, **kwargs)
+
+		os.replace(part, path)
+		return path
+
+	@staticmethod
+	async def download_segmented(
+		url: str,
+		path: str,
+		segments: int = 8,
+		session = None,
+		min_segment_size: int = 1 << 20,
+		checksum: Optional[str] = None,
+		hash_algorithm: str = 'sha256',
+		progress: Optional[ProgressBar] = None,
+		retries: int = 3,
+		chunk_size: int = 1 << 16,
+		write_size: int = 1 << 20,
+		httpx: bool = False,
+		niquests: bool = False,
+		**kwargs
+	) -> str:
+
+		"""
+		Downloads `url` into `path` over `segments` concurrent `Range` requests of shared session (`aio.session()` pooled one by default), returns `path`
+
+		Size is taken from HEAD `Content-Length`, segments are written into preallocated `path`.part with positional writes
+		(buffered up to `write_size`, in thread pool), renamed once size (and `checksum`) is verified.
+		Falls back to single stream `aio.download()` if server doesn't report size, `Accept-Ranges: bytes`
+		or validator for `If-Range` (strong `ETag` or `Last-Modified`), since segments of changed file can't be detected without one
+
+		min_segment_size: smaller files are split into less segments
+		retries: failed segment is requested again from its last written byte
+		checksum: expected `hash_algorithm` (hashlib name) hexdigest of file, ValueError on mismatch
+		progress: `ProgressBar`, updated with written bytes (`task_amount` - file size if not set)
+		"""
+
+		import asyncio, errno, os
+		from contextlib import asynccontextmanager
+		from concurrent.futures import ThreadPoolExecutor
+
+		loop = asyncio.get_running_loop()
+		headers = dict(kwargs.pop('headers', None) or {})
+		# Ranges are offsets in encoded body, so it mustn't be transfer-compressed
+		headers.setdefault('Accept-Encoding', 'identity')
+
+		def verify(file: str, size: Optional[int]):
+			if size is not None and (actual := os.path.getsize(file)) != size:
+				raise ValueError(f'Downloaded size mismatch: {actual} != {size}')
+
+			if checksum:
+				import hashlib
+				hasher = hashlib.new(hash_algorithm)
+
+				with open(file, 'rb') as f:
+					while chunk := f.read(1 << 20):
+						hasher.update(chunk)
+
+				if (digest := hasher.hexdigest()) != checksum.lower():
+					raise ValueError(f'{hash_algorithm} mismatch: {digest} != {checksum}')
+
+		response = await aio.request('HEAD', url, session, 'response', True, httpx, niquests, headers = headers, **kwargs)
+		status = getattr(response, 'status', getattr(response, 'status_code', None))
+		length = response.headers.get('Content-Length', '')
+		etag = response.headers.get('ETag')
+
+		# If-Range allows strong validators only, weak ETag would make server send whole body every time
+		validator = etag if etag and not etag.startswith('W/') else response.headers.get('Last-Modified')
+
+		if status >= 400 or not length.isdigit() or int(length) == 0 or response.headers.get('Accept-Ranges', '').lower() != 'bytes' or not validator:
+			await aio.download(url, path, session, False, None, chunk_size, httpx, niquests, progress = progress, headers = headers, **kwargs)
+
+			try:
+				await loop.run_in_executor(None, verify, path, None)
+			except ValueError:
+				os.remove(path)
+				raise
+
+			if progress: progress.finish()
+			return path
+
+		length = int(length)
+		count = max(1, min(segments, -(-length // min_segment_size)))
+		step = -(-length // count)
+
+		if progress:
+			if progress.task_amount is None:
+				progress.task_amount = length
+			progress.update(0)
+
+		part = path + '.part'
+		fd = os.open(part, os.O_RDWR | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+		# Own pool, so writes still running in threads after task cancellation are waited for before `fd` is closed
+		writer = ThreadPoolExecutor(count)
+
+		def preallocate():
+			try:
+				os.posix_fallocate(fd, 0, length)
+
+			except AttributeError:
+				os.ftruncate(fd, length)
+
+			except OSError as e:
+				if e.errno == errno.ENOSPC:
+					raise
+
+				os.ftruncate(fd, length) # Filesystem doesn't support it
+
+		if hasattr(os, 'pwrite'):
+			def write(data: bytes, offset: int):
+				view = memoryview(data)
+				while view:
+					written = os.pwrite(fd, view, offset)
+					view = view[written:]
+					offset += written
+
+		else:
+			import threading
+			lock = threading.Lock()
+
+			def write(data: bytes, offset: int):
+				with lock:
+					os.lseek(fd, offset, os.SEEK_SET)
+					view = memoryview(data)
+					while view:
+						view = view[os.write(fd, view):]
+
+		async def fetch(start: int, end: int):
+			position = start
+
+			for attempt in range(retries + 1):
+				segment_headers = {**headers, 'Range': f'bytes={position}-{end}', 'If-Range': validator}
+
+				try:
+					async with asynccontextmanager(aio._response_stream)(url, session, 'GET', httpx, niquests, chunk_size, headers = segment_headers, **kwargs) as (response, status, chunks):
+						if status >= 400:
+							response.raise_for_status()
+
+						# 200 - whole body, file changed (If-Range) or ranges aren't supported after all
+						if status != 206 or not response.headers.get('Content-Range', '').startswith(f'bytes {position}-'):
+							raise ValueError(f'Server ignored range {position}-{end} (status {status})')
+
+						buffer = bytearray()
+
+						try:
+							async for chunk in chunks:
+								buffer += chunk
+
+								if len(buffer) >= write_size:
+									await loop.run_in_executor(writer, write, bytes(buffer), position)
+									position += len(buffer)
+									if progress: progress.update(len(buffer))
+									buffer.clear()
+
+						# Received bytes are kept even if connection drops, retry continues after them
+						finally:
+							if buffer:
+								await loop.run_in_executor(writer, write, bytes(buffer), position)
+								position += len(buffer)
+								if progress: progress.update(len(buffer))
+
+					if position != end + 1:
+						raise ConnectionError(f'Segment {start}-{end} ended at {position}')
+
+					return
+
+				except ValueError:
+					raise
+
+				except Exception:
+					if attempt == retries:
+						raise
+
+					await asyncio.sleep(0.5 * 2 ** attempt)
+
+		tasks = []
+
+		try:
+			try:
+				preallocate()
+				tasks = [asyncio.ensure_future(fetch(start, min(start + step, length) - 1)) for start in range(0, length, step)]
+				await asyncio.gather(*tasks)
+
+			finally:
+				for task in tasks:
+					task.cancel()
+
+				await asyncio.gather(*tasks, return_exceptions = True)
+				writer.shutdown(wait = True)
+				os.close(fd)
+
+			await loop.run_in_executor(None, verify, part, length)
+
+		except BaseException:
+			os.remove(part)
+			raise
+
+		os.replace(part, path)
+		if progress: progress.finish()
+		return path
+
+	@staticmethod
+	async def open(
+		file: str,
+		action: ActionModes = 'read',
+		mode: 'OpenTextMode' = 'r',
+		content = None,
+		**kwargs
+	) -> Union[int, str, bytes]:
+
+		"""
+		Accepts:
+
+			- file: str - File path
+
+			- action: str - Operation to perform ('read' or 'write')
+
+			- mode: str - File open mode ('r', 'w', 'rb', 'wb', etc.)
+
+			- content: Any - Content to write (required for write operation)
+
+			- Any other arguments for aiofiles.open()
+
+		Returns:
+			- str | bytes: File content if action != 'write'
+			- int: Number of bytes written if action == 'write'
+
+		Raises:
+			ValueError: If trying to write without content
+
+		"""
+
+		import aiofiles
+
+		async with aiofiles.open(file, mode, **kwargs) as f:
+			if action == 'write':
+				return await f.write(content)
+			else:
+				return await f.read()
+
+	@staticmethod
+	async def sem_task(
+		semaphore,
+		coro: Coroutine,
+	) -> Any:
+
+		async with semaphore:
+			return await coro
+
+class pyromisc:
+
+	@staticmethod
+	def get_md(message) -> Optional[str]:
+		return (message.caption or message.text, 'markdown', None)
+
+	@staticmethod
+	def get_user_name(user) -> Union[str, int]:
+		if user.username:
+			slug = f'@{user.username}'
+
+		elif user.first_name:
+			slug = user.first_name
+			if user.last_name:
+				slug += f' {user.last_name}'
+
+		else:
+			slug = user.id
+
+		return slug
+
+	@staticmethod
+	def get_chat_name(chat) -> Union[str, int]:
+		if chat.username:
+			slug = f'@{chat.username}'
+
+		elif chat.title:
+			slug = chat.title
+
+		elif chat.first_name:
+			slug = chat.first_name
+			if chat.last_name:
+				slug += f' {chat.last_name}'
+
+		else:
+			slug = chat.id
+
+		return slug
+
+
+class num:
+
+	"""
+	Methods:
+
+		- num.shorten() - Shortens float | int value, using expandable / editable num.suffixes dictionary
+			Example: num.shorten(10_000_000, 0) -> '10M'
+
+		- num.unshorten() - Unshortens str, using expandable / editable num.multipliers dictionary
+			Example: num.unshorten('1.63k', _round = False) -> 1630.0
+
+		- num.decim_round() - Safely rounds decimals in float
+			Example: num.decim_round(2.000127493, 2, round_if_num_gt_1 = False) -> '2.00013'
+
+		- num.beautify() - returns decimal-rounded, shortened float-like string
+			Example: num.beautify(4349.567, -1) -> 4.35K
+	"""
+
+	suffixes: list[Union[str, int]] = ['', 'K', 'M', 'B', 'T', 1000]
+	fileSize_suffixes: list[Union[str, int]] = ['B', 'KB', 'MB', 'GB', 'TB', 1024]
+	sfx = fileSize_suffixes
+	deshorteners: dict[str, int] = {'k': 10**3, 'm': 10**6, 'b': 10**9, 't': 10**12}
+	decims: list[int] = [1000, 100, 10, 5] # List is iterated using enumerate(), so by each iter. decimal amount increases by 1 (starting from 0)
+
+	@staticmethod
+	def shorten(
+		value: Union[int, float],
+		decimals: int = -1,
+		round_decimals: bool = False,
+		precission: int = 14,
+		sep: str = '',
+		suffixes: Optional[list[Union[str, int]]] = None
+	) -> str:
+
+		"""
+		Accepts:
+
+			- value: int - big value
+			- decimals: int = -1 - round digit amount
+
+			- suffixes: list[str] - Use case: File Size calculation: pass num.fileSize_suffixes
+
+		Returns:
+			Shortened float or int-like str
+
+		"""
+
+		absvalue = abs(value)
+		suffixes: list[str] = suffixes or num.suffixes
+		magnitude = suffixes[-1]
+
+		for i, suffix in enumerate(suffixes[:-1]):
+			unit = magnitude ** i
+			if absvalue < unit * magnitude:
+				break
+
+		value /= unit
+		formatted: str = num.decim_round(value, decimals, round_decimals, precission, decims = [100, 10, 1])
+		return formatted + sep + suffix
 
 	@staticmethod
 	def unshorten(
@@ -1673,309 +2515,2310 @@ class num:
 			num.decim_round(value, decimals, round_decimals, precission = precission)
 		), decimals, round_decimals, precission)
 
-# -------------MINECRAFT-VERSIONING-LOL-------------
+def _cache_get(cache: dict, key: Any) -> Any:
+	"""LRU lookup in insertion-ordered dict: hit is moved to the end"""
 
-class MC_VersionList:
-	def __init__(self, versions: list[str], indices: list[int]):
-		self.length = len(versions)
+	value = cache.get(key)
 
-		if self.length != len(indices):
-			raise ValueError(f'Versions and indices length mismatch: {self.length} != {len(indices)}')
+	if value is not None:
+		try:
+			cache[key] = cache.pop(key)
+		except KeyError: # Evicted by other thread meanwhile
+			pass
 
-		self.versions = versions
-		self.indices = indices
-		# self.map = {version: index for version, index in zip(versions, indices)}
+	return value
 
-class MC_Versions:
+def _cache_put(cache: dict, key: Any, value: Any, maxsize: int) -> Any:
+	"""LRU insert into insertion-ordered dict, least recently used entries above `maxsize` are evicted"""
+
+	cache[key] = value
+
+	while len(cache) > maxsize:
+		try:
+			del cache[next(iter(cache))]
+		except (KeyError, RuntimeError, StopIteration): # Concurrent modification
+			break
+
+	return value
+
+class Codec:
 	"""
-	Initialize via `await MC_Versions.init()`
+	Reusable one-shot compressor/decompressor for algorithm, level (and zstd dictionary)
+
+	Imports module and binds its functions once, zstd contexts are cached thread-locally (see `get_zstd_context()`),
+	so calling it in a hot loop of small payloads costs about as much as calling the library directly.
+	`Codec.get()` returns cached instance, `compress()`/`decompress()` use it for byte payloads
+
+	```python
+	codec = Codec.get('zstd', 3)
+	data = codec.decompress(codec.compress(b'...'))
+	```
 	"""
 
-	def __init__(self):
-		from re import compile
-		self.manifest_url = 'https://launchermeta.mojang.com/mc/game/version_manifest.json'
+	# Stream start bytes, used for algorithm detection
+	magic: dict[str, Optional[bytes]] = {
+		'gzip': b'\x1f\x8b\x08',
+		'bzip2': b'BZh',
+		'bzip3': b'BZ3v1',
+		'lzma': b'\xfd7zXZ',
+		'deflate': b'x',
+		'lz4': b'\x04\x22\x4d\x18',
+		'zstd': b'\x28\xb5\x2f\xfd',
+		'brotli': None,
+		'lzma2': b'\xfd7zXZ',
+	}
 
-		# Pattern for a single version
-		version_pattern = r'1\.\d+(?:\.\d+){0,1}'
-		# Pattern for a single version or a version range
-		item_pattern = rf'{version_pattern}(?:\s*-\s*{version_pattern})*'
-		# Full pattern allowing multiple items separated by commas
-		self.full_pattern = compile(rf'{item_pattern}(?:,\s*{item_pattern})*')
+	_cache: dict[tuple, 'Codec'] = {} # LRU, see `cache_size`
+	cache_size = 64
+
+	def __init__(
+		self,
+		algorithm: Algorithms,
+		level: Optional[int] = None,
+		dictionary: Optional[Union[bytes, str]] = None,
+		**kwargs
+	):
+		"""`kwargs` are passed to library's one-shot compress function"""
+
+		if dictionary is not None and algorithm != 'zstd':
+			raise ValueError('`dictionary` is only supported by zstd')
+
+		self.algorithm = algorithm
+		self.level = level
+		self.dictionary = dictionary
+		self.kwargs = kwargs
+		self.compress, self.decompress = getattr(self, f'_build_{algorithm}')()
 
 	@classmethod
-	async def init(cls):
-		"""
-		Raises: RequestError if version manifest can't be fetched
-		"""
+	def get(cls, algorithm: Algorithms, level: Optional[int] = None, dictionary: Optional[Union[bytes, str]] = None) -> 'Codec':
+		dict_key = dictionary if dictionary is None or isinstance(dictionary, (bytes, str)) else id(dictionary)
+		key = (algorithm, level, dict_key)
 
-		self = cls()
-		await self.fetch_version_manifest()
-		self.latest = self.release_versions[-1]
-		return self
+		if (codec := _cache_get(cls._cache, key)) is None:
+			codec = _cache_put(cls._cache, key, cls(algorithm, level, dictionary), cls.cache_size)
 
-	def sort(self, mc_vers: Iterable[str]) -> MC_VersionList:
-		filtered_vers = set()
+		return codec
 
-		for ver in mc_vers:
-			if not ver: continue
+	@classmethod
+	def is_supported(cls, algorithm: Algorithms) -> bool:
+		try:
+			cls.get(algorithm)
+			return True
 
-			try:
-				filtered_vers.add(
-					self.release_versions.index(ver)
-				)
+		except Exception: # ImportError
+			return False
 
-			except ValueError:
-				continue
+	def compressobj(self) -> 'CompressObj':
+		if self.dictionary is not None:
+			return get_compressobj(self.algorithm, self.level, dictionary = self.dictionary)
 
-		sorted_indices = sorted(filtered_vers)
+		return get_compressobj(self.algorithm, self.level)
 
-		return MC_VersionList([self.release_versions[index] for index in sorted_indices], sorted_indices)
+	def decompressobj(self) -> 'DecompressObj':
+		if self.dictionary is not None:
+			return get_decompressobj(self.algorithm, dictionary = self.dictionary)
 
-	def get_range(self, mc_vers: Union[MC_VersionList, Iterable[str]]) -> str:
-		if isinstance(mc_vers, Iterable):
-			mc_vers = self.sort(mc_vers)
+		return get_decompressobj(self.algorithm)
 
-		version_range = ''
-		start = mc_vers.versions[0]  # Start of a potential range
-		end = start  # End of the current range
+	def _args(self, slug: Optional[str] = None, **defaults) -> dict:
+		args = {**defaults, **self.kwargs}
 
-		for i in range(1, mc_vers.length):
-			# Check if the current index is a successor of the previous one
-			if mc_vers.indices[i] == mc_vers.indices[i - 1] + 1:
-				end = mc_vers.versions[i]  # Extend the range
-			else:
-				# Add the completed range or single version to the result
-				if start == end:
-					version_range += f'{start}, '
-				else:
-					version_range += f'{start} - {end}, '
-				start = mc_vers.versions[i]  # Start a new range
-				end = start
+		if slug and self.level is not None:
+			args[slug] = self.level
 
-		# Add the final range or single version
-		if start == end:
-			version_range += start
-		else:
-			version_range += f'{start} - {end}'
+		return args
 
-		return version_range
+	@staticmethod
+	def _members(new_decompressor: Callable[[], Any]) -> Callable[[bytes], bytes]:
+		"""Decompress function for algorithms, whose one-shot functions stop at the first stream/frame"""
 
-	def get_list(self, mc_vers: str) -> list[str]:
-		return self.findall(self.full_pattern, mc_vers)
+		def decompress(data: bytes) -> bytes:
+			chunks = []
 
-	async def fetch_version_manifest(self):
-		response = await aio.get(self.manifest_url, toreturn = ['json', 'status'])
-		manifest_data, status = response
+			while data:
+				decompressor = new_decompressor()
+				chunks.append(decompressor.decompress(data))
 
-		if status != 200 or not isinstance(manifest_data, dict):
-			raise RequestError(f"Couldn't fetch minecraft version manifest ({status}). Data: {manifest_data}")
+				if not decompressor.eof:
+					break
 
-		self.release_versions: list[str] = [version['id'] for version in manifest_data['versions'] if version['type'] == 'release']
-		self.release_versions.reverse() # Ascending
+				data = decompressor.unused_data
 
-	def is_version(self, version: str) -> bool:
-		try:
-			self.release_versions.index(version)
-			return True
-		except ValueError:
-			return False
+			return b''.join(chunks)
 
-# ----------------METHODS----------------
+		return decompress
 
-def chunk_list(lst, chunk_size):
-	return [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
+	def _build_gzip(self):
+		import gzip
+		from functools import partial
+		return partial(gzip.compress, **self._args('compresslevel')), gzip.decompress
 
-def get_enhanced_loop():
-	from sys import platform
-	import asyncio
+	def _build_bzip2(self):
+		import bz2
+		from functools import partial
+		return partial(bz2.compress, **self._args('compresslevel')), bz2.decompress
 
-	try:
-		if platform == 'win32':
-			import winloop # type: ignore
-			return winloop.new_event_loop()
+	def _build_bzip3(self):
+		import bz3 # type: ignore
+		from functools import partial
+		return partial(bz3.compress, **self._args()), bz3.decompress
 
-		else:
-			import uvloop # type: ignore
-			return uvloop.new_event_loop()
+	def _build_lzma(self):
+		import lzma
+		from functools import partial
+		return partial(lzma.compress, **self._args('preset')), lzma.decompress
 
-	except ImportError:
-		return asyncio.new_event_loop()
+	def _build_lzma2(self):
+		import lzma
+		from functools import partial
+		return partial(lzma.compress, **self._args('preset', format = lzma.FORMAT_XZ)), lzma.decompress
 
-def enhance_loop() -> bool:
-	from sys import platform
-	import asyncio
+	def _build_deflate(self):
+		import zlib
+		from functools import partial
+		return partial(zlib.compress, **self._args('level')), self._members(zlib.decompressobj)
 
-	try:
+	def _build_lz4(self):
+		import lz4.frame # type: ignore
+		from functools import partial
+		return partial(lz4.frame.compress, **self._args('compression_level')), self._members(lz4.frame.LZ4FrameDecompressor)
 
-		if platform == 'win32':
-			import winloop # type: ignore
-			asyncio.set_event_loop_policy(winloop.EventLoopPolicy())
+	def _build_zstd(self):
+		import zstandard # type: ignore
+
+		level, dictionary = self.level, self.dictionary
+
+		if self.kwargs:
+			# Custom parameters, context isn't shared with other codecs
+			cctx = zstandard.ZstdCompressor(
+				level = 3 if level is None else level,
+				dict_data = load_zstd_dictionary(dictionary) if dictionary is not None else None,
+				**self.kwargs
+			)
+			compress = cctx.compress
 
 		else:
-			import uvloop # type: ignore
-			asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+			def compress(data: bytes) -> bytes:
+				return get_zstd_context('compress', level, dictionary).compress(data)
+
+		# Streamed frames don't store content size, which one-shot `ZstdDecompressor.decompress` requires
+		decompress = self._members(lambda: get_zstd_context('decompress', dictionary = dictionary).decompressobj())
+		return compress, decompress
+
+	def _build_brotli(self):
+		import brotlicffi # type: ignore
+		from functools import partial
+		return _bytes_input(partial(brotlicffi.compress, **self._args('quality'))), _bytes_input(brotlicffi.decompress)
+
+class CompressObj:
+	"""
+	Unified incremental compressor, see `get_compressobj()`
+
+	- compress(data) -> bytes - Feed data, returns compressed chunk (may be empty)
+	- flush() -> bytes - Finishes stream, returns remaining compressed data
+	"""
+
+	def __init__(self, compress: Callable[[bytes], bytes], flush: Callable[[], bytes], header: bytes = b''):
+		self._compress = compress
+		self._flush = flush
+		self.header = header
+
+	def compress(self, data: bytes) -> bytes:
+		chunk = self._compress(data)
+
+		if self.header:
+			chunk, self.header = self.header + chunk, b''
+
+		return chunk
+
+	def flush(self) -> bytes:
+		chunk, self.header = self.header + self._flush(), b''
+		return chunk
+
+class CompressWriter:
+	"""
+	Writable file-like object, compresses everything written to it into `fileobj` chunk by chunk
+
+	Doesn't close `fileobj` on close, only finishes compression stream
+
+	`workers` > 1 - splits input into `block_size` blocks, compressed independently in a thread pool
+	and written in order as concatenated members/frames (pigz-style). zstd uses its native multi-threading instead,
+	brotli and bzip3 can't be concatenated and stay single-threaded
+
+	```python
+	with open('data.tar.zstd', 'wb') as f, CompressWriter(f, 'zstd') as writer:
+		make_tar('data', None, fileobj = writer)
+	```
+	"""
+
+	concatenable = ('gzip', 'bzip2', 'lzma', 'lzma2', 'deflate', 'lz4')
+
+	def __init__(
+		self,
+		fileobj: IO[bytes],
+		algorithm: Algorithms = 'gzip',
+		level: Optional[int] = None,
+		workers: Optional[int] = None,
+		block_size: int = 1 << 22,
+		**kwargs
+	):
+		self.fileobj = fileobj
+		self.algorithm = algorithm
+		self.level = level
+		self.kwargs = kwargs
+		self.bytes_in = 0
+		self.bytes_out = 0
+		self.closed = False
+		self.executor = None
+
+		if workers and workers > 1:
+			if algorithm == 'zstd':
+				kwargs['threads'] = workers
+
+			elif algorithm in self.concatenable:
+				from concurrent.futures import ThreadPoolExecutor
+				from collections import deque
+
+				self.workers = workers
+				self.block_size = block_size
+				self.block = bytearray()
+				self.futures = deque()
+				self.executor = ThreadPoolExecutor(workers)
+				return
+
+		self.compressor = get_compressobj(algorithm, level, **kwargs)
 
+	def _put(self, chunk: bytes):
+		if chunk:
+			self.fileobj.write(chunk)
+			self.bytes_out += len(chunk)
+
+	def _compress_block(self, data: bytes) -> bytes:
+		if set(self.kwargs) <= {'dictionary'}:
+			return Codec.get(self.algorithm, self.level, self.kwargs.get('dictionary')).compress(data)
+
+		return Codec(self.algorithm, self.level, **self.kwargs).compress(data)
+
+	def _submit(self, data: bytes):
+		self.futures.append(self.executor.submit(self._compress_block, data))
+
+		# Keep bounded amount of blocks in flight
+		while len(self.futures) > self.workers * 2:
+			self._put(self.futures.popleft().result())
+
+	def write(self, data: bytes) -> int:
+		size = len(data)
+		self.bytes_in += size
+
+		if self.executor is None:
+			self._put(self.compressor.compress(data))
+			return size
+
+		self.block.extend(data)
+
+		while len(self.block) >= self.block_size:
+			self._submit(bytes(self.block[:self.block_size]))
+			del self.block[:self.block_size]
+
+		return size
+
+	def writable(self) -> bool:
 		return True
 
-	except ImportError:
-		return False
+	def flush(self):
+		pass
 
-def setup_logger(name: str, clear_file: bool = False, dir: str = 'logs/', format: str = '%(levelname)s - %(asctime)s.%(msecs)03d - %(message)s', datefmt: str = '%H:%M:%S'):
+	def close(self):
+		if self.closed:
+			return
+
+		self.closed = True
+
+		if self.executor is None:
+			self._put(self.compressor.flush())
+			return
+
+		try:
+			if self.block or not self.bytes_in:
+				self._submit(bytes(self.block))
+				self.block.clear()
+
+			while self.futures:
+				self._put(self.futures.popleft().result())
+
+		finally:
+			self.executor.shutdown(cancel_futures = True)
+
+	def __enter__(self) -> 'CompressWriter':
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+class TarStats(Object):
 	"""
-	Sets up minimalistic logger with file (all levels) and console (>debug) handlers
-	Using queue.Queue to exclude logging from main thread
+	`make_tar()` statistics: processed files, bytes, elapsed time and throughput
 	"""
 
-	import logging
-	import logging.handlers
-	import os
-	from queue import Queue
+	def __init__(self):
+		self.files = 0
+		self.bytes = 0
+		self.elapsed = 0.0
+		self.files_per_sec = 0.0
+		self.bytes_per_sec = 0.0
 
-	if not os.path.exists(dir):
-		os.makedirs(dir)
+	def finish(self, elapsed: float):
+		self.elapsed = elapsed
 
-	if clear_file:
-		open(f'{dir}/{name}.log', 'w').write('')
+		if elapsed > 0:
+			self.files_per_sec = self.files / elapsed
+			self.bytes_per_sec = self.bytes / elapsed
 
-	logger = logging.getLogger(name)
-	logger.setLevel(logging.DEBUG)
+	def __str__(self) -> str:
+		return f'{self.files} files, {num.bss(self.bytes)} in {Timer.format_output(self.elapsed)} ({num.decim_round(self.files_per_sec)} files/s, {num.bss(self.bytes_per_sec)}/s)'
 
-	log_queue = Queue()
-	queue_handler = logging.handlers.QueueHandler(log_queue)
-	file_handler = logging.FileHandler(f'logs/{name}.log', encoding = 'utf-8')
+class ArchiveMember(Object):
+	"""
+	`IndexedArchive` member: path, size, mode, mtime and compressed blocks - [offset, compressed length, size]
+	"""
 
-	console_handler = logging.StreamHandler()
-	console_handler.setLevel(logging.INFO)
+	def __init__(self, path: str, size: int, mode: int, mtime: float, blocks: list[list[int]]):
+		self.path = path
+		self.size = size
+		self.mode = mode
+		self.mtime = mtime
+		self.blocks = blocks
 
-	formatter = logging.Formatter(
-		format,
-		datefmt = datefmt
-	)
-	file_handler.setFormatter(formatter)
-	console_handler.setFormatter(formatter)
+class DecompressResult(Object):
+	"""
+	`decompress_many()` result for single source: output path, compressed/decompressed sizes, elapsed time and error (if failed)
+	"""
 
-	# Setup queue listener
-	listeners = [file_handler, console_handler]
-	queue_listener = logging.handlers.QueueListener(
-		log_queue,
-		*listeners,
-		respect_handler_level = True
-	)
-	queue_listener.start()
+	def __init__(
+		self,
+		source: str,
+		output: Optional[str] = None,
+		size_in: int = 0,
+		size_out: int = 0,
+		elapsed: float = 0.0,
+		error: Optional[str] = None
+	):
+		self.source = source
+		self.output = output
+		self.size_in = size_in
+		self.size_out = size_out
+		self.elapsed = elapsed
+		self.error = error
+
+	def __str__(self) -> str:
+		if self.error:
+			return f'{self.source}: {self.error}'
+
+		return f'{self.source} -> {self.output}: {num.bss(self.size_in)} -> {num.bss(self.size_out)} in {Timer.format_output(self.elapsed)}'
+
+class IndexedArchive:
+	"""
+	Seekable archive, produced by `compress(..., indexed = True)` / `make_indexed_archive()`
+
+	Every member is split into independently compressed blocks, trailing index maps member path to block offsets,
+	so single member is read by seeking to its blocks instead of decompressing whole archive
+
+	STRUCTURE:
+	(magic) (algorithm name length) (algorithm name) [ (compressed block) ] (compressed JSON index) (index offset) (index length) (footer magic)
+
+	JSON index: {"members": [...], "id": random hex}, `id` with index offset and length identify archive (see `make_incremental_archive()`)
+
+	```python
+	with IndexedArchive('folder.sptx') as archive:
+		content = archive.read('sub/file.txt')
+	```
+	"""
+
+	magic = b'SPTX\x01'
+	footer_magic = b'SPTXIDX\x00'
+	footer_format = '>QQ8s'
+	footer_size = 24
+
+	def __init__(self, source: Union[str, bytes, IO[bytes]]):
+		import io, struct, json
+
+		if is_buffer(source):
+			self.fileobj = io.BytesIO(source)
+			self.own_fileobj = True
+
+		elif hasattr(source, 'read'):
+			self.fileobj = source
+			self.own_fileobj = False
+
+		else:
+			self.fileobj = open(source, 'rb')
+			self.own_fileobj = True
+
+		try:
+			self.base = self.fileobj.tell()
+			header = self.fileobj.read(len(self.magic) + 1)
+
+			if header[:len(self.magic)] != self.magic:
+				raise ValueError('Not an indexed archive')
+
+			self.algorithm: Algorithms = self.fileobj.read(header[-1]).decode()
+
+			self.fileobj.seek(-self.footer_size, 2)
+			index_offset, index_length, footer_magic = struct.unpack(self.footer_format, self.fileobj.read(self.footer_size))
+
+			if footer_magic != self.footer_magic:
+				raise ValueError('Indexed archive footer is missing or corrupted')
+
+			index = json.loads(self._read_block(index_offset, index_length))
+
+		except:
+			self.close()
+			raise
+
+		self.members: dict[str, ArchiveMember] = {member[0]: ArchiveMember(*member) for member in index['members']}
+		self.id: Optional[str] = index.get('id')
+		self.index_offset = index_offset
+		self.index_length = index_length
+
+	@property
+	def identity(self) -> dict:
+		"""Archive id, index offset and length - written into `make_incremental_archive()` manifest"""
+		return {'id': self.id, 'index_offset': self.index_offset, 'index_length': self.index_length}
+
+	@classmethod
+	def is_indexed(cls, source: Union[str, bytes, IO[bytes]]) -> bool:
+		if is_buffer(source):
+			return bytes(source[:len(cls.magic)]) == cls.magic
+
+		elif hasattr(source, 'read'):
+			if not hasattr(source, 'seek') or (hasattr(source, 'seekable') and not source.seekable()):
+				return False
+
+			position = source.tell()
+			header = source.read(len(cls.magic))
+			source.seek(position)
+			return header == cls.magic
+
+		import os
+		if not isinstance(source, str) or not os.path.isfile(source):
+			return False
+
+		with open(source, 'rb') as f:
+			return f.read(len(cls.magic)) == cls.magic
+
+	def _read_block(self, offset: int, length: int) -> bytes:
+		self.fileobj.seek(self.base + offset)
+		return decompress_members(self.algorithm, self.fileobj.read(length))
+
+	def iter_member(self, path: str) -> Iterator[bytes]:
+		"""Yields decompressed member blocks"""
+
+		for offset, length, _ in self.members[path].blocks:
+			yield self._read_block(offset, length)
+
+	def read(self, path: str) -> bytes:
+		return b''.join(self.iter_member(path))
+
+	def extract(self, path: str, output: str) -> str:
+		"""Extracts member into `output` folder, returns extracted file path"""
+
+		import os
+
+		target = os.path.abspath(os.path.join(output, path))
+		if os.path.commonpath((target, os.path.abspath(output))) != os.path.abspath(output):
+			raise ValueError(f'Unsafe member path: {path}')
+
+		os.makedirs(os.path.dirname(target), exist_ok = True)
+
+		with open(target, 'wb') as f:
+			for block in self.iter_member(path):
+				f.write(block)
+
+		member = self.members[path]
+
+		try:
+			os.chmod(target, member.mode)
+			os.utime(target, (member.mtime, member.mtime))
+		except OSError:
+			pass
+
+		return target
+
+	def unpack(
+		self,
+		output: Union[Literal[False], str, IO[bytes]],
+		members: Optional[Iterable[str]] = None
+	) -> Union[str, int, dict[str, bytes]]:
+		"""
+		output False - returns {path: content}
+		output buffer - writes members' content one after another, returns written bytes
+		output str - extracts members into folder, returns it
+		"""
+
+		members = list(self.members) if members is None else list(members)
+
+		if missing := [path for path in members if path not in self.members]:
+			raise KeyError(f'Members not found in archive: {missing}')
+
+		if output is False:
+			return {path: self.read(path) for path in members}
+
+		elif hasattr(output, 'write'):
+			written = 0
+			for path in members:
+				for block in self.iter_member(path):
+					written += output.write(block)
+
+			return written
+
+		for path in members:
+			self.extract(path, output)
+
+		return output
+
+	def close(self):
+		if self.own_fileobj:
+			self.fileobj.close()
+
+	def __enter__(self) -> 'IndexedArchive':
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+class DecompressObj:
+	"""
+	Unified incremental decompressor, see `get_decompressobj()`
+
+	- decompress(data, max_length = -1) -> bytes
+	- eof: bool - End of current stream/frame/member reached
+	- unused_data: bytes - Data after end of stream (e.g. next gzip member)
+	- needs_input: bool - False if output was limited by `max_length` and more is pending, call `decompress(b'', ...)` till it's True
+	- bounded: bool - Whether backend supports `max_length` (zlib, bz2, lzma, lz4, brotlicffi >= 1.2)
+	"""
+
+	def __init__(
+		self,
+		ctx: Any,
+		decompress: Optional[Callable[..., bytes]] = None,
+		is_finished: Optional[Callable[[], bool]] = None,
+		needs_input: Optional[Callable[[], bool]] = None,
+		bounded: bool = False
+	):
+		self.ctx = ctx
+		self._decompress = decompress or ctx.decompress
+		self._is_finished = is_finished
+		self._needs_input = needs_input
+		self.bounded = bounded
+
+	def decompress(self, data: bytes, max_length: int = -1) -> bytes:
+		if self.bounded:
+			return self._decompress(data, max_length)
+
+		return self._decompress(data)
+
+	@property
+	def eof(self) -> bool:
+		if self._is_finished:
+			return self._is_finished()
+
+		return getattr(self.ctx, 'eof', False)
+
+	@property
+	def unused_data(self) -> bytes:
+		return getattr(self.ctx, 'unused_data', b'')
+
+	@property
+	def needs_input(self) -> bool:
+		if self._needs_input:
+			return self._needs_input()
+
+		return getattr(self.ctx, 'needs_input', True)
+
+class _PrefixedReader:
+	"""Reads `prefix`, then `fileobj`, counting bytes"""
+
+	def __init__(self, fileobj: IO[bytes], prefix: bytes = b''):
+		self.fileobj = fileobj
+		self.prefix = prefix
+		self.bytes_read = 0
+
+	def read(self, size: int = -1) -> bytes:
+		if self.prefix:
+			data = self.prefix if size < 0 else self.prefix[:size]
+			self.prefix = self.prefix[len(data):]
+		else:
+			data = self.fileobj.read(size)
+
+		self.bytes_read += len(data)
+		return data
+
+class DecompressReader:
+	"""
+	Readable file-like object, lazily decompresses `fileobj` chunk by chunk
+	Concatenated streams (gzip members, zstd/lz4 frames, ...) are decompressed one after another
+
+	`prefix` - already read bytes of `fileobj` (e.g. sniffed header)
+	"""
+
+	def __init__(
+		self,
+		fileobj: IO[bytes],
+		algorithm: Algorithms,
+		chunk_size: int = 1 << 20,
+		prefix: bytes = b'',
+		**kwargs
+	):
+		self.fileobj = fileobj
+		self.algorithm = algorithm
+		self.chunk_size = chunk_size
+		self.kwargs = kwargs
+
+		self.pending = prefix
+		self.buffer = bytearray()
+		self.bytes_in = 0
+		self.bytes_out = 0
+		self.exhausted = False
+
+		# zstd decompressobj can't limit output, size-limited stream reader can
+		if algorithm == 'zstd':
+			self.source = _PrefixedReader(fileobj, prefix)
+			self.stream = _zstd_decompressor(**kwargs).stream_reader(self.source, read_size = chunk_size, read_across_frames = True)
+		else:
+			self.stream = None
+			self.decompressor = get_decompressobj(algorithm, **kwargs)
+
+	def _fill(self, size: int):
+		# Output of single call is limited, so memory stays around `size` + `chunk_size` however well input compresses
+		while not self.exhausted and (size < 0 or len(self.buffer) < size):
+			limit = size - len(self.buffer) if size >= 0 else self.chunk_size
+
+			if self.stream is not None:
+				chunk = self.stream.read(limit)
+				self.bytes_in = self.source.bytes_read
+
+				if not chunk:
+					self.exhausted = True
+					break
+
+				self.buffer.extend(chunk)
+				self.bytes_out += len(chunk)
+				continue
+
+			decompressor = self.decompressor
+
+			if decompressor.eof or decompressor.needs_input:
+				data = self.pending or self.fileobj.read(self.chunk_size)
+				self.pending = b''
+
+				if not data:
+					self.exhausted = True
+					break
+
+				self.bytes_in += len(data)
+
+				if decompressor.eof:
+					decompressor = self.decompressor = get_decompressobj(self.algorithm, **self.kwargs)
+
+			else:
+				data = b''
+
+			chunk = decompressor.decompress(data, limit)
+			self.buffer.extend(chunk)
+			self.bytes_out += len(chunk)
+
+			if decompressor.eof and (unused := decompressor.unused_data):
+				self.pending = unused
+				self.bytes_in -= len(unused)
+
+	def peek(self, size: int = 1) -> bytes:
+		self._fill(size)
+		return bytes(self.buffer[:size])
+
+	def read(self, size: int = -1) -> bytes:
+		self._fill(size)
+
+		if size < 0 or size >= len(self.buffer):
+			data = bytes(self.buffer)
+			self.buffer.clear()
+		else:
+			data = bytes(self.buffer[:size])
+			del self.buffer[:size]
+
+		return data
+
+	def readable(self) -> bool:
+		return True
+
+	def close(self):
+		self.buffer.clear()
+
+	def __enter__(self) -> 'DecompressReader':
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+# -------------MINECRAFT-VERSIONING-LOL-------------
+
+class MC_VersionList:
+	def __init__(self, versions: list[str], indices: list[int]):
+		self.length = len(versions)
+
+		if self.length != len(indices):
+			raise ValueError(f'Versions and indices length mismatch: {self.length} != {len(indices)}')
+
+		self.versions = versions
+		self.indices = indices
+		# self.map = {version: index for version, index in zip(versions, indices)}
+
+class MC_Versions:
+	"""
+	Initialize via `await MC_Versions.init()`
+	"""
+
+	def __init__(self):
+		from re import compile
+		self.manifest_url = 'https://launchermeta.mojang.com/mc/game/version_manifest.json'
+
+		# Pattern for a single version
+		version_pattern = r'1\.\d+(?:\.\d+){0,1}'
+		# Pattern for a single version or a version range
+		item_pattern = rf'{version_pattern}(?:\s*-\s*{version_pattern})*'
+		# Full pattern allowing multiple items separated by commas
+		self.full_pattern = compile(rf'{item_pattern}(?:,\s*{item_pattern})*')
+
+	@classmethod
+	async def init(cls):
+		"""
+		Raises: RequestError if version manifest can't be fetched
+		"""
+
+		self = cls()
+		await self.fetch_version_manifest()
+		self.latest = self.release_versions[-1]
+		return self
+
+	def sort(self, mc_vers: Iterable[str]) -> MC_VersionList:
+		filtered_vers = set()
+
+		for ver in mc_vers:
+			if not ver: continue
+
+			try:
+				filtered_vers.add(
+					self.release_versions.index(ver)
+				)
+
+			except ValueError:
+				continue
+
+		sorted_indices = sorted(filtered_vers)
+
+		return MC_VersionList([self.release_versions[index] for index in sorted_indices], sorted_indices)
+
+	def get_range(self, mc_vers: Union[MC_VersionList, Iterable[str]]) -> str:
+		if isinstance(mc_vers, Iterable):
+			mc_vers = self.sort(mc_vers)
+
+		version_range = ''
+		start = mc_vers.versions[0]  # Start of a potential range
+		end = start  # End of the current range
+
+		for i in range(1, mc_vers.length):
+			# Check if the current index is a successor of the previous one
+			if mc_vers.indices[i] == mc_vers.indices[i - 1] + 1:
+				end = mc_vers.versions[i]  # Extend the range
+			else:
+				# Add the completed range or single version to the result
+				if start == end:
+					version_range += f'{start}, '
+				else:
+					version_range += f'{start} - {end}, '
+				start = mc_vers.versions[i]  # Start a new range
+				end = start
+
+		# Add the final range or single version
+		if start == end:
+			version_range += start
+		else:
+			version_range += f'{start} - {end}'
+
+		return version_range
+
+	def get_list(self, mc_vers: str) -> list[str]:
+		return self.findall(self.full_pattern, mc_vers)
+
+	async def fetch_version_manifest(self):
+		response = await aio.get(self.manifest_url, toreturn = ['json', 'status'])
+		manifest_data, status = response
+
+		if status != 200 or not isinstance(manifest_data, dict):
+			raise RequestError(f"Couldn't fetch minecraft version manifest ({status}). Data: {manifest_data}")
+
+		self.release_versions: list[str] = [version['id'] for version in manifest_data['versions'] if version['type'] == 'release']
+		self.release_versions.reverse() # Ascending
+
+	def is_version(self, version: str) -> bool:
+		try:
+			self.release_versions.index(version)
+			return True
+		except ValueError:
+			return False
+
+# ----------------METHODS----------------
+
+def chunk_list(lst, chunk_size):
+	return [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
+
+def get_enhanced_loop():
+	from sys import platform
+	import asyncio
+
+	try:
+		if platform == 'win32':
+			import winloop # type: ignore
+			return winloop.new_event_loop()
+
+		else:
+			import uvloop # type: ignore
+			return uvloop.new_event_loop()
+
+	except ImportError:
+		return asyncio.new_event_loop()
+
+def enhance_loop() -> bool:
+	from sys import platform
+	import asyncio
+
+	try:
+
+		if platform == 'win32':
+			import winloop # type: ignore
+			asyncio.set_event_loop_policy(winloop.EventLoopPolicy())
+
+		else:
+			import uvloop # type: ignore
+			asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+		return True
+
+	except ImportError:
+		return False
+
+def setup_logger(name: str, clear_file: bool = False, dir: str = 'logs/', format: str = '%(levelname)s - %(asctime)s.%(msecs)03d - %(message)s', datefmt: str = '%H:%M:%S'):
+	"""
+	Sets up minimalistic logger with file (all levels) and console (>debug) handlers
+	Using queue.Queue to exclude logging from main thread
+	"""
+
+	import logging
+	import logging.handlers
+	import os
+	from queue import Queue
+
+	if not os.path.exists(dir):
+		os.makedirs(dir)
+
+	if clear_file:
+		open(f'{dir}/{name}.log', 'w').write('')
+
+	logger = logging.getLogger(name)
+	logger.setLevel(logging.DEBUG)
+
+	log_queue = Queue()
+	queue_handler = logging.handlers.QueueHandler(log_queue)
+	file_handler = logging.FileHandler(f'logs/{name}.log', encoding = 'utf-8')
+
+	console_handler = logging.StreamHandler()
+	console_handler.setLevel(logging.INFO)
+
+	formatter = logging.Formatter(
+		format,
+		datefmt = datefmt
+	)
+	file_handler.setFormatter(formatter)
+	console_handler.setFormatter(formatter)
+
+	# Setup queue listener
+	listeners = [file_handler, console_handler]
+	queue_listener = logging.handlers.QueueListener(
+		log_queue,
+		*listeners,
+		respect_handler_level = True
+	)
+	queue_listener.start()
+
+	# Store listener reference to prevent garbage collection
+	logger.addHandler(queue_handler)
+	logger.queue_listener = queue_listener
+
+	return logger
+
+def is_buffer(obj: Any) -> bool:
+	"""Whether object is bytes-like content (bytes, bytearray, memoryview, mmap), not a path/stream"""
+
+	import mmap
+	return isinstance(obj, (bytes, bytearray, memoryview, mmap.mmap))
+
+def _bytes_input(func: Callable[[bytes], bytes]) -> Callable[[Any], bytes]:
+	"""Wraps function that only accepts `bytes` (brotlicffi), other buffers are copied"""
+
+	def wrapper(data: Any) -> bytes:
+		return func(data if isinstance(data, bytes) else bytes(data))
+
+	return wrapper
+
+def get_content(source: Union[str, bytes, IO[bytes]], memory_map: bool = False) -> tuple[Optional[int], Optional[Union[bytes, memoryview]]]:
+	"""
+	Returns source byte content in tuple - (type, content)
+	Source can be either a file_path, readable buffer or bytes-like object (returned as is, without copying)
+
+	memory_map - return file content as read-only `memoryview` over `mmap` of the file instead of reading it,
+	pages are loaded lazily by OS and file stays mapped while the view is referenced
+
+	First tuple object is source type:
+		1 - bytes-like
+		2 - readable buffer
+		3 - file path
+		4 - folder path (str)
+		None - unknown
+		...
+
+	"""
+
+	if is_buffer(source):
+		return 1, source
+
+	elif hasattr(source, 'read'):
+		return 2, source.read()
+
+	else:
+		import os
+
+		if os.path.isfile(source):
+			with open(source, 'rb') as f:
+				if memory_map and os.fstat(f.fileno()).st_size:
+					import mmap
+					return 3, memoryview(mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ))
+
+				return 3, f.read()
+
+		elif os.path.isdir(source):
+			return 4, source
+
+		return None, None
+
+def _copy_fd(src_fd: int, dst_fd: int, offset: int = 0, count: Optional[int] = None) -> int:
+	"""
+	Copies `count` bytes (till EOF by default) from `offset` of `src_fd` to current position of `dst_fd`,
+	in kernel via `copy_file_range`/`sendfile` where possible, falls back to `pread`/`write` loop
+	"""
+
+	import os
+
+	if count is None:
+		count = max(os.fstat(src_fd).st_size - offset, 0)
+
+	copied = 0
+
+	def copy_file_range(size: int) -> int:
+		return os.copy_file_range(src_fd, dst_fd, size, offset + copied)
+
+	def sendfile(size: int) -> int:
+		return os.sendfile(dst_fd, src_fd, offset + copied, size)
+
+	for kernel_copy in (hasattr(os, 'copy_file_range') and copy_file_range, hasattr(os, 'sendfile') and sendfile):
+		if not kernel_copy:
+			continue
+
+		try:
+			while copied < count and (size := kernel_copy(min(count - copied, 1 << 30))):
+				copied += size
+
+			return copied
+
+		except OSError: # EXDEV, EINVAL, ENOSYS, non-regular files, etc.
+			continue
+
+	while copied < count:
+		if hasattr(os, 'pread'):
+			chunk = os.pread(src_fd, min(count - copied, 1 << 20), offset + copied)
+		else:
+			os.lseek(src_fd, offset + copied, os.SEEK_SET)
+			chunk = os.read(src_fd, min(count - copied, 1 << 20))
+
+		if not chunk:
+			break
+
+		view = memoryview(chunk)
+		while view:
+			view = view[os.write(dst_fd, view):]
+
+		copied += len(chunk)
+
+	return copied
+
+def _source_fd(content: Any) -> Optional[tuple[int, int]]:
+	"""Returns (fd, offset) of regular file stream for kernel copying, None otherwise"""
+
+	import os, stat
+
+	try:
+		fd = content.fileno()
+		if not stat.S_ISREG(os.fstat(fd).st_mode):
+			return
+
+		return fd, content.tell()
+
+	except (AttributeError, OSError, ValueError): # io.UnsupportedOperation is OSError/ValueError
+		return
+
+def write_content(
+	content: Union[str, bytes, IO[bytes]],
+	output: Union[Literal[False], str, IO[bytes]]
+) -> Union[int, bytes]:
+	"""
+	Writes bytes-like content, file (path) or readable buffer to output:
+	If output has `write` attribute, writes content to it and returns written bytes
+	If output is False, returns content (bytes-like content as is)
+	Otherwise writes content to temporary file next to `output` path, fsyncs and atomically replaces it, returns written bytes.
+	Symlinks, FIFOs/devices and files in folders without write permission are written directly (`open(output, 'wb')`)
+
+	Bytes-like content (see `is_buffer()`) is written without copying,
+	files are copied in kernel (`copy_file_range`/`sendfile`) when output is a file too
+
+	Raises `OSError` on write failures, `TypeError` on unsupported output
+	"""
+
+	import os
+
+	if output is False:
+		return content if is_buffer(content) else get_content(content)[1]
+
+	if not hasattr(output, 'write') and not isinstance(output, (str, os.PathLike)):
+		raise TypeError(f'Unsupported output: {output!r}')
+
+	def write_to(fileobj: IO[bytes]) -> int:
+		if is_buffer(content):
+			return fileobj.write(content)
+
+		if isinstance(content, (str, os.PathLike)):
+			with open(content, 'rb') as src:
+				return write_stream(src, fileobj)
+
+		return write_stream(content, fileobj)
+
+	def write_stream(src: IO[bytes], fileobj: IO[bytes]) -> int:
+		source = _source_fd(src)
+
+		try:
+			dst_fd = fileobj.fileno()
+		except (AttributeError, OSError, ValueError):
+			dst_fd = None
+
+		if source is None or dst_fd is None:
+			written = 0
+			while chunk := src.read(1 << 20):
+				written += fileobj.write(chunk)
+
+			return written
+
+		src_fd, offset = source
+		fileobj.flush()
+
+		written = _copy_fd(src_fd, dst_fd, offset)
+		src.seek(offset + written)
+
+		# Resync buffered object with descriptor position
+		if fileobj.seekable():
+			fileobj.seek(os.lseek(dst_fd, 0, os.SEEK_CUR))
+
+		return written
+
+	if hasattr(output, 'write'):
+		return write_to(output)
+
+	import stat
+
+	output = os.fspath(output)
+
+	try:
+		output_stat = os.lstat(output)
+	except FileNotFoundError:
+		output_stat = None
+
+	def write_direct() -> int:
+		with open(output, 'wb') as f:
+			return write_to(f)
+
+	# Replacing would turn symlink into regular file, FIFOs and devices can't be replaced at all
+	if output_stat is not None and not stat.S_ISREG(output_stat.st_mode):
+		return write_direct()
+
+	directory, name = os.path.split(os.path.abspath(output))
+	flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+
+	while True:
+		temp_path = os.path.join(directory, f'.{name}.{os.urandom(4).hex()}.tmp')
+
+		try:
+			# Kernel applies umask in effect right now
+			fd = os.open(temp_path, flags, 0o666)
+			break
+
+		except FileExistsError:
+			continue
+
+		except PermissionError:
+			if output_stat is None:
+				raise
+
+			# Folder isn't writable, file itself may be
+			return write_direct()
+
+	try:
+		with os.fdopen(fd, 'wb') as f:
+			written = write_to(f)
+			f.flush()
+			os.fsync(f.fileno())
+
+		if output_stat is not None:
+			os.chmod(temp_path, stat.S_IMODE(output_stat.st_mode))
+
+		os.replace(temp_path, output)
+
+	except BaseException:
+		try:
+			os.remove(temp_path)
+		except OSError:
+			pass
+
+		raise
+
+	return written
+
+_zstd_local = None
+_zstd_dicts = {} # LRU of loaded dictionaries, thread-local contexts are LRU too
+_zstd_dicts_size = 16
+_zstd_contexts_size = 32
+_zstd_dict_stats = {} # path: (key, checked at)
+_zstd_dict_recheck = 1.0 # Seconds, path dictionary's file is stat-ed at most that often
+
+def _zstd_dict_key(dictionary: Union[bytes, str, Any, None]) -> Any:
+	"""
+	Cache key of dictionary - path with its mtime and size (so rewritten file is reloaded), bytes, or object id.
+	Path is stat-ed on first use and then at most every `_zstd_dict_recheck` seconds, not on every call
+	"""
+
+	if isinstance(dictionary, str):
+		from time import monotonic
+
+		now = monotonic()
+		cached = _zstd_dict_stats.get(dictionary)
+
+		if cached is not None and now - cached[1] < _zstd_dict_recheck:
+			return cached[0]
+
+		import os
+		stat = os.stat(dictionary)
+		key = (dictionary, stat.st_mtime_ns, stat.st_size)
+		_cache_put(_zstd_dict_stats, dictionary, (key, now), _zstd_dicts_size)
+		return key
+
+	return dictionary if dictionary is None or isinstance(dictionary, bytes) else id(dictionary)
+
+def _drop_stale(cache: dict, key: Any, dict_key: Callable[[Any], Any] = lambda key: key) -> None:
+	"""Removes `cache` entries of same dictionary path as `key` has, but older file state"""
+
+	if isinstance(key, tuple):
+		for old in [old for old in cache if isinstance(dict_key(old), tuple) and dict_key(old)[0] == key[0] and dict_key(old) != key]:
+			del cache[old]
+
+def load_zstd_dictionary(dictionary: Union[bytes, str, Any]) -> Any:
+	"""
+	Returns cached `zstandard.ZstdCompressionDict` from dictionary bytes or file path (or dictionary itself).
+	Path is cached with file's mtime and size, rewritten dictionary file is loaded again
+	(noticed within `_zstd_dict_recheck` seconds, pass bytes to reload it right away)
+	"""
+
+	import zstandard # type: ignore
+
+	if isinstance(dictionary, zstandard.ZstdCompressionDict):
+		return dictionary
+
+	key = _zstd_dict_key(dictionary)
+
+	if (loaded := _cache_get(_zstd_dicts, key)) is not None:
+		return loaded
+
+	data = dictionary
+	if isinstance(dictionary, str):
+		with open(dictionary, 'rb') as f:
+			data = f.read()
+
+	_drop_stale(_zstd_dicts, key)
+	return _cache_put(_zstd_dicts, key, zstandard.ZstdCompressionDict(data), _zstd_dicts_size)
+
+def get_zstd_context(
+	kind: Literal['compress', 'decompress'],
+	level: Optional[int] = None,
+	dictionary: Optional[Union[bytes, str, Any]] = None
+) -> Any:
+	"""
+	Returns thread-local cached `ZstdCompressor`/`ZstdDecompressor` for given level and dictionary,
+	so contexts aren't rebuilt on every `compress()`/`decompress()` call
+	"""
+
+	global _zstd_local
+	import zstandard # type: ignore
+
+	if _zstd_local is None:
+		import threading
+		_zstd_local = threading.local()
+
+	contexts = getattr(_zstd_local, 'contexts', None)
+	if contexts is None:
+		contexts = _zstd_local.contexts = {}
+
+	dict_key = _zstd_dict_key(dictionary)
+	key = (kind, level, dict_key)
+
+	if (ctx := _cache_get(contexts, key)) is not None:
+		return ctx
+
+	_drop_stale(contexts, dict_key, lambda key: key[2])
+	dict_data = load_zstd_dictionary(dictionary) if dictionary is not None else None
+
+	if kind == 'compress':
+		ctx = zstandard.ZstdCompressor(level = 3 if level is None else level, dict_data = dict_data)
+	else:
+		ctx = zstandard.ZstdDecompressor(dict_data = dict_data)
+
+	return _cache_put(contexts, key, ctx, _zstd_contexts_size)
+
+def train_dictionary(
+	samples: Iterable[bytes],
+	size: int = 112640,
+	output: Optional[str] = None,
+	**kwargs
+) -> bytes:
+	"""
+	Trains zstd dictionary from samples (e.g. small JSON payloads), returns its bytes and saves to `output` path if given
+	Pass it as `dictionary` to `compress()`/`decompress()` (bytes or path)
+
+	`size` - max dictionary size (zstd default is 110KB)
+	"""
+
+	import zstandard # type: ignore
+
+	dictionary = zstandard.train_dictionary(size, list(samples), **kwargs).as_bytes()
+
+	if output:
+		write_content(dictionary, output)
+
+	return dictionary
+
+def get_compressobj(algorithm: Algorithms = 'gzip', level: Optional[int] = None, **kwargs) -> CompressObj:
+	"""
+	Returns incremental compressor (`CompressObj`) for given algorithm
+	Output is compatible with `decompress()` and one-shot `compress()`
+	"""
+
+	def gzip_obj():
+		import zlib
+		ctx = zlib.compressobj(9 if level is None else level, zlib.DEFLATED, 31, **kwargs)
+		return CompressObj(ctx.compress, ctx.flush)
+
+	def bzip2_obj():
+		import bz2
+		ctx = bz2.BZ2Compressor(9 if level is None else level)
+		return CompressObj(ctx.compress, ctx.flush)
+
+	def bzip3_obj():
+		import bz3 # type: ignore
+		ctx = bz3.BZ3Compressor(**kwargs)
+		return CompressObj(ctx.compress, ctx.flush)
+
+	def lzma_obj():
+		import lzma
+		ctx = lzma.LZMACompressor(format = lzma.FORMAT_XZ, preset = level, **kwargs)
+		return CompressObj(ctx.compress, ctx.flush)
+
+	def deflate_obj():
+		import zlib
+		ctx = zlib.compressobj(-1 if level is None else level, **kwargs)
+		return CompressObj(ctx.compress, ctx.flush)
+
+	def lz4_obj():
+		import lz4.frame # type: ignore
+		ctx = lz4.frame.LZ4FrameCompressor(compression_level = level or 0, **kwargs)
+		return CompressObj(ctx.compress, ctx.flush, ctx.begin())
+
+	def zstd_obj():
+		import zstandard # type: ignore
+		dictionary = kwargs.pop('dictionary', None)
+		if dictionary is not None:
+			kwargs['dict_data'] = load_zstd_dictionary(dictionary)
+
+		ctx = zstandard.ZstdCompressor(level = 3 if level is None else level, **kwargs).compressobj()
+		return CompressObj(ctx.compress, ctx.flush)
+
+	def brotli_obj():
+		import brotlicffi # type: ignore
+		ctx = brotlicffi.Compressor(quality = 11 if level is None else level, **kwargs)
+		return CompressObj(_bytes_input(ctx.process), ctx.finish)
+
+	algorithm_map = {
+		'gzip': gzip_obj,
+		'bzip2': bzip2_obj,
+		'bzip3': bzip3_obj,
+		'lzma': lzma_obj,
+		'lzma2': lzma_obj,
+		'deflate': deflate_obj,
+		'lz4': lz4_obj,
+		'zstd': zstd_obj,
+		'brotli': brotli_obj,
+	}
+
+	return algorithm_map[algorithm]()
+
+def get_decompressobj(algorithm: Algorithms, **kwargs) -> DecompressObj:
+	"""
+	Returns incremental decompressor (`DecompressObj`) for given algorithm
+	"""
+
+	def zlib_obj(ctx) -> DecompressObj:
+		# Input left over by `max_length` stays in `unconsumed_tail`
+		def decompress(data: bytes, max_length: int = -1) -> bytes:
+			if ctx.unconsumed_tail:
+				data = ctx.unconsumed_tail + data
+
+			return ctx.decompress(data, max(max_length, 0))
+
+		return DecompressObj(ctx, decompress, needs_input = lambda: not ctx.unconsumed_tail, bounded = True)
+
+	def gzip_obj():
+		import zlib
+		return zlib_obj(zlib.decompressobj(31, **kwargs))
+
+	def bzip2_obj():
+		import bz2
+		return DecompressObj(bz2.BZ2Decompressor(), bounded = True)
+
+	def bzip3_obj():
+		import bz3 # type: ignore
+		return DecompressObj(bz3.BZ3Decompressor(**kwargs))
+
+	def lzma_obj():
+		import lzma
+		return DecompressObj(lzma.LZMADecompressor(**kwargs), bounded = True)
+
+	def deflate_obj():
+		import zlib
+		return zlib_obj(zlib.decompressobj(**kwargs))
+
+	def lz4_obj():
+		import lz4.frame # type: ignore
+		return DecompressObj(lz4.frame.LZ4FrameDecompressor(**kwargs), bounded = True)
+
+	def zstd_obj():
+		return DecompressObj(_zstd_decompressor(**kwargs).decompressobj())
+
+	def brotli_obj():
+		import brotlicffi # type: ignore
+		ctx = brotlicffi.Decompressor(**kwargs)
+
+		# output_buffer_limit - brotlicffi >= 1.2
+		if not hasattr(ctx, 'can_accept_more_data'):
+			return DecompressObj(ctx, _bytes_input(ctx.process), ctx.is_finished)
+
+		def decompress(data: bytes, max_length: int = -1) -> bytes:
+			return ctx.process(bytes(data), output_buffer_limit = max_length if max_length > 0 else None)
+
+		return DecompressObj(ctx, decompress, ctx.is_finished, ctx.can_accept_more_data, bounded = True)
+
+	algorithm_map = {
+		'gzip': gzip_obj,
+		'bzip2': bzip2_obj,
+		'bzip3': bzip3_obj,
+		'lzma': lzma_obj,
+		'lzma2': lzma_obj,
+		'deflate': deflate_obj,
+		'lz4': lz4_obj,
+		'zstd': zstd_obj,
+		'brotli': brotli_obj,
+	}
+
+	return algorithm_map[algorithm]()
+
+def _zstd_decompressor(dictionary: Union[bytes, str, Any, None] = None, **kwargs):
+	import zstandard # type: ignore
+
+	if dictionary is not None:
+		kwargs['dict_data'] = load_zstd_dictionary(dictionary)
+
+	return zstandard.ZstdDecompressor(**kwargs)
+
+def decompress_members(algorithm: Algorithms, data: bytes, **kwargs) -> bytes:
+	"""Decompresses all concatenated streams/frames/members of `data`"""
+
+	if set(kwargs) <= {'dictionary'}:
+		return Codec.get(algorithm, dictionary = kwargs.get('dictionary')).decompress(data)
+
+	chunks = []
+
+	while data:
+		decompressor = get_decompressobj(algorithm, **kwargs)
+		chunks.append(decompressor.decompress(data))
+
+		if not decompressor.eof:
+			break
+
+		data = decompressor.unused_data
+
+	return b''.join(chunks)
+
+def detect_algorithm(source: Union[bytes, str, IO[bytes]], brotli_probe: int = 4096) -> Optional[str]:
+	"""
+	Detects compression algorithm of bytes-like/file path/stream without loading it:
+	reads only 16 header bytes for magic (zlib header checksum for deflate), zip end of central directory record
+	(via seek, so self-extracting/prefixed zips are found too) - returns `'zip'`,
+	and tries decompressing first `brotli_probe` bytes as brotli (no magic, heuristic, needs brotlicffi; 0 - disable)
+
+	Stream position is restored, non-seekable streams need `peek()`
+	Returns None if not detected
+	"""
+
+	import os
+
+	eocd_magic = b'PK\x05\x06'
+	eocd_size = 22
+	eocd_max = eocd_size + 0xFFFF # Record + max comment
+
+	def tail_has_eocd(tail: bytes) -> bool:
+		position = tail.rfind(eocd_magic)
+
+		while position != -1:
+			# Comment length must reach exactly till the end
+			if position + eocd_size <= len(tail) and int.from_bytes(tail[position + 20:position + 22], 'little') == len(tail) - position - eocd_size:
+				return True
+
+			position = tail.rfind(eocd_magic, 0, position)
+
+		return False
+
+	if is_buffer(source):
+		view = memoryview(source).cast('B')
+		header = bytes(view[:16])
+		probe = view[:brotli_probe]
+		is_zip = lambda: tail_has_eocd(bytes(view[-eocd_max:])) # noqa: E731
+
+	else:
+		own = isinstance(source, (str, os.PathLike))
+		fileobj = open(source, 'rb') if own else source
+		seekable = own or (hasattr(fileobj, 'seekable') and fileobj.seekable())
+
+		try:
+			if seekable:
+				position = fileobj.tell()
+				probe = fileobj.read(max(brotli_probe, 16))
+				size = fileobj.seek(0, 2)
+
+				def is_zip() -> bool:
+					fileobj.seek(max(size - eocd_max, position))
+					tail = fileobj.read()
+					return tail_has_eocd(tail)
+
+				result = _detect_header(probe[:16], probe[:brotli_probe], is_zip)
+				fileobj.seek(position)
+				return result
+
+			elif hasattr(fileobj, 'peek'):
+				probe = fileobj.peek(max(brotli_probe, 16))
+				return _detect_header(probe[:16], probe[:brotli_probe], lambda: False)
+
+			raise ValueError('Stream must be seekable or support peek()')
+
+		finally:
+			if own:
+				fileobj.close()
+
+	return _detect_header(header, probe, is_zip)
+
+def _detect_header(header: bytes, probe: Any, is_zip: Callable[[], bool]) -> Optional[str]:
+	"""`detect_algorithm()` checks for already read header/brotli probe"""
+
+	for algorithm, start_bytes in Codec.magic.items():
+		if not start_bytes or not header.startswith(start_bytes):
+			continue
+
+		# Single 'x' byte is weak, zlib header has method, window and checksum
+		if algorithm == 'deflate' and (len(header) < 2 or header[0] & 0x0F != 8 or header[0] >> 4 > 7 or (header[0] << 8 | header[1]) % 31):
+			continue
+
+		return algorithm
+
+	if header.startswith((b'PK\x03\x04', b'PK\x05\x06')) or is_zip():
+		return 'zip'
+
+	if probe:
+		try:
+			import brotlicffi # type: ignore
+		except ImportError:
+			return
+
+		decompressor = brotlicffi.Decompressor()
+
+		try:
+			output = decompressor.process(bytes(probe))
+		except Exception: # brotlicffi.error
+			return
+
+		# Random data often parses as uncompressed/empty meta-block: real streams expand or end within probe
+		if output and (len(output) > len(probe) or decompressor.is_finished()):
+			return 'brotli'
+
+def content_chunks(
+	fileobj: IO[bytes],
+	avg_size: int = 1 << 20,
+	min_size: Optional[int] = None,
+	max_size: Optional[int] = None
+) -> Iterator[bytes]:
+	"""
+	Content-defined chunking (gear rolling hash): yields chunks with boundaries depending on content,
+	so inserting/removing data shifts only neighbouring chunks.
+	Hash is computed in bulk with numpy (if installed, hundreds of MB/s), pure Python loop (~10 MB/s) otherwise, boundaries are the same
+	"""
+
+	import hashlib
+
+	min_size = min_size or avg_size // 4
+	max_size = max_size or avg_size * 4
+	bits = max(avg_size.bit_length() - 1, 1)
+	mask = ((1 << bits) - 1) << (64 - bits)
+	limit = 0xFFFFFFFFFFFFFFFF
+	gear = [int.from_bytes(hashlib.blake2b(bytes((i,)), digest_size = 8).digest(), 'big') for i in range(256)]
+	buffer = b''
+	eof = False
+
+	try:
+		import numpy as np # type: ignore
+	except ImportError:
+		np = None
+
+	if np is not None:
+		gear_table = np.array(gear, dtype = np.uint64)
+		np_mask = np.uint64(mask)
+		block = 1 << 16 # Cache-sized, stops soon after boundary
+		shifted = np.empty(block + 63, np.uint64)
+
+		def find_cut(start: int, end: int) -> Optional[int]:
+			# h(i) = sum(gear[byte(i - k)] << k), k < 64 (older bytes are shifted out), hashing starts at `start`:
+			# window is doubled 6 times (1 -> 64 bytes) with one vector shift+add each, `block` bytes at a time
+			data = np.frombuffer(buffer, np.uint8, end)
+
+			for block_start in range(start, end, block):
+				context = max(start, block_start - 63)
+				h = np.take(gear_table, data[context:min(block_start + block, end)])
+				size = len(h)
+				shift = 1
+
+				while shift < 64:
+					np.left_shift(h[:size - shift], np.uint64(shift), out = shifted[:size - shift])
+					np.add(h[shift:], shifted[:size - shift], out = h[shift:])
+					shift *= 2
+
+				hits = np.flatnonzero((h[block_start - context:] & np_mask) == 0)
+				if hits.size:
+					return block_start + int(hits[0]) + 1
+
+	else:
+		def find_cut(start: int, end: int) -> Optional[int]:
+			h = 0
+			for i in range(start, end):
+				h = ((h << 1) + gear[buffer[i]]) & limit
+				if not h & mask:
+					return i + 1
+
+	while True:
+		while not eof and len(buffer) < max_size:
+			data = fileobj.read(max_size)
+			if not data:
+				eof = True
+			buffer += data
+
+		if not buffer:
+			return
+
+		end = min(len(buffer), max_size)
+		cut = end
+
+		if end > min_size:
+			cut = find_cut(min_size, end) or end
+
+		yield buffer[:cut]
+		buffer = buffer[cut:]
+
+def make_indexed_archive(
+	source: str,
+	fileobj: IO[bytes],
+	algorithm: Algorithms = 'zstd',
+	level: Optional[int] = None,
+	ignore_errors: Union[type, tuple[type]] = PermissionError,
+	filter: Optional[Callable[[str], bool]] = None,
+	block_size: int = 1 << 22,
+	manifest: Optional[dict] = None,
+	previous: Optional[tuple[IndexedArchive, dict]] = None,
+	cdc: bool = False,
+	**kwargs
+) -> int:
+	"""
+	Writes file/folder into `fileobj` as `IndexedArchive`, returns written bytes
+
+	`manifest` - dict to fill with files (size, mtime, content hash, chunk hashes) and chunk locations,
+	blocks are deduplicated by content hash
+	`previous` - (archive, manifest) of previous run: unchanged files and known chunks are copied
+	as already compressed blocks instead of being read and compressed again
+	`cdc` - split files with `content_chunks()` (`block_size` average) instead of fixed blocks
+	"""
+
+	import os, stat, struct, json
+
+	filtering = callable(filter)
+	tracking = manifest is not None
+	position = 0
+	members = []
+	files = {}
+	chunks = {}
+
+	if tracking:
+		import hashlib
+
+	if previous:
+		previous_archive, previous_manifest = previous
+		previous_files = previous_manifest['files']
+		previous_chunks = previous_manifest['chunks']
+
+	else:
+		previous_files = previous_chunks = {}
+
+	def put(data: bytes):
+		nonlocal position
+		fileobj.write(data)
+		position += len(data)
+
+	if set(kwargs) <= {'dictionary'}:
+		compress_block = Codec.get(algorithm, level, kwargs.get('dictionary')).compress
+	else:
+		compress_block = Codec(algorithm, level, **kwargs).compress
+
+	def put_block(data: bytes) -> list[int]:
+		block = compress_block(data)
+		location = [position, len(block), len(data)]
+		put(block)
+		return location
+
+	def put_chunk(chunk_hash: str, data: Optional[bytes]) -> list[int]:
+		if chunk_hash in chunks:
+			return chunks[chunk_hash]
+
+		elif chunk_hash in previous_chunks:
+			offset, length, size = previous_chunks[chunk_hash]
+			previous_archive.fileobj.seek(previous_archive.base + offset)
+			location = [position, length, size]
+			put(previous_archive.fileobj.read(length))
+
+		else:
+			location = put_block(data)
+
+		chunks[chunk_hash] = location
+		return location
+
+	def add(file_path: str, arcname: str):
+		arcname = arcname.replace(os.sep, '/')
+		blocks = []
+		size = 0
+
+		with open(file_path, 'rb') as f:
+			file_stat = os.fstat(f.fileno())
+			file_chunks = content_chunks(f, block_size) if cdc else iter(lambda: f.read(block_size), b'')
+
+			if not tracking:
+				for chunk in file_chunks:
+					blocks.append(put_block(chunk))
+					size += len(chunk)
+
+			else:
+				known = previous_files.get(arcname)
+
+				# Unchanged file, reuse compressed chunks without reading it
+				if known and known[0] == file_stat.st_size and known[1] == file_stat.st_mtime and all(h in previous_chunks or h in chunks for h in known[3]):
+					file_hash, chunk_hashes = known[2], known[3]
+					blocks = [put_chunk(h, None) for h in chunk_hashes]
+					size = file_stat.st_size
+
+				else:
+					hasher = hashlib.blake2b(digest_size = 16)
+					chunk_hashes = []
+
+					for chunk in file_chunks:
+						hasher.update(chunk)
+						chunk_hash = hashlib.blake2b(chunk, digest_size = 16).hexdigest()
+						chunk_hashes.append(chunk_hash)
+						blocks.append(put_chunk(chunk_hash, chunk))
+						size += len(chunk)
+
+					file_hash = hasher.hexdigest()
+
+				files[arcname] = [size, file_stat.st_mtime, file_hash, chunk_hashes]
+
+		members.append([arcname, size, stat.S_IMODE(file_stat.st_mode), file_stat.st_mtime, blocks])
+
+	put(IndexedArchive.magic + bytes([len(algorithm)]) + algorithm.encode())
+
+	if os.path.isfile(source):
+		add(source, os.path.basename(source))
+
+	else:
+		for root, _, dir_files in os.walk(source):
+			for file in dir_files:
+
+				file_path = os.path.join(root, file)
+				file_rel_path = os.path.relpath(file_path, source)
+				if filtering is True and filter(file_rel_path) is not True:
+					continue
+
+				try:
+					add(file_path, file_rel_path)
+				except ignore_errors:
+					continue
+
+	archive_id = os.urandom(16).hex()
+	index = compress_block(json.dumps({'members': members, 'id': archive_id}, separators = (',', ':')).encode())
+	index_offset = position
+	put(index)
+	put(struct.pack(IndexedArchive.footer_format, index_offset, len(index), IndexedArchive.footer_magic))
+
+	if tracking:
+		manifest['files'] = files
+		manifest['chunks'] = chunks
+		manifest['archive'] = {'id': archive_id, 'index_offset': index_offset, 'index_length': len(index)}
+
+	return position
+
+def make_incremental_archive(
+	source: str,
+	output: str,
+	algorithm: Algorithms = 'zstd',
+	level: Optional[int] = None,
+	ignore_errors: Union[type, tuple[type]] = PermissionError,
+	filter: Optional[Callable[[str], bool]] = None,
+	block_size: int = 1 << 22,
+	cdc: bool = False,
+	**kwargs
+) -> int:
+	"""
+	Writes `IndexedArchive` to `output` path, keeping manifest (`<output>.manifest`) next to it
+
+	If previous archive and its manifest exist (made with same settings), unchanged files (size, mtime)
+	and known chunks (content hash) are copied from it already compressed, only changed data is compressed.
+	Manifest is used only if archive identity (random id, index offset and length) it records matches archive on disk,
+	so archive rewritten by something else or crash between archive and manifest replace means full rebuild.
+	Both files are written to `.tmp` and swapped in with `os.replace()`
+
+	Returns written bytes
+	"""
+
+	import os, json
+
+	manifest_path = f'{output}.manifest'
+	settings = {'algorithm': algorithm, 'level': level, 'block_size': block_size, 'cdc': cdc}
+	previous = None
+
+	if os.path.isfile(output) and os.path.isfile(manifest_path):
+		try:
+			with open(manifest_path, 'rb') as f:
+				previous_manifest = json.load(f)
+
+			if previous_manifest.get('settings') == settings:
+				archive = IndexedArchive(output)
+
+				if archive.id is not None and previous_manifest.get('archive') == archive.identity:
+					previous = (archive, previous_manifest)
+				else:
+					archive.close()
+
+		except (OSError, ValueError, KeyError):
+			previous = None
+
+	manifest = {'settings': settings}
+	target = f'{output}.tmp'
+
+	try:
+		with open(target, 'wb') as f:
+			written = make_indexed_archive(source, f, algorithm, level, ignore_errors, filter, block_size, manifest, previous, cdc, **kwargs)
+
+	except:
+		if os.path.exists(target):
+			os.remove(target)
+		raise
+
+	finally:
+		if previous:
+			previous[0].close()
+
+	os.replace(target, output)
+
+	with open(f'{manifest_path}.tmp', 'w', encoding = 'utf-8') as f:
+		json.dump(manifest, f, separators = (',', ':'))
+
+	os.replace(f'{manifest_path}.tmp', manifest_path)
+	return written
+
+def list_archive(source: Union[str, bytes, IO[bytes]]) -> list[ArchiveMember]:
+	"""Returns `IndexedArchive` members without decompressing them"""
+
+	with IndexedArchive(source) as archive:
+		return list(archive.members.values())
+
+def make_tar(
+	source: str,
+	output: str,
+	ignore_errors: Union[type, tuple[type]] = PermissionError,
+	in_memory: bool = False,
+	filter: Optional[Callable[[str], bool]] = None,
+	fileobj: Optional[IO[bytes]] = None,
+	workers: Optional[int] = None,
+	prefetch_size: int = 1 << 20,
+	stats: Optional['TarStats'] = None
+) -> Union[str, bytes, IO[bytes]]:
+	"""
+	Tars file/folder into `output` path, returns it
+	`in_memory` - returns tar bytes instead
+	`fileobj` - streams tar into writable object (e.g. `CompressWriter`), returns it
+
+	`workers` - walks folder with `os.scandir` and prefetches `stat` and content of files up to `prefetch_size`
+	in a thread pool ahead of the tar writer (bigger files are streamed on writer thread)
+	`stats` - `TarStats` object, filled with file/byte amounts and throughput
+	"""
+
+	import tarfile, os
+	from time import perf_counter
+	filtering = callable(filter)
+	started = perf_counter()
+
+	if fileobj is not None:
+		in_memory = False
+
+	elif in_memory:
+		import io
+		stream = io.BytesIO()
+
+	with tarfile.open(
+		output or None, "w|" if fileobj is not None else "w",
+		fileobj = fileobj if fileobj is not None else stream if in_memory else None
+	) as tar:
+
+		if os.path.isfile(source):
+			tar.add(source, arcname = os.path.basename(source))
+
+			if stats is not None:
+				stats.files += 1
+				stats.bytes += os.path.getsize(source)
+
+		elif workers and workers > 1:
+			import io, stat
+			from concurrent.futures import ThreadPoolExecutor
+			from collections import deque
+
+			def scan(folder: str) -> Iterator[tuple[str, str]]:
+				try:
+					with os.scandir(folder) as it:
+						entries = sorted(it, key = lambda entry: entry.name)
+
+				except ignore_errors:
+					return
+
+				for entry in entries:
+					if entry.is_dir():
+						# Same as os.walk: symlinked folders aren't followed
+						if not entry.is_symlink():
+							yield from scan(entry.path)
+						continue
+
+					file_rel_path = os.path.relpath(entry.path, source)
+					if filtering is True and filter(file_rel_path) is not True:
+						continue
+
+					yield entry.path, file_rel_path
+
+			def prefetch(file_path: str) -> tuple[os.stat_result, Optional[bytes]]:
+				with open(file_path, 'rb') as f:
+					file_stat = os.fstat(f.fileno())
+					content = f.read() if file_stat.st_size <= prefetch_size else None
+
+				return file_stat, content
+
+			pending = deque()
+
+			def write_next():
+				file_path, file_rel_path, future = pending.popleft()
+
+				try:
+					file_stat, content = future.result()
+
+					info = tarfile.TarInfo(file_rel_path.replace(os.sep, '/'))
+					info.mode = stat.S_IMODE(file_stat.st_mode)
+					info.uid = file_stat.st_uid
+					info.gid = file_stat.st_gid
+					info.mtime = file_stat.st_mtime
+
+					if content is not None:
+						info.size = len(content)
+						tar.addfile(info, io.BytesIO(content))
+
+					else:
+						with open(file_path, 'rb') as file_buffer:
+							info.size = os.fstat(file_buffer.fileno()).st_size
+							tar.addfile(info, file_buffer)
+
+				except ignore_errors:
+					return
+
+				if stats is not None:
+					stats.files += 1
+					stats.bytes += info.size
+
+			with ThreadPoolExecutor(workers) as executor:
+				for file_path, file_rel_path in scan(source):
+					pending.append((file_path, file_rel_path, executor.submit(prefetch, file_path)))
+
+					# Bounded read-ahead window
+					if len(pending) > workers * 4:
+						write_next()
+
+				while pending:
+					write_next()
+
+		else:
+
+			for root, _, files in os.walk(source):
+				for file in files:
+
+					file_path = os.path.join(root, file)
+					file_rel_path = os.path.relpath(file_path, source)
+					if filtering is True and filter(file_rel_path) is not True:
+						continue
+
+					try:
+						with open(file_path, 'rb') as file_buffer:
+							file_buffer.peek()
+
+							info = tar.gettarinfo(arcname = file_rel_path, fileobj = file_buffer)
+							tar.addfile(info, file_buffer)
+
+					except ignore_errors:
+						continue
+
+					if stats is not None:
+						stats.files += 1
+						stats.bytes += info.size
+
+	if stats is not None:
+		stats.finish(perf_counter() - started)
+
+	if fileobj is not None:
+		return fileobj
+
+	elif in_memory:
+		stream.seek(0)
+		return stream.read()
+
+	return output
+
+# Zip compression method ids
+zip_methods = {'store': 0, 'deflate': 8, 'bzip2': 12, 'zstd': 93}
+
+def _zip_append_raw(zf: 'zipfile.ZipFile', info: 'zipfile.ZipInfo', data: IO[bytes], chunk_size: int = 1 << 20) -> None:
+	"""
+	Appends already compressed member (`info` with CRC and sizes set) to `zf` opened for writing,
+	central directory entry is written by `zf.close()`.
+
+	Uses private `ZipFile` state (`fp`, `filelist`, `NameToInfo`, `start_dir`, `_didModify`) the way `ZipFile.write()` does,
+	checked against CPython 3.11 `zipfile`, recheck it on upgrades and keep all of it here
+	"""
+
+	import shutil
+
+	fp = zf.fp
+	info.header_offset = fp.tell()
+	fp.write(info.FileHeader())
+	shutil.copyfileobj(data, fp, chunk_size)
+
+	zf.filelist.append(info)
+	zf.NameToInfo[info.filename] = info
+	zf.start_dir = fp.tell()
+	zf._didModify = True
+
+def make_zip(
+	source: str,
+	fileobj: IO[bytes],
+	method: Literal['deflate', 'zstd', 'bzip2', 'store'] = 'deflate',
+	level: Optional[int] = None,
+	workers: Optional[int] = None,
+	ignore_errors: Union[type, tuple[type]] = PermissionError,
+	filter: Optional[Callable[[str], bool]] = None,
+	chunk_size: int = 1 << 20,
+	spool_size: int = 1 << 24
+) -> int:
+	"""
+	Zips file/folder into `fileobj`, returns written byte amount
+
+	Members are compressed in a thread pool of `workers` (`os.cpu_count()` by default) into spooled temporary files
+	(in memory up to `spool_size`), then written sequentially in order with precomputed sizes/CRC,
+	so archive has random access and opens natively (deflate - everywhere, zstd - zip readers with method 93)
+	"""
+
+	import zipfile, zlib, tempfile, os
+	from concurrent.futures import ThreadPoolExecutor
+	from collections import deque
+
+	filtering = callable(filter)
+	method_id = zip_methods[method]
+
+	def new_compressor() -> Optional[Any]:
+		if method == 'deflate':
+			return zlib.compressobj(-1 if level is None else level, zlib.DEFLATED, -15)
+
+		elif method == 'bzip2':
+			import bz2
+			return bz2.BZ2Compressor(9 if level is None else level)
+
+		elif method == 'zstd':
+			return get_compressobj('zstd', level)
+
+	def files() -> Iterator[tuple[str, str]]:
+		if os.path.isfile(source):
+			yield source, os.path.basename(source)
+			return
+
+		for root, _, names in os.walk(source):
+			for name in sorted(names):
+				file_path = os.path.join(root, name)
+				file_rel_path = os.path.relpath(file_path, source)
+				if filtering is True and filter(file_rel_path) is not True:
+					continue
+
+				yield file_path, file_rel_path.replace(os.sep, '/')
+
+	def pack(file_path: str, arcname: str) -> tuple[zipfile.ZipInfo, IO[bytes]]:
+		# Files dated before 1980 (e.g. mtime 0) get clamped instead of raising
+		info = zipfile.ZipInfo.from_file(file_path, arcname, strict_timestamps = False)
+		info.compress_type = method_id
+
+		compressor = new_compressor()
+		spool = tempfile.SpooledTemporaryFile(spool_size)
+		crc = size = 0
+
+		try:
+			with open(file_path, 'rb') as f:
+				while chunk := f.read(chunk_size):
+					crc = zlib.crc32(chunk, crc)
+					size += len(chunk)
+					spool.write(compressor.compress(chunk) if compressor else chunk)
+
+			if compressor:
+				spool.write(compressor.flush())
+
+		except BaseException:
+			spool.close()
+			raise
+
+		info.CRC = crc
+		info.file_size = size
+		info.compress_size = spool.tell()
+		spool.seek(0)
+		return info, spool
+
+	with zipfile.ZipFile(fileobj, 'w') as zf:
+		fp = zf.fp
+		start = fp.tell()
+		pending = deque()
+
+		def write_next():
+			try:
+				info, spool = pending.popleft().result()
+
+			except ignore_errors:
+				return
+
+			with spool:
+				_zip_append_raw(zf, info, spool, chunk_size)
+
+		workers = workers or os.cpu_count() or 1
+		with ThreadPoolExecutor(workers) as executor:
+			for file_path, arcname in files():
+				pending.append(executor.submit(pack, file_path, arcname))
+
+				# Bounded amount of spooled members
+				if len(pending) > workers * 2:
+					write_next()
+
+			while pending:
+				write_next()
+
+	return fp.tell() - start
+
+def sample_content(source: Union[bytes, str, IO[bytes]], sample_size: int = 1 << 18, parts: int = 4) -> bytes:
+	"""
+	Returns up to `sample_size` bytes, taken as `parts` evenly spread slices of bytes/file/seekable buffer,
+	or file heads for folders. Buffer position is restored
+	"""
+
+	import os
+
+	part_size = max(sample_size // parts, 1)
+
+	def spread(size: int, read_at: Callable[[int, int], bytes]) -> bytes:
+		if size <= sample_size:
+			return read_at(0, size)
+
+		step = (size - part_size) // (parts - 1) if parts > 1 else 0
+		return b''.join(read_at(i * step, part_size) for i in range(parts))
 
-	# Store listener reference to prevent garbage collection
-	logger.addHandler(queue_handler)
-	logger.queue_listener = queue_listener
+	if is_buffer(source):
+		return bytes(spread(len(source), lambda offset, size: source[offset:offset + size]))
 
-	return logger
+	elif hasattr(source, 'read'):
+		if not hasattr(source, 'seek') or (hasattr(source, 'seekable') and not source.seekable()):
+			return b''
 
-def get_content(source: Union[str, bytes, IO[bytes]]) -> tuple[Optional[int], Optional[bytes]]:
-	"""
-	Returns source byte content in tuple - (type, content)
-	Source can be either a file_path, readable buffer or just bytes
+		position = source.tell()
+		size = source.seek(0, 2) - position
 
-	First tuple object is source type:
-		1 - bytes
-		2 - readable buffer
-		3 - file path
-		4 - folder path (str)
-		None - unknown
-		...
+		def read_at(offset: int, size: int) -> bytes:
+			source.seek(position + offset)
+			return source.read(size)
 
-	"""
+		try:
+			return spread(size, read_at)
+		finally:
+			source.seek(position)
 
-	if isinstance(source, bytes):
-		return 1, source
+	elif os.path.isfile(source):
+		with open(source, 'rb') as f:
+			def read_at(offset: int, size: int) -> bytes:
+				f.seek(offset)
+				return f.read(size)
 
-	elif hasattr(source, 'read'):
-		return 2, source.read()
+			return spread(os.fstat(f.fileno()).st_size, read_at)
 
-	else:
-		import os
+	elif os.path.isdir(source):
+		sample = bytearray()
 
-		if os.path.isfile(source):
-			return 3, open(source, 'rb').read()
+		for root, _, files in os.walk(source):
+			for file in files:
+				try:
+					with open(os.path.join(root, file), 'rb') as f:
+						sample.extend(f.read(min(part_size, sample_size - len(sample))))
+				except OSError:
+					continue
 
-		elif os.path.isdir(source):
-			return 4, source
+				if len(sample) >= sample_size:
+					return bytes(sample)
 
-		return None, None
+		return bytes(sample)
+
+	return b''
 
-def write_content(content: Union[str, bytes], output: Union[Literal[False], str, IO[bytes]]) -> Optional[Union[int, bytes]]:
+def benchmark_algorithms(
+	sample: bytes,
+	level: Optional[int] = None,
+	candidates: Optional[Iterable[Algorithms]] = None
+) -> dict[str, tuple[float, float]]:
 	"""
-	If output has `write` attribute, writes content to it and returns written bytes
-	If output is False, returns content
-	Otherwise writes content to file and returns written bytes,
-	Or None if output is not a file path
+	Compresses sample with every supported candidate (default: `algorithms`),
+	returns {algorithm: (compression ratio, compression speed MB/s)}
 	"""
 
-	_, content = get_content(content)
+	from time import perf_counter
 
-	if hasattr(output, 'write'):
-		return output.write(content)
+	results = {}
+	size = len(sample) or 1
 
-	elif output is False:
-		return content
+	for algorithm in candidates or algorithms:
+		if not Codec.is_supported(algorithm):
+			continue
 
-	else:
 		try:
-			return open(output, 'wb').write(content)
+			codec = Codec.get(algorithm, level)
+			started = perf_counter()
+			compressed = codec.compress(sample)
+			elapsed = perf_counter() - started
 
-		except:
-			return
+		except Exception: # Invalid level for this algorithm
+			continue
 
-def make_tar(
-	source: str,
-	output: str,
-	ignore_errors: Union[type, tuple[type]] = PermissionError,
-	in_memory: bool = False,
-	filter: Optional[Callable[[str], bool]] = None
-) -> Union[str, bytes]:
+		results[algorithm] = (size / (len(compressed) or 1), size / (elapsed or 1e-9) / 1e6)
 
-	import tarfile, os
-	filtering = callable(filter)
+	return results
 
-	if in_memory:
-		import io
-		stream = io.BytesIO()
+_algorithm_choices = {}
 
-	with tarfile.open(
-		output, "w",
-		fileobj = None if not in_memory else stream
-	) as tar:
+def select_algorithm(
+	source: Union[bytes, str, IO[bytes]],
+	target: Union[Literal['speed', 'ratio'], float] = 'ratio',
+	level: Optional[int] = None,
+	sample_size: int = 1 << 18,
+	candidates: Optional[Iterable[Algorithms]] = None
+) -> Algorithms:
+	"""
+	Picks algorithm by benchmarking a sample of source (see `benchmark_algorithms()`)
 
-		if os.path.isfile(source):
-			tar.add(source, arcname = os.path.basename(source))
+	target:
+		'ratio' - best compression ratio
+		'speed' - fastest compression
+		float - best ratio among algorithms compressing at least this many MB/s (fastest if none)
 
-		else:
+	Decision is cached per file extension (folders share one entry), bytes/buffers are sampled every call
+	"""
 
-			for root, _, files in os.walk(source):
-				for file in files:
+	import os
 
-					file_path = os.path.join(root, file)
-					file_rel_path = os.path.relpath(file_path, source)
-					if filtering is True and filter(file_rel_path) is not True:
-						continue
+	cache_key = None
+	if isinstance(source, str):
+		cache_key = ('<folder>' if os.path.isdir(source) else os.path.splitext(source)[1].lower(), target, level, tuple(candidates or ()))
 
-					try:
-						with open(file_path, 'rb') as file_buffer:
-							file_buffer.peek()
+		if (choice := _algorithm_choices.get(cache_key)) is not None:
+			return choice
 
-							info = tar.gettarinfo(arcname = file_rel_path, fileobj = file_buffer)
-							tar.addfile(info, file_buffer)
+	results = benchmark_algorithms(sample_content(source, sample_size), level, candidates)
 
-					except ignore_errors:
-						continue
+	if not results:
+		raise ValueError('No supported algorithm among candidates')
 
-	if in_memory:
-		stream.seek(0)
-		return stream.read()
+	if target == 'speed':
+		choice = max(results, key = lambda algo: results[algo][1])
 
-	return output
+	elif target == 'ratio':
+		choice = max(results, key = lambda algo: results[algo])
+
+	else:
+		fast_enough = [algo for algo, (_, speed) in results.items() if speed >= target]
+		if fast_enough:
+			choice = max(fast_enough, key = lambda algo: results[algo])
+		else:
+			choice = max(results, key = lambda algo: results[algo][1])
+
+	if cache_key is not None:
+		_algorithm_choices[cache_key] = choice
+
+	return choice
 
 def compress(
 	source: Union[bytes, str, IO[bytes]],
-	algorithm: Algorithms = 'gzip',
+	algorithm: Union[Algorithms, Literal['auto', 'zip']] = 'gzip',
 	output: Union[Literal[False], str, IO[bytes]] = None,
 	ignored_exceptions: Union[type, tuple[type]] = (PermissionError, OSError),
 	tar_in_memory: bool = True,
@@ -1985,6 +4828,19 @@ def compress(
 	compression_level: Optional[int] = None,
 	level: Optional[int] = None,
 	quality: Optional[int] = None,
+	stream: bool = False,
+	chunk_size: int = 1 << 20,
+	workers: Optional[int] = None,
+	block_size: int = 1 << 22,
+	tar_workers: Optional[int] = None,
+	tar_stats: Optional[TarStats] = None,
+	indexed: bool = False,
+	incremental: bool = False,
+	cdc: bool = False,
+	dictionary: Optional[Union[bytes, str]] = None,
+	target: Union[Literal['speed', 'ratio'], float] = 'ratio',
+	zip_method: Literal['deflate', 'zstd', 'bzip2', 'store'] = 'deflate',
+	memory_map: bool = False,
 	**compress_kwargs
 ) -> Union[int, bytes]:
 	'''
@@ -1992,47 +4848,67 @@ def compress(
 	output None - auto path
 	output False - bytes
 	output buffer - fill buffer
+
+	stream - pipes source (or its tar) through incremental compressor into output by `chunk_size` chunks,
+	so peak memory doesn't depend on input size. Returns written compressed byte amount (or bytes if output is False)
+
+	workers - compresses `block_size` blocks in parallel threads (see `CompressWriter`), implies `stream`
+	tar_workers, tar_stats - see `make_tar()` `workers`, `stats`
+
+	indexed - writes seekable `IndexedArchive` (`.sptx`) of `block_size` blocks instead of tar,
+	single members are extracted with `decompress(..., members = [...])`
+	incremental - `indexed` archive with manifest next to output path, only changed files/chunks are re-compressed
+	on repeated runs, see `make_incremental_archive()`. `cdc` - content-defined chunking of files
+
+	dictionary - zstd dictionary bytes/path, see `train_dictionary()`
+
+	algorithm 'auto' - picks algorithm by benchmarking source sample for `target`, see `select_algorithm()`
+	algorithm 'zip' - zip archive of `zip_method` members, compressed in parallel by `workers` threads, see `make_zip()`
+
+	memory_map - one-shot compression of file path reads it through `mmap` without copying (see `get_content()`),
+	file truncated by other process meanwhile kills process with SIGBUS
 	'''
 
-	algorithm_map = {
-		'gzip': (lambda: __import__('gzip').compress, {}, {'level': 'compresslevel'}),
-		'bzip2': (lambda: __import__('bz2').compress, {}, {'level': 'compresslevel'}),
-		'bzip3': (lambda:  __import__('bz3').compress, {}, {}),
-		'lzma': (lambda: __import__('lzma').compress, {}, {'level': 'preset'}),
-		'lzma2': (lambda: __import__('lzma').compress, lambda: {'format': __import__('lzma').FORMAT_XZ}, {'level': 'preset'}),
-		'deflate': (lambda: __import__('zlib').compress, {}, {'level': 'level'}),
-		'lz4': (lambda: __import__('lz4.frame').frame.compress, {}, {'level': 'compression_level'}),
-		'zstd': (lambda: __import__('zstandard').compress, {}, {'level': 'level'}),
-		'brotli': (lambda: __import__('brotlicffi').compress, {}, {'level': 'quality'}),
-	}
+	compression_level = compression_level or level or quality
 
-	get_compress_func, additional_args, slug_map = algorithm_map[algorithm]
+	if algorithm == 'auto':
+		algorithm = select_algorithm(source, target, compression_level)
 
 	if check_algorithm_support:
+		return algorithm == 'zip' or Codec.is_supported(algorithm)
 
-		try:
-			get_compress_func()
-			return True
+	if algorithm == 'zip':
+		import io, os
 
-		except:# ImportError
-			return False
+		if not isinstance(source, str) or not os.path.exists(source):
+			raise ValueError('Zip archive source must be a file/folder path')
 
-	compress = get_compress_func()
+		if output is None:
+			source = os.path.abspath(source).replace('\\', '/')
+			output = f'{source}.zip'
 
-	if callable(additional_args):
-		additional_args = additional_args()
+		is_out_buffer = hasattr(output, 'write')
+		out_buffer = io.BytesIO() if output is False else output if is_out_buffer else open(output, 'wb')
 
-	compression_level = compression_level or level or quality
-	if compression_level:
-		compression_slug = slug_map.get('level')
+		try:
+			written = make_zip(source, out_buffer, zip_method, compression_level, workers, ignored_exceptions, filter, chunk_size)
+		finally:
+			if not is_out_buffer and output is not False:
+				out_buffer.close()
+
+		return out_buffer.getvalue() if output is False else written
 
-		if compression_slug is not None:
-			additional_args[compression_slug] = compression_level
+	if compress_kwargs:
+		codec = Codec(algorithm, compression_level, dictionary, **compress_kwargs)
+	else:
+		codec = Codec.get(algorithm, compression_level, dictionary)
 
-	additional_args.update(compress_kwargs)
+	if dictionary is not None:
+		compress_kwargs['dictionary'] = dictionary
 
 	is_out_buffer = hasattr(output, 'write')
 	tar_in_memory = is_out_buffer or tar_in_memory
+	indexed = indexed or incremental
 	import os
 
 	is_folder = None
@@ -2040,30 +4916,89 @@ def compress(
 		if output is not False and isinstance(source, str) and os.path.exists(source):
 			source = os.path.abspath(source).replace('\\', '/')
 			is_folder = os.path.isdir(source)
-			output = f'{os.path.dirname(source)}/{os.path.basename(source)}{".tar" if is_folder else ""}.{algorithm}'
+
+			if indexed:
+				output = f'{os.path.dirname(source)}/{os.path.basename(source)}.sptx'
+			else:
+				output = f'{os.path.dirname(source)}/{os.path.basename(source)}{".tar" if is_folder else ""}.{algorithm}'
 
 		else:
 			output = False
 
-	if isinstance(source, bytes):
-		compressed = compress(
-			source, **additional_args
-		)
+	if indexed:
+		import io
+
+		if not isinstance(source, str) or not os.path.exists(source):
+			raise ValueError('Indexed archive source must be a file/folder path')
+
+		if incremental:
+			if not isinstance(output, str):
+				raise ValueError('Incremental archive output must be a file path')
+
+			return make_incremental_archive(source, output, algorithm, compression_level, ignored_exceptions, filter, block_size, cdc, **compress_kwargs)
+
+		out_buffer = io.BytesIO() if output is False else output if is_out_buffer else open(output, 'wb')
+
+		try:
+			written = make_indexed_archive(source, out_buffer, algorithm, compression_level, ignored_exceptions, filter, block_size, cdc = cdc, **compress_kwargs)
+		finally:
+			if not is_out_buffer and output is not False:
+				out_buffer.close()
+
+		return out_buffer.getvalue() if output is False else written
+
+	if is_folder is None and isinstance(source, str) and os.path.exists(source):
+		is_folder = os.path.isdir(source)
+
+	if stream or (workers and workers > 1):
+		import io
+
+		out_buffer = io.BytesIO() if output is False else output if is_out_buffer else open(output, 'wb')
+
+		try:
+			with CompressWriter(out_buffer, algorithm, compression_level, workers, block_size, **compress_kwargs) as writer:
+				if is_buffer(source):
+					view = memoryview(source)
+					for i in range(0, len(view), chunk_size):
+						writer.write(view[i:i + chunk_size])
+
+				elif hasattr(source, 'read'):
+					while chunk := source.read(chunk_size):
+						writer.write(chunk)
+
+				elif not tar_if_file and is_folder is False:
+					with open(source, 'rb') as f:
+						while chunk := f.read(chunk_size):
+							writer.write(chunk)
+
+				else:
+					make_tar(source, None, ignored_exceptions, filter = filter, fileobj = writer, workers = tar_workers, stats = tar_stats)
+
+		finally:
+			if not is_out_buffer and output is not False:
+				out_buffer.close()
+
+		return out_buffer.getvalue() if output is False else writer.bytes_out
+
+	if is_buffer(source):
+		compressed = codec.compress(source)
 
 	else:
 		if not tar_if_file and is_folder is False:
-			with open(source, 'rb') as f:
-				compressed = compress(f.read(), **additional_args)
+			compressed = codec.compress(get_content(source, memory_map = memory_map)[1])
 
 		else:
 			tar_path = '' if tar_in_memory else output + '.tar'
 			if isinstance(output, str) and os.path.exists(output):
 				os.remove(output)
 
-			stream = make_tar(source, tar_path, ignored_exceptions, tar_in_memory, filter)
-			compressed = compress(stream if tar_in_memory else tar_path, **additional_args)
+			stream = make_tar(source, tar_path, ignored_exceptions, tar_in_memory, filter, workers = tar_workers, stats = tar_stats)
+			if tar_in_memory:
+				compressed = codec.compress(stream)
+
+			else:
+				compressed = codec.compress(get_content(tar_path, memory_map = memory_map)[1])
 
-			if not tar_in_memory:
 				os.remove(tar_path)
 
 	return write_content(compressed, output)
@@ -2072,75 +5007,186 @@ def decompress(
 	source: Union[bytes, str, IO[bytes]],
 	algorithm: Optional[Algorithms] = None,
 	output: Optional[Union[Literal[False], str, IO[bytes]]] = None,
+	stream: bool = False,
+	chunk_size: int = 1 << 20,
+	members: Optional[Iterable[str]] = None,
+	dictionary: Optional[Union[bytes, str]] = None,
+	memory_map: bool = False,
 	**kwargs
-) -> Union[int, str, bytes]:
+) -> Union[int, str, bytes, dict[str, bytes]]:
+	'''
+	output str - path (tar archives are extracted into it)
+	output None - auto path (bytes for bytes source)
+	output False - bytes
+	output buffer - fill buffer
 
-	algorithm_map = {
-		'gzip': (lambda: __import__('gzip').decompress, b'\x1f\x8b\x08'),
-		'bzip2': (lambda: __import__('bz2').decompress, b'BZh'),
-		'bzip3': (lambda: __import__('bz3').decompress, b'BZ3v1'),
-		'lzma': (lambda: __import__('lzma').decompress, b'\xfd7zXZ'),
-		'deflate': (lambda: __import__('zlib').decompress, b'x'),
-		'lz4': (lambda: __import__('lz4.frame').frame.decompress, b'\x04\x22\x4d\x18'),
-		'zstd': (lambda: __import__('zstandard').decompress, b'\x28\xb5\x2f\xfd'),
-		'brotli': (lambda: __import__('brotlicffi').decompress, None),
-	}
-	algorithm_map['lzma2'] = algorithm_map['lzma']
+	stream - detects algorithm from the first bytes only and decompresses source by `chunk_size` chunks
+	straight into output/tar extraction, keeping memory usage constant
 
-	type, content = get_content(source)
+	members - `IndexedArchive` member paths to extract (all by default), see `IndexedArchive.unpack()` for outputs
+	dictionary - zstd dictionary bytes/path used at compression
+	memory_map - non-stream file path source is read through `mmap` without copying, see `compress()`
+	'''
 
-	if content is None:
-		raise ValueError('Unknown source content type')
+	if dictionary is not None:
+		kwargs['dictionary'] = dictionary
 
-	if not algorithm:
-		for algo, (decompress, start_bytes) in algorithm_map.items():
-			if not start_bytes:
-				continue
+	if IndexedArchive.is_indexed(source):
+		if output is None:
+			import os
 
-			elif callable(start_bytes):
-				algorithm = algo if start_bytes(content) else None
+			if is_buffer(source):
+				output = False
+			elif isinstance(source, str):
+				output = os.path.abspath(source).replace("\\", "/").rsplit(".", 1)[0]
 
-			elif content.startswith(start_bytes):
-				algorithm = algo
-				break
+		with IndexedArchive(source) as archive:
+			return archive.unpack(output, members)
 
-		if not algorithm:
-			try:
-				import zipfile, io, os
+	elif members is not None:
+		raise ValueError('`members` can only be used with indexed archives')
+
+
+	if stream:
+		import os, io
+
+		if is_buffer(source):
+			type, fileobj = 1, io.BytesIO(source)
+		elif hasattr(source, 'read'):
+			type, fileobj = 2, source
+		elif isinstance(source, str) and os.path.isfile(source):
+			type, fileobj = 3, open(source, 'rb')
+		else:
+			raise ValueError('Unknown source content type')
+
+		try:
+			seekable = type != 2 or (hasattr(fileobj, 'seekable') and fileobj.seekable())
+
+			# Only header is needed to detect algorithm
+			if not algorithm and seekable:
+				algorithm = detect_algorithm(fileobj)
+
+			header = fileobj.read(16)
+
+			if not algorithm:
+				algorithm = detect_algorithm(header)
 
-				stream = io.BytesIO(content)
-				if zipfile.is_zipfile(stream):
-					stream.seek(0)
+			if output is None:
+				if type == 1:
+					output = False # Return bytes
+				elif type != 2:
+					output = os.path.abspath(source).replace("\\", "/").rsplit(".", 1)[0]
 
-					# Determine default output if not set yet
-					if output is None:
-						if type == 1:
-							output = False  # return raw bytes
-						elif type != 2:
-							output = os.path.abspath(source).replace("\\", "/").rsplit(".", 1)[0]
+			if not algorithm:
+				raise ValueError(
+					f"Couldn't detect algorithm for decompression. "
+					f"First 10 bytes: {header[:10]}"
+				)
 
-					if output is False:
-						return content
+			if algorithm == 'zip':
+				if isinstance(output, str):
+					import zipfile
 
-					elif hasattr(output, 'write'):
-						return output.write(content)
+					if type == 3:
+						zip_source = source
+					else:
+						fileobj.seek(0)
+						zip_source = fileobj
 
-					# Extract zip archive
-					with zipfile.ZipFile(stream) as zf:
+					with zipfile.ZipFile(zip_source) as zf:
 						zf.extractall(output)
 
 					return output
 
-			except Exception:
-				pass
+				if output is False:
+					return header + fileobj.read()
+
+				written = output.write(header)
+				while chunk := fileobj.read(chunk_size):
+					written += output.write(chunk)
+
+				return written
+
+			reader = DecompressReader(fileobj, algorithm, chunk_size, header, **kwargs)
+
+			if output is False:
+				return reader.read()
+
+			elif hasattr(output, 'write'):
+				written = 0
+				while chunk := reader.read(chunk_size):
+					written += output.write(chunk)
+
+				return written
+
+			import tarfile
+
+			try:
+				tarfile.TarInfo.frombuf(reader.peek(tarfile.BLOCKSIZE), tarfile.ENCODING, 'surrogateescape')
+				is_tar = True
+			except tarfile.HeaderError:
+				is_tar = False
+
+			if is_tar:
+				import sys
+				if output.endswith('.tar'):
+					output = output[:-4]
+
+				with tarfile.open(fileobj = reader, mode = 'r|') as tar:
+					if sys.version_info >= (3, 12):
+						tar.extractall(output, filter = 'data')
+					else:
+						tar.extractall(output)
+
+			else:
+				write_content(reader, output)
+
+			return output
 
+		finally:
+			if type == 3:
+				fileobj.close()
+
+	type, content = get_content(source, memory_map = memory_map)
+
+	if content is None:
+		raise ValueError('Unknown source content type')
+
+	if not algorithm:
+		algorithm = detect_algorithm(content)
+
+		if not algorithm:
 			raise ValueError(
 				f"Couldn't detect algorithm for decompression. "
-				f"First 10 bytes: {content[:10]}"
+				f"First 10 bytes: {bytes(content[:10])}"
 			)
 
-	decompress = algorithm_map[algorithm][0]()
-	result = decompress(content, **kwargs)
+	if algorithm == 'zip':
+		import zipfile, io, os
+
+		# Determine default output if not set yet
+		if output is None:
+			if type == 1:
+				output = False  # return raw bytes
+			elif type != 2:
+				output = os.path.abspath(source).replace("\\", "/").rsplit(".", 1)[0]
+
+		if output is False:
+			return bytes(content) # Memory-mapped file source is memoryview
+
+		elif hasattr(output, 'write'):
+			return output.write(content)
+
+		# Extract zip archive
+		with zipfile.ZipFile(source if type == 3 else io.BytesIO(content)) as zf:
+			zf.extractall(output)
+
+		return output
+
+	if set(kwargs) <= {'dictionary'}:
+		result = Codec.get(algorithm, dictionary = dictionary).decompress(content)
+	else:
+		result = decompress_members(algorithm, content, **kwargs)
 
 	if output is None:
 		if type == 1:
@@ -2161,22 +5207,215 @@ def decompress(
 	stream = io.BytesIO(result)
 	is_tar = tarfile.is_tarfile(stream)
 
-	if is_tar:
-		import sys
-		stream.seek(0)
-		if output.endswith('.tar'):
-			output = output[:-4]
+	if is_tar:
+		import sys
+		stream.seek(0)
+		if output.endswith('.tar'):
+			output = output[:-4]
+
+		if sys.version_info >= (3, 12):
+			tarfile.open(fileobj = stream).extractall(output, filter = 'data')
+		else:
+			tarfile.open(fileobj = stream).extractall(output)
+
+	else:
+		write_content(result, output)
+
+	return output
+
+def _decompress_one(source: str, output: Optional[str], ignore_errors: bool, kwargs: dict) -> DecompressResult:
+	"""`decompress_many()` worker, module level to be picklable for process pools"""
+
+	import os, time
+
+	result = DecompressResult(source)
+	start = time.perf_counter()
+
+	try:
+		result.size_in = os.path.getsize(source)
+		result.output = output = decompress(source, output = output, stream = True, **kwargs)
+
+		if os.path.isdir(output):
+			result.size_out = sum(
+				os.path.getsize(os.path.join(root, file))
+				for root, _, files in os.walk(output)
+				for file in files
+			)
+
+		else:
+			result.size_out = os.path.getsize(output)
+
+	except Exception as e:
+		if not ignore_errors:
+			raise
+
+		result.error = f'{type(e).__name__}: {e}'
+
+	result.elapsed = time.perf_counter() - start
+	return result
+
+def decompress_many(
+	sources: Iterable[str],
+	output_dir: Optional[str] = None,
+	workers: Optional[int] = None,
+	processes: bool = False,
+	ignore_errors: bool = True,
+	chunk_size: int = 1 << 20,
+	**kwargs
+) -> list[DecompressResult]:
+	"""
+	Decompresses many files in parallel, each one streamed to disk by `decompress(..., stream = True)`
+	(algorithm detected by magic bytes unless `algorithm` kwarg is passed)
+
+	output_dir - directory for outputs (source name without last extension), next to sources by default.
+		Sources with same name from different folders keep their path relative to common folder of all sources,
+		ValueError if outputs still collide (e.g. `a.gz` and `a.zst`)
+	workers - pool size, `os.cpu_count()` by default
+	processes - use process pool instead of threads (zlib/lz4/zstd release GIL, so threads are usually enough)
+	ignore_errors - store failure in `DecompressResult.error` instead of raising
+
+	Returns `DecompressResult` per source, in order
+	"""
+
+	import os
+	from functools import partial
+	from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+	sources = list(sources)
+
+	if output_dir is not None:
+		from collections import Counter
+
+		def key(name: str) -> str:
+			return os.path.normcase(os.path.normpath(name))
+
+		names = [os.path.basename(source).rsplit('.', 1)[0] for source in sources]
+		counts = Counter(map(key, names))
+
+		if any(count > 1 for count in counts.values()):
+			root = os.path.commonpath([os.path.dirname(os.path.abspath(source)) for source in sources])
+			names = [
+				os.path.relpath(os.path.abspath(source), root).rsplit('.', 1)[0] if counts[key(name)] > 1 else name
+				for source, name in zip(sources, names)
+			]
+
+			if duplicates := [name for name, count in Counter(map(key, names)).items() if count > 1]:
+				raise ValueError(f'Sources decompress to same output: {", ".join(duplicates)}')
+
+		outputs = [os.path.join(output_dir, name) for name in names]
+
+		for directory in {output_dir, *map(os.path.dirname, outputs)}:
+			os.makedirs(directory, exist_ok = True)
+	else:
+		outputs = [None] * len(sources)
+
+	kwargs['chunk_size'] = chunk_size
+	workers = min(workers or os.cpu_count() or 1, len(sources) or 1)
+	pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+
+	with pool(workers) as executor:
+		return list(executor.map(partial(_decompress_one, ignore_errors = ignore_errors, kwargs = kwargs), sources, outputs))
+
+async def acompress(
+	source: Union[bytes, str, IO[bytes]],
+	algorithm: Union[Algorithms, Literal['auto']] = 'gzip',
+	output: Union[Literal[False], str, IO[bytes]] = None,
+	executor: Optional[Any] = None,
+	chunk_size: int = 1 << 20,
+	level: Optional[int] = None,
+	**kwargs
+) -> Union[int, bytes]:
+	"""
+	Async `compress()`, doesn't block event loop
+
+	Bytes payload with bytes/buffer output is fed to incremental compressor chunk by chunk in `executor`
+	(default - loop's thread pool), yielding to event loop between chunks.
+	Anything else (and any `ProcessPoolExecutor` job) runs streaming `compress()` in `executor` as a whole
+	"""
+
+	import asyncio
+	from functools import partial
+	from concurrent.futures import ProcessPoolExecutor
+
+	loop = asyncio.get_running_loop()
+	chunked = is_buffer(source) and (output is False or hasattr(output, 'write')) and not kwargs
+
+	if not chunked or isinstance(executor, ProcessPoolExecutor):
+		kwargs.setdefault('stream', True)
+		return await loop.run_in_executor(executor, partial(
+			compress, source, algorithm, output, chunk_size = chunk_size, compression_level = level, **kwargs
+		))
+
+	if algorithm == 'auto':
+		algorithm = await loop.run_in_executor(executor, select_algorithm, source, 'ratio', level)
+
+	compressor = get_compressobj(algorithm, level)
+	chunks = [] if output is False else None
+	written = 0
+
+	def put(chunk: bytes):
+		nonlocal written
+		if not chunk:
+			return
+
+		if chunks is not None:
+			chunks.append(chunk)
+		else:
+			output.write(chunk)
+
+		written += len(chunk)
+
+	view = memoryview(source)
+	for i in range(0, len(view), chunk_size):
+		put(await loop.run_in_executor(executor, compressor.compress, view[i:i + chunk_size]))
+
+	put(await loop.run_in_executor(executor, compressor.flush))
+	return b''.join(chunks) if chunks is not None else written
+
+async def adecompress(
+	source: Union[bytes, str, IO[bytes]],
+	algorithm: Optional[Algorithms] = None,
+	output: Optional[Union[Literal[False], str, IO[bytes]]] = None,
+	executor: Optional[Any] = None,
+	chunk_size: int = 1 << 20,
+	**kwargs
+) -> Union[int, str, bytes]:
+	"""
+	Async `decompress()`, doesn't block event loop
+
+	Bytes payload with bytes/buffer output is decompressed chunk by chunk in `executor`, yielding between chunks.
+	Anything else (and any `ProcessPoolExecutor` job) runs streaming `decompress()` in `executor` as a whole
+	"""
+
+	import asyncio, io
+	from functools import partial
+	from concurrent.futures import ProcessPoolExecutor
+
+	loop = asyncio.get_running_loop()
+	chunked = is_buffer(source) and (output is None or output is False or hasattr(output, 'write')) and not kwargs
+
+	if chunked and not algorithm:
+		algorithm = detect_algorithm(source)
+
+	if not chunked or algorithm in (None, 'zip') or IndexedArchive.is_indexed(source) or isinstance(executor, ProcessPoolExecutor):
+		kwargs.setdefault('stream', True)
+		return await loop.run_in_executor(executor, partial(
+			decompress, source, algorithm, output, chunk_size = chunk_size, **kwargs
+		))
+
+	reader = DecompressReader(io.BytesIO(source), algorithm, chunk_size)
+	chunks = [] if not output else None
+	written = 0
 
-		if sys.version_info >= (3, 12):
-			tarfile.open(fileobj = stream).extractall(output, filter = 'data')
+	while chunk := await loop.run_in_executor(executor, reader.read, chunk_size):
+		if chunks is not None:
+			chunks.append(chunk)
 		else:
-			tarfile.open(fileobj = stream).extractall(output)
+			output.write(chunk)
 
-	else:
-		with open(output, 'wb') as f:
-			f.write(result)
+		written += len(chunk)
 
-	return output
+	return b''.join(chunks) if chunks is not None else written
 
 def compress_images(images: dict[str, Iterable[int]], page_amount: int = None, repetitive: bool = False) -> bytes:
 	"""
@@ -2191,6 +5430,8 @@ def compress_images(images: dict[str, Iterable[int]], page_amount: int = None, r
 
 	Failure to meet these conditions will result in CORRUPTED output
 
+	Long page lists are encoded with numpy (if installed), output is the same
+
 	"""
 
 	import struct
@@ -2201,6 +5442,11 @@ def compress_images(images: dict[str, Iterable[int]], page_amount: int = None, r
 		if numbers_len == 1:
 			return struct.pack(STRUCT, numbers[0])
 
+		if np is not None and numbers_len >= NUMPY_MIN_LENGTH:
+			encoded = encode_numbers_np(numbers)
+			if encoded is not None:
+				return encoded
+
 		data = bytearray()
 		stepless255 = next((False for i in range(len(numbers) - 1) if numbers[i + 1] - numbers[i] >= 0xFF), True)
 		set_encoding(stepless255)
@@ -2255,6 +5501,70 @@ def compress_images(images: dict[str, Iterable[int]], page_amount: int = None, r
 
 		return bytes(data)
 
+	def encode_numbers_np(numbers: list[int]) -> Optional[bytes]:
+		"""
+		Vectorized `encode_numbers()`: steps via `np.diff`, constant step runs via comparison of neighbour steps,
+		regular steps between ranges are written as slices of single `tobytes()`.
+		Returns None for lists the format can't hold (unsorted, repeated, too big steps) - pure Python path handles them
+		"""
+
+		from bisect import bisect_left
+
+		steps = np.diff(np.asarray(numbers, dtype = np.int64))
+		if steps.min() < 1 or steps.max() > 0xFFFF:
+			return
+
+		set_encoding(bool(steps.max() < 0xFF))
+		width = 1 if struct_format == '>B' else 2
+		steps_bytes = steps.astype(np.uint8 if width == 1 else '>u2').tobytes()
+
+		# Constant step runs [start, end) of step indices. Range of run's numbers can start at number index i >= 1
+		# while it has more than 3 numbers left (i <= end - 3) and always ends with run, at number index `end`
+		bounds = np.flatnonzero(steps[1:] != steps[:-1]) + 1
+		run_starts = np.concatenate(([0], bounds))
+		run_ends = np.append(bounds, steps.size)
+		first_starts = np.maximum(run_starts, 1)
+		last_starts = run_ends - 3
+		ranged = first_starts <= last_starts
+
+		first_starts = first_starts[ranged].tolist()
+		last_starts = last_starts[ranged].tolist()
+		run_ends = run_ends[ranged].tolist()
+		run_steps = steps[run_starts[ranged]].tolist()
+
+		data = bytearray(struct.pack(STRUCT, numbers[0]))
+		data.extend(encoding)
+
+		numbers_len = len(numbers)
+		i, k = 1, 0
+
+		while i < numbers_len:
+			# First run, where range can start at or after i
+			k = bisect_left(last_starts, i, k)
+
+			if k == len(last_starts):
+				data.extend(steps_bytes[(i - 1) * width:])
+				break
+
+			range_start = max(first_starts[k], i)
+			range_step = run_steps[k]
+
+			# Regular numbers up to range
+			data.extend(steps_bytes[(i - 1) * width:(range_start - 1) * width])
+			data.extend(FUNCTION)
+
+			if range_step == 1:
+				data.extend(RANGE_FUNCTION)
+			else:
+				data.extend(STEP_RANGE_FUNCTION)
+				data.extend(struct.pack(STRUCT, range_step))
+
+			data.extend(struct.pack(struct_format, numbers[range_start] - numbers[range_start - 1]))
+			data.extend(struct.pack(STRUCT, run_ends[k] - range_start + 1))
+			i = run_ends[k] + 1
+
+		return bytes(data)
+
 	def set_encoding(Uint8 = False):
 		nonlocal FUNCTION, struct_format, encoding, separator
 
@@ -2278,12 +5588,20 @@ def compress_images(images: dict[str, Iterable[int]], page_amount: int = None, r
 	STEP_RANGE_FUNCTION = b'\x02'  # Stepped range
 	# CONSEC_BYTES_FUNCTION = b'\x03'
 	STRUCT = struct_format = '>B'
+	NUMPY_MIN_LENGTH = 512 # Shorter lists are faster without numpy overhead
 
 	# Default extension, page amount from received data
 	default_ext = max(images, key = lambda ext: len(images[ext]))
 	page_amount = page_amount or max(max(sublist) for sublist in images.values())
 	assert page_amount < 65535, "Invalid page amount, Allowed from 1 to 65534"
 
+	np = None
+	if page_amount >= NUMPY_MIN_LENGTH:
+		try:
+			import numpy as np # type: ignore
+		except ImportError:
+			pass
+
 	# Choose encoding type
 	if page_amount >= 0xFF:
 		set_encoding()
@@ -2416,6 +5734,21 @@ def decompress_images(data: bytes) -> dict[str, list[int]]:
 
 				prev_page = numbers[-1]
 
+			elif np is not None:  # Whole stretch of regular numbers up to function/separator at once
+				end = max(stretch_end(index), index + int_size)
+
+				if end - index >= NUMPY_MIN_STRETCH * int_size:
+					steps = np.frombuffer(data, np.uint8 if int_size == 1 else '>u2', (end - index) // int_size, index)
+					numbers.extend((np.cumsum(steps, dtype = np.int64) + prev_page).tolist())
+
+				else:
+					for step, in struct.iter_unpack(struct_format, data[index:end]):
+						prev_page += step
+						numbers.append(prev_page)
+
+				prev_page = numbers[-1]
+				index = end
+
 			else:  # Regular number
 				prev_page = prev_page + struct.unpack(struct_format, data[index:index + int_size])[0]
 				index += int_size
@@ -2423,6 +5756,20 @@ def decompress_images(data: bytes) -> dict[str, list[int]]:
 
 		return numbers
 
+	def stretch_end(index: int) -> int:
+		"""Index of the first function/separator token (or data end) from `index`, tokens are `int_size` aligned to it"""
+
+		offset = index % int_size
+		key = (int_size, offset)
+
+		if (stops := stop_tokens.get(key)) is None:
+			tokens = np.frombuffer(data, np.uint8 if int_size == 1 else '>u2', (LENGTH - offset) // int_size, offset)
+			# Steps are never 0 or FUNCTION, so these are the only stretch terminators
+			stops = stop_tokens[key] = (np.flatnonzero((tokens == 0) | (tokens == (0xFF if int_size == 1 else 0xFFFF))) * int_size + offset).tolist()
+
+		k = bisect_left(stops, index)
+		return stops[k] if k < len(stops) else LENGTH - (LENGTH - index) % int_size
+
 	# --------------------CONSTANTS--------------------
 	# Custom Bytes
 	SEPARATOR = EXT_SEPARATOR = separator = b'\x00'
@@ -2436,6 +5783,18 @@ def decompress_images(data: bytes) -> dict[str, list[int]]:
 	# Stream constants
 	index = 0
 	LENGTH = len(data)
+	NUMPY_MIN_STRETCH = 16
+	stop_tokens = {}
+	np = None
+
+	# Small blobs are faster without numpy overhead
+	if LENGTH >= 256:
+		from bisect import bisect_left
+
+		try:
+			import numpy as np # type: ignore
+		except ImportError:
+			pass
 
 	# STRUCTURE:
 	# & - SEPARATOR, && - EXT_SEPARATOR, | - possible EOData, [...] - repeated stuff
@@ -2497,163 +5856,442 @@ def decompress_images(data: bytes) -> dict[str, list[int]]:
 
 	return images
 
-def compress_images_2d(images: dict[str, Iterable[int]], page_amount: int = None, repetitive: bool = False) -> bytes:
-	def encode_varint(n: int) -> bytes:
-		result = bytearray()
-		while True:
-			byte = n & 0x7F
-			n >>= 7
-			if n:
-				result.append(byte | 0x80)
-			else:
-				result.append(byte)
-				break
-		return bytes(result)
-
-	def find_grid_pattern(numbers: list[int], i: int) -> tuple[int, int, int]:
-		"""Looks ahead to find 2D periodic blocks. Returns (block_length, stride, block_count) or None."""
-		n_len = len(numbers)
+def _encode_varint(n: int) -> bytes:
+	result = bytearray()
+	while True:
+		byte = n & 0x7F
+		n >>= 7
+		if n:
+			result.append(byte | 0x80)
+		else:
+			result.append(byte)
+			break
+	return bytes(result)
 
-		L = 1
-		while i + L < n_len and numbers[i + L] == numbers[i + L - 1] + 1:
-			L += 1
+def _varint_size(n: int) -> int:
+	"""`len(_encode_varint(n))` without encoding"""
+	return (n.bit_length() + 6) // 7 or 1
 
-		if L == 1 or i + L >= n_len:
-			return None
+def _find_grid_pattern(numbers: list[int], i: int, consecutive: list[int]) -> Optional[tuple[int, int, int]]:
+	"""
+	Looks ahead to find 2D periodic blocks. Returns (block_length, stride, block_count) or None.
+	`consecutive[k]` - length of +1 run starting at k, so every block is checked in O(1)
+	"""
 
-		stride = numbers[i + L] - numbers[i]
-		if stride <= L:
-			return None
+	n_len = len(numbers)
+	L = consecutive[i]
 
-		blocks = 1
-		while i + (blocks + 1) * L <= n_len:
-			expected_start = numbers[i] + blocks * stride
-			match = True
-			for j in range(L):
-				if numbers[i + blocks * L + j] != expected_start + j:
-					match = False
-					break
-			if not match:
-				break
-			blocks += 1
+	if L == 1 or i + L >= n_len:
+		return None
 
-		if blocks > 1:
-			return L, stride, blocks
+	stride = numbers[i + L] - numbers[i]
+	if stride <= L:
 		return None
 
-	def encode_numbers_2d(numbers: list[int]) -> bytes:
-		if not numbers:
-			return b''
+	blocks = 1
+	start = numbers[i]
+	while i + (blocks + 1) * L <= n_len:
+		block = i + blocks * L
+		if numbers[block] != start + blocks * stride or consecutive[block] < L:
+			break
+		blocks += 1
 
-		data = bytearray()
-		data.extend(encode_varint(numbers[0]))
-		prev_page = numbers[0]
+	if blocks > 1:
+		return L, stride, blocks
+	return None
 
-		i = 1
-		n_len = len(numbers)
-		while i < n_len:
-			page = numbers[i]
-			from_prev = page - prev_page
+def _scan_numbers_2d(numbers: list[int]) -> tuple[list[int], list[int], list[int], list[int]]:
+	"""
+	Single backward pass over non-empty sorted `numbers`, returns (consecutive, steps, bitset_stop, bitset_bound):
+	consecutive[k] - length of +1 run from k, steps[k] - length of constant step run of gaps from k (gap k = numbers[k] - numbers[k - 1]),
+	bitset_stop[k] - first index after k with gap > 16 (bitset scan end), bitset_bound[k] - max(8j - numbers[j]) over j in (k, bitset_stop[k])
+	"""
 
-			# 1. Try 2D Grid Pattern First
-			grid = find_grid_pattern(numbers, i)
-			if grid:
-				block_length, stride, block_count = grid
+	n_len = len(numbers)
+	last = n_len - 1
+	NO_BOUND = -1 << 62
 
-				raw_cost = (block_length - 1) * block_count + (block_count - 1) * len(encode_varint(stride - block_length))
-				comp_cost = 2 + len(encode_varint(from_prev)) + len(encode_varint(block_length)) + len(encode_varint(stride)) + len(encode_varint(block_count))
+	consecutive = [1] * n_len
+	steps = [1] * n_len
+	bitset_stop = [n_len] * n_len
+	bitset_bound = [NO_BOUND] * n_len
+	next_page = numbers[last]
 
-				if comp_cost < raw_cost:
-					data.extend(b'\x00\x03')
-					data.extend(encode_varint(from_prev))
-					data.extend(encode_varint(block_length))
-					data.extend(encode_varint(stride))
-					data.extend(encode_varint(block_count))
+	for k in range(last - 1, -1, -1):
+		page = numbers[k]
+		gap = next_page - page
 
-					i += block_length * block_count
-					prev_page = numbers[i - 1]
-					continue
+		if gap == 1:
+			consecutive[k] = consecutive[k + 1] + 1
 
-			# 2. Fallback to 1D Patterns (Ranges and Steps)
-			if i + 1 < n_len:
-				step = numbers[i + 1] - page
-				length = 1
+		if k and page - numbers[k - 1] == gap:
+			steps[k] = steps[k + 1] + 1
 
-				while i + length < n_len and numbers[i + length] == page + step * length:
-					length += 1
+		if gap > 16:
+			bitset_stop[k] = k + 1
+		else:
+			bitset_stop[k] = bitset_stop[k + 1]
+			bound = 8 * k + 8 - next_page
+			next_bound = bitset_bound[k + 1]
+			bitset_bound[k] = bound if bound > next_bound else next_bound
 
-				step_cost = len(encode_varint(step))
-				raw_cost = (length - 1) * step_cost
+		next_page = page
 
-				if step == 1 and (2 + len(encode_varint(length)) < raw_cost):
-					data.extend(b'\x00\x01')
-					data.extend(encode_varint(from_prev))
-					data.extend(encode_varint(length))
-					i += length
-					prev_page = numbers[i - 1]
-					continue
-				elif step > 1 and (2 + step_cost + len(encode_varint(length)) < raw_cost):
-					data.extend(b'\x00\x02')
-					data.extend(encode_varint(step))
-					data.extend(encode_varint(from_prev))
-					data.extend(encode_varint(length))
-					i += length
-					prev_page = numbers[i - 1]
-					continue
+	return consecutive, steps, bitset_stop, bitset_bound
+
+def _encode_numbers_2d(numbers: list[int]) -> bytes:
+	"""
+	`compress_images_2d()` page list encoder
+
+	Greedy per position: 2D grid, 1D range, bitset block, raw varint delta.
+	Run lengths, bitset scan bounds and savings upper bounds are precomputed by `_scan_numbers_2d()`,
+	so every position costs O(1) amortized instead of rescanning forward
+	"""
 
-			# 3. NEW: Try Bitset Block
-			best_j = -1
-			best_savings = 0
-			varint_cost_sum = len(encode_varint(from_prev))
+	encode_varint = _encode_varint
+	varint_size = _varint_size
 
-			for j in range(i + 1, n_len):
-				span = numbers[j] - page + 1
-				gap = numbers[j] - numbers[j - 1]
+	if not numbers:
+		return b''
+
+	n_len = len(numbers)
+	consecutive, steps, bitset_stop, bitset_bound = _scan_numbers_2d(numbers)
+
+	data = bytearray()
+	data.extend(encode_varint(numbers[0]))
+	prev_page = numbers[0]
+
+	i = 1
+	while i < n_len:
+		page = numbers[i]
+		from_prev = page - prev_page
+
+		# 1. Try 2D Grid Pattern First
+		grid = _find_grid_pattern(numbers, i, consecutive)
+		if grid:
+			block_length, stride, block_count = grid
+
+			raw_cost = (block_length - 1) * block_count + (block_count - 1) * varint_size(stride - block_length)
+			comp_cost = 2 + varint_size(from_prev) + varint_size(block_length) + varint_size(stride) + varint_size(block_count)
+
+			if comp_cost < raw_cost:
+				data.extend(b'\x00\x03')
+				data.extend(encode_varint(from_prev))
+				data.extend(encode_varint(block_length))
+				data.extend(encode_varint(stride))
+				data.extend(encode_varint(block_count))
 
-				if gap > 16:
-					break  # If gap is too big, bitset becomes wasteful
+				i += block_length * block_count
+				prev_page = numbers[i - 1]
+				continue
+
+		# 2. Fallback to 1D Patterns (Ranges and Steps)
+		if i + 1 < n_len:
+			step = numbers[i + 1] - page
+			length = steps[i + 1] + 1
+
+			step_cost = varint_size(step)
+			raw_cost = (length - 1) * step_cost
+
+			if step == 1 and (2 + varint_size(length) < raw_cost):
+				data.extend(b'\x00\x01')
+				data.extend(encode_varint(from_prev))
+				data.extend(encode_varint(length))
+				i += length
+				prev_page = numbers[i - 1]
+				continue
+			elif step > 1 and (2 + step_cost + varint_size(length) < raw_cost):
+				data.extend(b'\x00\x02')
+				data.extend(encode_varint(step))
+				data.extend(encode_varint(from_prev))
+				data.extend(encode_varint(length))
+				i += length
+				prev_page = numbers[i - 1]
+				continue
 
-				varint_cost_sum += len(encode_varint(gap))
-				bitset_payload_size = (span + 7) // 8
-				bitset_comp_cost = 2 + len(encode_varint(from_prev)) + len(encode_varint(span)) + bitset_payload_size
+		# 3. Try Bitset Block
+		# Gaps in scan are <= 16 (1 byte varints), so savings(j) = (j - i) - 2 - varint_size(span) - ceil(span / 8) <= (8j - numbers[j] - (8i - page) - 25) / 8,
+		# scan stops once no further j can beat best savings
+		best_j = -1
+		best_savings = 0
+		base = 8 * i - page + 25
+		bound = bitset_bound[i]
+
+		if bound - base > 0:
+			varint_cost_sum = varint_size(from_prev)
+			from_prev_size = varint_cost_sum
+
+			for j in range(i + 1, bitset_stop[i]):
+				span = numbers[j] - page + 1
+				varint_cost_sum += 1
+				bitset_comp_cost = 2 + from_prev_size + varint_size(span) + (span + 7) // 8
 
 				savings = varint_cost_sum - bitset_comp_cost
 				if savings > best_savings:
 					best_savings = savings
 					best_j = j
 
-			if best_savings > 0:
-				span = numbers[best_j] - page + 1
-				data.extend(b'\x00\x04')
-				data.extend(encode_varint(from_prev))
-				data.extend(encode_varint(span))
+				if bitset_bound[j] - base <= 8 * best_savings:
+					break
+
+		if best_savings > 0:
+			span = numbers[best_j] - page + 1
+			data.extend(b'\x00\x04')
+			data.extend(encode_varint(from_prev))
+			data.extend(encode_varint(span))
 
-				payload_size = (span + 7) // 8
-				payload = bytearray(payload_size)
+			payload_size = (span + 7) // 8
+			payload = bytearray(payload_size)
 
-				for k in range(i, best_j + 1):
-					bit_idx = numbers[k] - page
-					payload[bit_idx // 8] |= (1 << (bit_idx % 8))
+			for k in range(i, best_j + 1):
+				bit_idx = numbers[k] - page
+				payload[bit_idx // 8] |= (1 << (bit_idx % 8))
 
-				data.extend(payload)
-				i = best_j + 1
-				prev_page = numbers[best_j]
-				continue
+			data.extend(payload)
+			i = best_j + 1
+			prev_page = numbers[best_j]
+			continue
+
+		# 4. Default: Raw Varint Delta
+		data.extend(encode_varint(from_prev))
+		prev_page = page
+		i += 1
+
+	return bytes(data)
+
+def _encode_numbers_2d_optimal(numbers: list[int], bitset_lookahead: int = 32) -> bytes:
+	"""
+	`compress_images_2d(optimize = True)` page list encoder, same format as `_encode_numbers_2d()`
+
+	Backward DP, cost[i] - smallest size of numbers[i:] over candidate segments starting at i:
+	raw varint delta, 1D range / step range (whole run or run without last page), 2D grid (all blocks or one less),
+	bitset ending at each of next `bitset_lookahead` pages and at the end of gap <= 16 window.
+	Greedy encoding is returned instead if it's not larger
+	"""
+
+	greedy = _encode_numbers_2d(numbers)
+	if len(numbers) < 3:
+		return greedy
+
+	encode_varint = _encode_varint
+	varint_size = _varint_size
+
+	n_len = len(numbers)
+	consecutive, steps, bitset_stop, _ = _scan_numbers_2d(numbers)
+
+	cost = [0] * (n_len + 1)
+	# choice[i]: None - raw delta, (1, length), (2, step, length), (3, block_length, stride, blocks), (4, end index)
+	choice = [None] * n_len
+
+	for i in range(n_len - 1, 0, -1):
+		page = numbers[i]
+		from_prev_size = varint_size(page - numbers[i - 1])
+
+		best = from_prev_size + cost[i + 1]
+		best_choice = None
+
+		grid = _find_grid_pattern(numbers, i, consecutive)
+		if grid:
+			block_length, stride, block_count = grid
+			head = 2 + from_prev_size + varint_size(block_length) + varint_size(stride)
+
+			for blocks in range(block_count, max(block_count - 2, 1), -1):
+				total = head + varint_size(blocks) + cost[i + block_length * blocks]
+				if total < best:
+					best, best_choice = total, (3, block_length, stride, blocks)
 
-			# 4. Default: Raw Varint Delta
+		if i + 1 < n_len:
+			step = numbers[i + 1] - page
+			run = steps[i + 1] + 1
+
+			if step:
+				head = 2 + from_prev_size + (varint_size(step) if step > 1 else 0)
+
+				for length in range(run, max(run - 2, 1), -1):
+					total = head + varint_size(length) + cost[i + length]
+					if total < best:
+						best, best_choice = total, (1, length) if step == 1 else (2, step, length)
+
+		stop = bitset_stop[i]
+		if stop > i + 1:
+			head = 2 + from_prev_size
+			last = min(stop, i + 1 + bitset_lookahead)
+
+			for j in range(i + 1, last):
+				span = numbers[j] - page + 1
+				total = head + varint_size(span) + (span + 7) // 8 + cost[j + 1]
+				if total < best:
+					best, best_choice = total, (4, j)
+
+			if last < stop:
+				span = numbers[stop - 1] - page + 1
+				total = head + varint_size(span) + (span + 7) // 8 + cost[stop]
+				if total < best:
+					best, best_choice = total, (4, stop - 1)
+
+		cost[i] = best
+		choice[i] = best_choice
+
+	if len(greedy) <= varint_size(numbers[0]) + cost[1]:
+		return greedy
+
+	data = bytearray()
+	data.extend(encode_varint(numbers[0]))
+
+	i = 1
+	while i < n_len:
+		page = numbers[i]
+		from_prev = page - numbers[i - 1]
+		token = choice[i]
+
+		if token is None:
 			data.extend(encode_varint(from_prev))
-			prev_page = page
 			i += 1
 
-		return bytes(data)
+		elif token[0] == 1:
+			data.extend(b'\x00\x01')
+			data.extend(encode_varint(from_prev))
+			data.extend(encode_varint(token[1]))
+			i += token[1]
+
+		elif token[0] == 2:
+			_, step, length = token
+			data.extend(b'\x00\x02')
+			data.extend(encode_varint(step))
+			data.extend(encode_varint(from_prev))
+			data.extend(encode_varint(length))
+			i += length
+
+		elif token[0] == 3:
+			_, block_length, stride, blocks = token
+			data.extend(b'\x00\x03')
+			data.extend(encode_varint(from_prev))
+			data.extend(encode_varint(block_length))
+			data.extend(encode_varint(stride))
+			data.extend(encode_varint(blocks))
+			i += block_length * blocks
+
+		else:
+			end = token[1]
+			span = numbers[end] - page + 1
+			data.extend(b'\x00\x04')
+			data.extend(encode_varint(from_prev))
+			data.extend(encode_varint(span))
+
+			payload = bytearray((span + 7) // 8)
+			for k in range(i, end + 1):
+				bit_idx = numbers[k] - page
+				payload[bit_idx // 8] |= (1 << (bit_idx % 8))
+
+			data.extend(payload)
+			i = end + 1
+
+	return bytes(data)
+
+def _decode_numbers_2d(data: bytes, index: int, LENGTH: int) -> tuple[list[int], int]:
+	"""`decompress_images_2d()` page list decoder, reads `data` from `index` till separator or `LENGTH`, returns (numbers, end index)"""
+
+	def read_varint() -> int:
+		nonlocal index
+		result = 0
+		shift = 0
+		while True:
+			byte = data[index]
+			index += 1
+			result |= (byte & 0x7F) << shift
+			if not (byte & 0x80):
+				break
+			shift += 7
+		return result
+
+	numbers = []
+
+	if index < LENGTH and data[index] != 0x00:
+		val = read_varint()
+		numbers.append(val)
+		prev_page = val
+	else:
+		return [], index
+
+	while index < LENGTH:
+		if data[index] == 0x00:
+			if index + 1 == LENGTH:
+				break
+
+			next_byte = data[index + 1]
+			if next_byte == 0x01:  # 1D Range
+				index += 2
+				from_prev = read_varint()
+				length = read_varint()
+				start = prev_page + from_prev
+				numbers.extend(range(start, start + length))
+				prev_page = numbers[-1]
+
+			elif next_byte == 0x02:  # 1D Step Range
+				index += 2
+				step = read_varint()
+				from_prev = read_varint()
+				length = read_varint()
+				start = prev_page + from_prev
+				numbers.extend(range(start, start + step * length, step))
+				prev_page = numbers[-1]
+
+			elif next_byte == 0x03:  # 2D Grid Block
+				index += 2
+				from_prev = read_varint()
+				block_length = read_varint()
+				stride = read_varint()
+				blocks = read_varint()
+
+				start = prev_page + from_prev
+				for b in range(blocks):
+					block_start = start + b * stride
+					numbers.extend(range(block_start, block_start + block_length))
+				prev_page = numbers[-1]
+
+			elif next_byte == 0x04:  # NEW: Bitset Block
+				index += 2
+				from_prev = read_varint()
+				span = read_varint()
+				start = prev_page + from_prev
+				bytes_to_read = (span + 7) // 8
+
+				for b in range(bytes_to_read):
+					byte_val = data[index]
+					index += 1
+					for bit in range(8):
+						bit_idx = b * 8 + bit
+						if bit_idx >= span:
+							break
+						if byte_val & (1 << bit):
+							val = start + bit_idx
+							numbers.append(val)
+							prev_page = val
+
+			else:
+				break  # Ext Separator
+
+		else:
+			from_prev = read_varint()
+			prev_page += from_prev
+			numbers.append(prev_page)
+
+	return numbers, index
 
+def compress_images_2d(images: dict[str, Iterable[int]], page_amount: int = None, repetitive: bool = False, optimize: bool = False) -> bytes:
+	"""
+	optimize: pick smallest encoding of every page list by DP over candidate segments instead of greedy pass,
+		same format, several times slower
+	"""
+
+	encode_numbers = _encode_numbers_2d_optimal if optimize else _encode_numbers_2d
 	images = {ext: sorted(list(nums)) for ext, nums in images.items()}
 	default_ext = max(images, key=lambda ext: len(images[ext]))
 	page_amount = page_amount or max((nums[-1] for nums in images.values() if nums), default=0)
 
 	data = bytearray()
 	data.extend(default_ext.encode('utf-8') + b'\x00')
-	data.extend(encode_varint(page_amount))
+	data.extend(_encode_varint(page_amount))
 
 	if repetitive:
 		default_pages = set(images[default_ext])
@@ -2661,14 +6299,14 @@ def compress_images_2d(images: dict[str, Iterable[int]], page_amount: int = None
 		rep_pages = sorted(list(default_pages.intersection(other_pages)))
 		if rep_pages:
 			data.append(0xFF)
-			data.extend(encode_numbers_2d(rep_pages))
+			data.extend(encode_numbers(rep_pages))
 
 	for ext, num_list in images.items():
 		if ext == default_ext:
 			continue
 		data.append(0x00)
 		data.extend(ext.encode('utf-8') + b'\x00')
-		data.extend(encode_numbers_2d(num_list))
+		data.extend(encode_numbers(num_list))
 
 	return bytes(data)
 
@@ -2697,82 +6335,6 @@ def decompress_images_2d(data: bytes) -> dict[str, list[int]]:
 			shift += 7
 		return result
 
-	def decode_numbers_2d() -> list[int]:
-		nonlocal index
-		numbers = []
-
-		if index < LENGTH and data[index] != 0x00:
-			val = read_varint()
-			numbers.append(val)
-			prev_page = val
-		else:
-			return []
-
-		while index < LENGTH:
-			if data[index] == 0x00:
-				if index + 1 == LENGTH:
-					break
-
-				next_byte = data[index + 1]
-				if next_byte == 0x01:  # 1D Range
-					index += 2
-					from_prev = read_varint()
-					length = read_varint()
-					start = prev_page + from_prev
-					numbers.extend(range(start, start + length))
-					prev_page = numbers[-1]
-
-				elif next_byte == 0x02:  # 1D Step Range
-					index += 2
-					step = read_varint()
-					from_prev = read_varint()
-					length = read_varint()
-					start = prev_page + from_prev
-					numbers.extend(range(start, start + step * length, step))
-					prev_page = numbers[-1]
-
-				elif next_byte == 0x03:  # 2D Grid Block
-					index += 2
-					from_prev = read_varint()
-					block_length = read_varint()
-					stride = read_varint()
-					blocks = read_varint()
-
-					start = prev_page + from_prev
-					for b in range(blocks):
-						block_start = start + b * stride
-						numbers.extend(range(block_start, block_start + block_length))
-					prev_page = numbers[-1]
-
-				elif next_byte == 0x04:  # NEW: Bitset Block
-					index += 2
-					from_prev = read_varint()
-					span = read_varint()
-					start = prev_page + from_prev
-					bytes_to_read = (span + 7) // 8
-
-					for b in range(bytes_to_read):
-						byte_val = data[index]
-						index += 1
-						for bit in range(8):
-							bit_idx = b * 8 + bit
-							if bit_idx >= span:
-								break
-							if byte_val & (1 << bit):
-								val = start + bit_idx
-								numbers.append(val)
-								prev_page = val
-
-				else:
-					break  # Ext Separator
-
-			else:
-				from_prev = read_varint()
-				prev_page += from_prev
-				numbers.append(prev_page)
-
-		return numbers
-
 	default_ext = read_string()
 	page_amount = read_varint()
 
@@ -2785,7 +6347,7 @@ def decompress_images_2d(data: bytes) -> dict[str, list[int]]:
 	images = {}
 
 	if repetitive:
-		rep_pages = decode_numbers_2d()
+		rep_pages, index = _decode_numbers_2d(data, index, LENGTH)
 		added_pages.update(rep_pages)
 		images[default_ext] = rep_pages
 
@@ -2793,7 +6355,7 @@ def decompress_images_2d(data: bytes) -> dict[str, list[int]]:
 		if data[index] == 0x00:
 			index += 1
 		ext = read_string()
-		nums = decode_numbers_2d()
+		nums, index = _decode_numbers_2d(data, index, LENGTH)
 		images[ext] = nums
 		added_pages.update(nums)
 
@@ -2805,6 +6367,169 @@ def decompress_images_2d(data: bytes) -> dict[str, list[int]]:
 
 	return images
 
+def _read_varint(data: bytes, index: int) -> tuple[int, int]:
+	"""Returns (varint, index after it)"""
+
+	result = 0
+	shift = 0
+	while True:
+		byte = data[index]
+		index += 1
+		result |= (byte & 0x7F) << shift
+		if not (byte & 0x80):
+			return result, index
+		shift += 7
+
+images_batch_magic = b'SPIB\x01'
+
+def compress_images_2d_batch(
+	galleries: Iterable[dict[str, Iterable[int]]],
+	page_amounts: Optional[Iterable[Optional[int]]] = None,
+	repetitive: bool = False,
+	optimize: bool = False
+) -> bytes:
+	"""
+	Encodes many galleries (same page list encoding as `compress_images_2d()`) into single blob:
+	extension names are written once into shared table and referenced by id, galleries are located by fixed-width
+	offset index, so `decompress_images_2d_batch(data, index)` decodes single gallery without parsing the rest
+
+	STRUCTURE (numbers are varints, offsets - big endian `offset width` bytes):
+	(magic) (ext count) [ (ext name) \x00 ] (gallery count) (offset width) [ (gallery end offset) ] [ (gallery) ]
+	gallery: (default ext id) (page amount) (repetitive pages length) | (repetitive pages) |
+		(ext count) [ (ext id) (pages length) (pages) ]
+
+	optimize: see `compress_images_2d()`
+	"""
+
+	encode_numbers = _encode_numbers_2d_optimal if optimize else _encode_numbers_2d
+	ext_ids: dict[str, int] = {}
+	records = []
+	page_amounts = iter(page_amounts) if page_amounts is not None else None
+
+	for images in galleries:
+		page_amount = next(page_amounts, None) if page_amounts is not None else None
+
+		images = {ext: sorted(nums) for ext, nums in images.items()}
+		default_ext = max(images, key = lambda ext: len(images[ext]))
+		page_amount = page_amount or max((nums[-1] for nums in images.values() if nums), default = 0)
+
+		record = bytearray(_encode_varint(ext_ids.setdefault(default_ext, len(ext_ids))))
+		record.extend(_encode_varint(page_amount))
+
+		rep_stream = b''
+		if repetitive:
+			default_pages = set(images[default_ext])
+			other_pages = set(p for ext, pages in images.items() if ext != default_ext for p in pages)
+			rep_stream = encode_numbers(sorted(default_pages.intersection(other_pages)))
+
+		record.extend(_encode_varint(len(rep_stream)))
+		record.extend(rep_stream)
+
+		record.extend(_encode_varint(len(images) - 1))
+		for ext, num_list in images.items():
+			if ext == default_ext:
+				continue
+
+			stream = encode_numbers(num_list)
+			record.extend(_encode_varint(ext_ids.setdefault(ext, len(ext_ids))))
+			record.extend(_encode_varint(len(stream)))
+			record.extend(stream)
+
+		records.append(record)
+
+	data = bytearray(images_batch_magic)
+	data.extend(_encode_varint(len(ext_ids)))
+
+	for ext in ext_ids:
+		data.extend(ext.encode('utf-8') + b'\x00')
+
+	total = sum(len(record) for record in records)
+	width = max((total.bit_length() + 7) // 8, 1)
+
+	data.extend(_encode_varint(len(records)))
+	data.append(width)
+
+	end = 0
+	for record in records:
+		end += len(record)
+		data.extend(end.to_bytes(width, 'big'))
+
+	for record in records:
+		data.extend(record)
+
+	return bytes(data)
+
+def decompress_images_2d_batch(
+	data: bytes,
+	indices: Optional[Union[int, Iterable[int]]] = None
+) -> Union[list[dict[str, list[int]]], dict[str, list[int]]]:
+	"""
+	Decodes `compress_images_2d_batch()` blob:
+	indices None - all galleries (list)
+	indices int - single gallery (dict), only its bytes are parsed
+	indices iterable - these galleries (list)
+	"""
+
+	if data[:len(images_batch_magic)] != images_batch_magic:
+		raise ValueError('Not an images batch')
+
+	index = len(images_batch_magic)
+	ext_count, index = _read_varint(data, index)
+	exts = []
+
+	for _ in range(ext_count):
+		end = data.index(b'\x00', index)
+		exts.append(data[index:end].decode('utf-8'))
+		index = end + 1
+
+	count, index = _read_varint(data, index)
+	width = data[index]
+	offsets_start = index + 1
+	records_start = offsets_start + count * width
+
+	def record_end(k: int) -> int:
+		offset = offsets_start + k * width
+		return records_start + int.from_bytes(data[offset:offset + width], 'big')
+
+	def decode(k: int) -> dict[str, list[int]]:
+		if not -count <= k < count:
+			raise IndexError(f'Gallery index out of range: {k}')
+
+		k %= count
+		index = record_end(k - 1) if k else records_start
+
+		default_id, index = _read_varint(data, index)
+		page_amount, index = _read_varint(data, index)
+		default_ext = exts[default_id]
+
+		added_pages = set()
+		images = {}
+
+		length, index = _read_varint(data, index)
+		if length:
+			images[default_ext], index = _decode_numbers_2d(data, index, index + length)
+			added_pages.update(images[default_ext])
+
+		ext_count, index = _read_varint(data, index)
+		for _ in range(ext_count):
+			ext_id, index = _read_varint(data, index)
+			length, index = _read_varint(data, index)
+
+			numbers, index = _decode_numbers_2d(data, index, index + length)
+			images[exts[ext_id]] = numbers
+			added_pages.update(numbers)
+
+		images.setdefault(default_ext, [])
+		images[default_ext].extend(set(range(1, page_amount + 1)) - added_pages)
+		images[default_ext].sort()
+
+		return images
+
+	if isinstance(indices, int):
+		return decode(indices)
+
+	return [decode(k) for k in (range(count) if indices is None else indices)]
+
 def dummy_sync(*args, **kwargs): pass
 async def dummy_async(*args, **kwargs): pass
 async def empty_aiter(): yield
@@ -3,6 +3,7 @@ import asyncio
 import aiohttp
 import random
 import os
+import io
 import shutil
 
 from src.sputchedtools import *
@@ -33,6 +34,383 @@ async def test_aio(**kwargs):
 	literals = ', '.join(f"'{attr}'" for attr in attrs)
 	print(f'ReturnTypes = Literal[{literals}]')
 
+async def serve(handler):
+	from aiohttp import web
+
+	app = web.Application()
+	app.router.add_route('*', '/{tail:.*}', handler)
+	runner = web.AppRunner(app)
+	await runner.setup()
+	site = web.TCPSite(runner, '127.0.0.1', 0)
+	await site.start()
+
+	return runner, f"http://127.0.0.1:{runner.addresses[0][1]}/"
+
+@pytest.mark.asyncio
+async def test_aio_pool():
+	from aiohttp import web
+
+	async def handler(request):
+		return web.Response(text = str(request.transport.get_extra_info('peername')[1]))
+
+	runner, url = await serve(handler)
+
+	try:
+		# Same client port - same keep-alive connection
+		assert len({await aio.get(url) for _ in range(5)}) == 1
+		assert len({await aio.get(url, pool = False) for _ in range(2)}) == 2
+
+		ses = await aio.session(url)
+		assert ses is await aio.session(url + 'other')
+
+		await aio.close_sessions()
+		assert ses.closed
+		assert await aio.session(url) is not ses
+
+	finally:
+		await aio.close_sessions()
+		await runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_aio_pool_cookies():
+	from aiohttp import web
+
+	async def handler(request):
+		response = web.Response(text = request.headers.get('Cookie', ''))
+		if request.path == '/set':
+			response.set_cookie('token', 'secret')
+		return response
+
+	runner, url = await serve(handler)
+	url = url.replace('127.0.0.1', 'localhost') # aiohttp jar ignores cookies of IP hosts
+	backends = [{}]
+
+	try:
+		import httpx, h2
+		backends.append({'httpx': True})
+	except ImportError:
+		pass
+
+	try:
+		for backend in backends:
+			# Shared pooled session must not leak cookies between callers
+			assert await aio.get(url + 'set', **backend) == ''
+			assert await aio.get(url + 'echo', **backend) == ''
+			assert await aio.get(url + 'echo', cookies = {'own': '1'}, **backend) == 'own=1'
+
+	finally:
+		await aio.close_sessions()
+		await runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_fetch_many():
+	from aiohttp import web
+
+	active, peak = {}, {}
+
+	async def handler(request):
+		host = request.host
+		active[host] = active.get(host, 0) + 1
+		peak[host] = max(peak.get(host, 0), active[host])
+		peak['total'] = max(peak.get('total', 0), sum(active.values()))
+		await asyncio.sleep(0.02)
+		active[host] -= 1
+
+		if request.path == '/missing':
+			return web.Response(status = 404)
+		return web.Response(text = request.path)
+
+	runner, url = await serve(handler)
+	other = url.replace('127.0.0.1', 'localhost')
+	urls = [f'{url}{i}' for i in range(30)] + [f'{other}{i}' for i in range(10)] + [url + 'missing']
+	stats = FetchStats()
+
+	try:
+		results = [result async for result in aio.fetch_many(
+			urls, concurrency = 6, per_host = 4, stats = stats,
+			filter = lambda r: r.status == 200
+		)]
+
+		assert sorted(result.index for result in results) == list(range(len(urls)))
+		assert all(result.result == '/' + result.url.rsplit('/', 1)[1] for result in results if result.ok)
+		assert [result.url for result in results if not result.ok] == [url + 'missing']
+		assert stats.requests == len(urls) and stats.failed == 1 and stats.requests_per_sec > 0
+
+		assert peak['total'] == 6
+		assert max(value for host, value in peak.items() if host != 'total') == 4
+
+		# Early exit cancels the rest
+		async for result in aio.fetch_many(urls, concurrency = 4):
+			break
+
+	finally:
+		await aio.close_sessions()
+		await runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_fuckoff():
+	from aiohttp import web
+	import time
+
+	state = {'hits': 0, 'fail': 3, 'retry_after': None}
+
+	async def handler(request):
+		state['hits'] += 1
+		if state['hits'] <= state['fail']:
+			headers = {'Retry-After': state['retry_after']} if state['retry_after'] else {}
+			return web.Response(status = 503, headers = headers)
+		return web.Response(text = 'ok')
+
+	runner, url = await serve(handler)
+
+	try:
+		for backoff in ('fixed', 'exponential', 'decorrelated'):
+			state.update(hits = 0, fail = 3)
+			assert await aio.fuckoff('GET', url, interval = 0.01, backoff = backoff) == 'ok'
+			assert state['hits'] == 4
+
+		state.update(hits = 0, fail = 1, retry_after = '0.3')
+		start = time.perf_counter()
+		assert await aio.fuckoff('GET', url, interval = 0.001) == 'ok'
+		assert time.perf_counter() - start >= 0.3
+
+		# Retry-After is capped by max_interval unless cap is given explicitly
+		state.update(hits = 0, fail = 1, retry_after = '3600')
+		start = time.perf_counter()
+		assert await aio.fuckoff('GET', url, interval = 0.001, max_interval = 0.1) == 'ok'
+		assert time.perf_counter() - start < 1
+
+		state.update(hits = 0, fail = 1)
+		assert await aio.fuckoff('GET', url, interval = 0.001, retry_after = float('inf'), deadline = 0.5) is None
+
+		state.update(hits = 0, fail = 10 ** 6, retry_after = None)
+		start = time.perf_counter()
+		assert await aio.fuckoff('GET', url, interval = 0.05, deadline = 0.3) is None
+		assert time.perf_counter() - start < 0.3
+
+		# Opens after 2 failures, doesn't send requests while open
+		breaker = CircuitBreaker(threshold = 2, reset_timeout = 0.3)
+		state.update(hits = 0)
+		assert await aio.fuckoff('GET', url, interval = 0.01, deadline = 0.2, breaker = breaker) is None
+		assert state['hits'] == 2 and breaker.state(url[:-1]) == 'open'
+
+		state.update(hits = 0, fail = 0)
+		assert await aio.fuckoff('GET', url, interval = 0.01, breaker = breaker) == 'ok'
+		assert state['hits'] == 1 and breaker.state(url[:-1]) == 'closed'
+
+		# Filter bugs aren't host failures
+		breaker = CircuitBreaker(threshold = 1)
+		with pytest.raises(ZeroDivisionError):
+			await aio.fuckoff('GET', url, filter = lambda response: 1 / 0, breaker = breaker)
+		assert breaker.state(url[:-1]) == 'closed'
+
+		# Shared default breaker sheds load of failing host
+		assert isinstance(aio.breaker, CircuitBreaker)
+		aio.breaker.success(url[:-1]) # Opened by deadline check above
+		state.update(hits = 0, fail = 10 ** 6)
+		assert await aio.fuckoff('GET', url, interval = 0.001, deadline = 0.5) is None
+		assert state['hits'] == aio.breaker.threshold and aio.breaker.state(url[:-1]) == 'open'
+		aio.breaker.success(url[:-1])
+
+	finally:
+		await aio.close_sessions()
+		await runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_download(tmp_path):
+	from aiohttp import web
+
+	data = random.Random(0).randbytes(300_000)
+	(tmp_path / 'data.bin').write_bytes(data)
+	(tmp_path / 'data.gz').write_bytes(compress(data[:100_000], 'gzip', output = False) + compress(data[100_000:], 'gzip', output = False))
+	(tmp_path / 'half.gz').write_bytes(compress(data, 'gzip', output = False)[:150_000])
+	(tmp_path / 'empty').write_bytes(b'')
+	ranges, encodings = [], []
+
+	async def handler(request):
+		ranges.append(request.headers.get('Range'))
+		encodings.append(request.headers.get('Accept-Encoding'))
+		name = request.path.strip('/')
+
+		if name == 'norange':
+			return web.Response(body = data)
+
+		if not (tmp_path / name).exists():
+			return web.Response(status = 404)
+		return web.FileResponse(tmp_path / name)
+
+	runner, url = await serve(handler)
+	path = str(tmp_path / 'out.bin')
+
+	try:
+		chunks = [chunk async for chunk in aio.stream(url + 'data.bin', chunk_size = 1 << 14)]
+		assert b''.join(chunks) == data and max(map(len, chunks)) <= 1 << 14
+
+		assert await aio.download(url + 'data.bin', path) == path
+		assert open(path, 'rb').read() == data
+
+		# Resume from .part
+		open(path + '.part', 'wb').write(data[:123_456])
+		ranges.clear()
+		encodings.clear()
+		await aio.download(url + 'data.bin', path)
+		assert ranges == ['bytes=123456-'] and open(path, 'rb').read() == data
+		# Range offset is in identity body, transfer-compressed response would be resumed at wrong byte
+		assert encodings == ['identity']
+		assert not os.path.exists(path + '.part')
+
+		# Already complete .part, server answers 416
+		open(path + '.part', 'wb').write(data)
+		await aio.download(url + 'data.bin', path)
+		assert open(path, 'rb').read() == data
+
+		# Server ignores Range - starts over
+		open(path + '.part', 'wb').write(b'garbage')
+		await aio.download(url + 'norange', path)
+		assert open(path, 'rb').read() == data
+
+		# Concatenated gzip members, decompressed on the fly
+		await aio.download(url + 'data.gz', path, decompress = True)
+		assert open(path, 'rb').read() == data
+		assert b''.join([chunk async for chunk in aio.stream(url + 'data.gz', decompress = 'gzip')]) == data
+
+		# Truncated compressed body isn't accepted as complete download
+		with pytest.raises(EOFError):
+			await aio.download(url + 'half.gz', str(tmp_path / 'half.bin'), decompress = True)
+		assert not os.path.exists(tmp_path / 'half.bin')
+
+		assert [chunk async for chunk in aio.stream(url + 'empty', decompress = True)] == []
+
+		with pytest.raises(Exception):
+			await aio.download(url + 'missing', path)
+
+	finally:
+		await aio.close_sessions()
+		await runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_download_segmented(tmp_path, monkeypatch):
+	from aiohttp import web
+	import hashlib, errno
+
+	data = random.Random(0).randbytes(3_000_000)
+	(tmp_path / 'data.bin').write_bytes(data)
+	requests, dropped = [], set()
+
+	async def handler(request):
+		requests.append((request.method, request.headers.get('Range')))
+		name = request.path.strip('/')
+
+		if name == 'norange':
+			return web.Response(body = data)
+
+		if name == 'weak':
+			return web.Response(body = data, headers = {'Accept-Ranges': 'bytes', 'ETag': 'W/"1"'})
+
+		if name == 'flaky' and request.method == 'GET':
+			start, end = map(int, request.headers['Range'][6:].split('-'))
+
+			# Half of segment, then connection is dropped
+			if end not in dropped:
+				dropped.add(end)
+				response = web.StreamResponse(status = 206, headers = {'Content-Range': f'bytes {start}-{end}/{len(data)}', 'Content-Length': str(end - start + 1)})
+				await response.prepare(request)
+				await response.write(data[start:(start + end) // 2])
+				request.transport.close()
+				return response
+
+		return web.FileResponse(tmp_path / 'data.bin')
+
+	runner, url = await serve(handler)
+	path = str(tmp_path / 'out.bin')
+	sha256 = hashlib.sha256(data).hexdigest()
+
+	try:
+		bar = ProgressBar(text = 'Downloading...')
+		await aio.download_segmented(url + 'data.bin', path, segments = 4, min_segment_size = 1 << 18, checksum = sha256, progress = bar)
+		assert open(path, 'rb').read() == data
+		assert bar.completed_tasks == bar.task_amount == len(data)
+		assert requests[0] == ('HEAD', None) and len({rng for method, rng in requests if method == 'GET'}) == 4
+
+		with pytest.raises(ValueError):
+			await aio.download_segmented(url + 'data.bin', str(tmp_path / 'bad.bin'), checksum = '0' * 64)
+		assert not os.path.exists(tmp_path / 'bad.bin') and not os.path.exists(tmp_path / 'bad.bin.part')
+
+		# Dropped segments are resumed from last written byte
+		requests.clear()
+		await aio.download_segmented(url + 'flaky', path, segments = 3, min_segment_size = 1 << 18)
+		assert open(path, 'rb').read() == data
+		assert len(requests) == 7 and len({rng for method, rng in requests if method == 'GET'}) == 6
+
+		# No Accept-Ranges - single stream
+		requests.clear()
+		await aio.download_segmented(url + 'norange', path, checksum = sha256)
+		assert open(path, 'rb').read() == data
+		assert [method for method, _ in requests] == ['HEAD', 'GET']
+
+		# Weak ETag and no Last-Modified - no usable If-Range validator, single stream
+		requests.clear()
+		await aio.download_segmented(url + 'weak', path, checksum = sha256)
+		assert open(path, 'rb').read() == data
+		assert requests == [('HEAD', None), ('GET', None)]
+
+		if hasattr(os, 'pwrite'):
+			import time
+
+			# Cancelled download waits for in-flight writes before closing file
+			pwrite, errors, slowed = os.pwrite, [], []
+
+			def slow_pwrite(fd, data, offset):
+				inode = os.fstat(fd).st_ino
+
+				# Only first writes are slow, so they're still running after cancellation
+				if not slowed:
+					slowed.append(offset)
+					time.sleep(0.3)
+
+				# Descriptor closed or reused meanwhile
+				try:
+					if os.fstat(fd).st_ino != inode:
+						errors.append(fd)
+				except OSError as e:
+					errors.append(e)
+
+				return pwrite(fd, data, offset)
+
+			monkeypatch.setattr(os, 'pwrite', slow_pwrite)
+			task = asyncio.ensure_future(aio.download_segmented(url + 'data.bin', str(tmp_path / 'cancel.bin'), segments = 4, min_segment_size = 1 << 18, write_size = 1 << 16))
+			await asyncio.sleep(0.1)
+			task.cancel()
+
+			with pytest.raises(asyncio.CancelledError):
+				await task
+
+			await asyncio.sleep(0.4)
+			assert not errors and not os.path.exists(tmp_path / 'cancel.bin.part')
+			monkeypatch.undo()
+
+		# Failed preallocation doesn't leave .part behind
+		if hasattr(os, 'posix_fallocate'):
+			def no_space(*args):
+				raise OSError(errno.ENOSPC, 'No space left on device')
+
+			monkeypatch.setattr(os, 'posix_fallocate', no_space)
+			with pytest.raises(OSError):
+				await aio.download_segmented(url + 'data.bin', str(tmp_path / 'full.bin'))
+			assert not os.path.exists(tmp_path / 'full.bin.part')
+
+	finally:
+		await aio.close_sessions()
+		await runner.cleanup()
+
+def test_aio_pool_shutdown():
+	async def main():
+		return await aio.session('https://example.com/a'), await aio.session('https://example.org/b')
+
+	first, second = asyncio.run(main())
+	assert first is not second
+	assert first.closed and second.closed
+
 def test_num():
 	num.suffixes = ['', 'K', 'M', 'B', 'T', 1000]
 
@@ -68,6 +446,324 @@ def test_compress():
 
 				print(f'{algo}: Compressed {file}: {formatted_size}, {diff:.2f}ms')
 
+def test_compress_stream():
+	data = os.urandom(1024) * 512
+
+	for algo in algorithms:
+		compressed = compress(data, algorithm = algo, output = False, stream = True, chunk_size = 1 << 16)
+		assert decompress(compressed, output = False) == data, f'{algo}: Streamed compression roundtrip failed'
+		assert decompress(compressed * 2, output = False, stream = True, chunk_size = 1 << 12) == data * 2, f'{algo}: Streamed decompression failed'
+
+def test_compress_parallel():
+	data = os.urandom(1024) * 1024
+
+	for algo in algorithms:
+		compressed = compress(data, algorithm = algo, output = False, workers = 4, block_size = 1 << 18)
+		assert decompress(compressed, output = False) == data, f'{algo}: Parallel compression roundtrip failed'
+
+def test_indexed_archive(tmp_path):
+	folder = tmp_path / 'folder'
+	(folder / 'sub').mkdir(parents = True)
+	files = {'a.bin': os.urandom(1 << 16), 'sub/b.txt': b'hello ' * 10000}
+
+	for name, content in files.items():
+		(folder / name).write_bytes(content)
+
+	archive = compress(str(folder), algorithm = 'gzip', indexed = True, output = False, block_size = 1 << 14)
+	assert sorted(member.path for member in list_archive(archive)) == sorted(files)
+	assert decompress(archive, members = ['sub/b.txt'], output = False) == {'sub/b.txt': files['sub/b.txt']}
+
+def test_content_chunks(monkeypatch):
+	import sys
+
+	data = random.Random(0).randbytes(1 << 20)
+	chunks = {avg: list(content_chunks(io.BytesIO(data), avg)) for avg in (256, 1 << 14)}
+
+	for avg, result in chunks.items():
+		assert b''.join(result) == data and all(len(chunk) <= avg * 4 for chunk in result)
+
+	# Boundaries follow content: prefix insertion only changes first chunks
+	shifted = list(content_chunks(io.BytesIO(os.urandom(100) + data), 1 << 14))
+	assert len(set(shifted) & set(chunks[1 << 14])) >= len(chunks[1 << 14]) - 2
+
+	# numpy and pure Python gear hash cut at same positions
+	monkeypatch.setitem(sys.modules, 'numpy', None)
+	for avg, result in chunks.items():
+		assert list(content_chunks(io.BytesIO(data), avg)) == result
+
+def test_incremental_archive(tmp_path):
+	folder = tmp_path / 'folder'
+	folder.mkdir()
+	(folder / 'a.bin').write_bytes(os.urandom(1 << 16))
+	(folder / 'b.txt').write_bytes(b'before')
+	output = str(tmp_path / 'folder.sptx')
+
+	compress(str(folder), algorithm = 'zstd', output = output, incremental = True)
+	(folder / 'b.txt').write_bytes(b'after')
+	compress(str(folder), algorithm = 'zstd', output = output, incremental = True)
+
+	assert os.path.exists(output + '.manifest')
+	assert decompress(output, members = ['a.bin', 'b.txt'], output = False) == {'a.bin': (folder / 'a.bin').read_bytes(), 'b.txt': b'after'}
+
+	# Archive replaced by non-incremental run, stale manifest must not be trusted
+	(folder / 'a.bin').write_bytes(os.urandom(1 << 17))
+	compress(str(folder), algorithm = 'zstd', output = output, indexed = True)
+	compress(str(folder), algorithm = 'zstd', output = output, incremental = True)
+	assert decompress(output, members = ['a.bin', 'b.txt'], output = False) == {'a.bin': (folder / 'a.bin').read_bytes(), 'b.txt': b'after'}
+	assert not os.path.exists(output + '.tmp') and not os.path.exists(output + '.manifest.tmp')
+
+def test_zstd_dictionary(tmp_path, monkeypatch):
+	samples = [f'{{"id": {i}, "name": "user{i}", "active": {str(i % 2 == 0).lower()}}}'.encode() for i in range(2000)]
+	dictionary = train_dictionary(samples, size = 4096)
+
+	for sample in samples[:50]:
+		compressed = compress(sample, algorithm = 'zstd', output = False, dictionary = dictionary)
+		assert decompress(compressed, output = False, dictionary = dictionary) == sample
+
+	# Rewritten dictionary file isn't served from cache (once recheck interval passes)
+	monkeypatch.setattr('src.sputchedtools._zstd_dict_recheck', 0)
+	path = str(tmp_path / 'dict')
+	other = train_dictionary([sample.replace(b'user', b'account') for sample in samples], size = 4096)
+
+	for i, data in enumerate((dictionary, other)):
+		open(path, 'wb').write(data)
+		os.utime(path, ns = (i * 10 ** 9, i * 10 ** 9))
+		assert load_zstd_dictionary(path).dict_id() == load_zstd_dictionary(data).dict_id()
+		assert compress(samples[0], algorithm = 'zstd', output = False, dictionary = path) == compress(samples[0], algorithm = 'zstd', output = False, dictionary = data)
+
+	# Caches are bounded
+	import src.sputchedtools as module
+	for i in range(100):
+		Codec.get('zstd', dictionary = dictionary + bytes([i]))
+		load_zstd_dictionary(dictionary + bytes([i]))
+
+	assert len(Codec._cache) <= Codec.cache_size and len(module._zstd_dicts) <= module._zstd_dicts_size
+
+def test_codec():
+	data = b'{"id": 1, "name": "user"}' * 8
+
+	for algo in algorithms:
+		codec = Codec.get(algo, 1)
+		assert codec is Codec.get(algo, 1), f'{algo}: Codec is not cached'
+		assert codec.decompress(codec.compress(data)) == data
+		assert decompress(codec.compress(data), output = False) == data
+
+def test_auto_algorithm():
+	data = b'Lorem ipsum dolor sit amet ' * 10000
+
+	for target in ('ratio', 'speed', 1.0):
+		algo = select_algorithm(data, target)
+		assert algo in algorithms
+		assert decompress(compress(data, algorithm = 'auto', output = False, target = target), output = False) == data
+
+def test_buffer_content(tmp_path):
+	data = os.urandom(1024) * 256
+	path = tmp_path / 'data.bin'
+	path.write_bytes(data)
+
+	type, content = get_content(str(path), memory_map = True)
+	assert type == 3 and isinstance(content, memoryview) and content == data
+
+	for algo in ('gzip', 'zstd', 'lz4'):
+		for source in (bytearray(data), memoryview(data), content):
+			compressed = compress(source, algorithm = algo, output = False)
+			assert decompress(memoryview(compressed), output = False) == data
+
+		# Opt-in zero-copy file path input
+		(tmp_path / f'data.{algo}').write_bytes(compress(str(path), algorithm = algo, output = False, memory_map = True))
+		assert decompress(str(tmp_path / f'data.{algo}'), output = False, memory_map = True) == data
+
+def test_write_content(tmp_path):
+	data = os.urandom(1 << 20)
+	source, output = tmp_path / 'source.bin', tmp_path / 'output.bin'
+
+	assert write_content(memoryview(data), str(source)) == len(data)
+	assert write_content(str(source), str(output)) == len(data)
+	assert output.read_bytes() == data
+	assert sorted(os.listdir(tmp_path)) == ['output.bin', 'source.bin']
+
+	if os.name != 'nt':
+		# New files get mode of umask in effect at the call, existing keep theirs
+		umask = os.umask(0o077)
+		try:
+			write_content(data, str(tmp_path / 'private.bin'))
+		finally:
+			os.umask(umask)
+
+		assert (tmp_path / 'private.bin').stat().st_mode & 0o777 == 0o600
+		os.remove(tmp_path / 'private.bin')
+
+		output.chmod(0o640)
+		write_content(data, str(output))
+		assert output.stat().st_mode & 0o777 == 0o640
+
+		# Symlink is written through, devices are written directly
+		link = tmp_path / 'link.bin'
+		link.symlink_to(output)
+		assert write_content(b'linked', str(link)) == 6
+		assert link.is_symlink() and output.read_bytes() == b'linked'
+		assert write_content(data, os.devnull) == len(data)
+		os.remove(link)
+		output.write_bytes(data)
+
+		# Writable file in read-only folder (root ignores folder permissions)
+		if os.geteuid():
+			readonly = tmp_path / 'readonly'
+			readonly.mkdir()
+			(readonly / 'file.bin').write_bytes(b'')
+			readonly.chmod(0o555)
+			try:
+				assert write_content(data, str(readonly / 'file.bin')) == len(data)
+			finally:
+				readonly.chmod(0o755)
+
+	with pytest.raises(OSError):
+		write_content(data, str(tmp_path / 'missing' / 'output.bin'))
+
+def test_make_tar_workers(tmp_path):
+	import tarfile
+
+	folder = tmp_path / 'folder'
+	(folder / 'sub' / 'deep').mkdir(parents = True)
+	files = {
+		'a.txt': b'Lorem ipsum ' * 1000,
+		'empty': b'',
+		'sub/big.bin': os.urandom(3 << 20), # Above prefetch_size - streamed by writer
+		'sub/deep/run.sh': b'#!/bin/sh\n',
+		**{f'sub/{i}.bin': os.urandom(i * 100) for i in range(20)}
+	}
+
+	for name, content in files.items():
+		(folder / name).write_bytes(content)
+
+	os.chmod(folder / 'sub' / 'deep' / 'run.sh', 0o755)
+	os.chmod(folder / 'a.txt', 0o600)
+
+	def members(data: bytes) -> dict:
+		with tarfile.open(fileobj = io.BytesIO(data)) as tar:
+			return {
+				member.name: (member.mode, member.size, tar.extractfile(member).read())
+				for member in tar if member.isfile()
+			}
+
+	serial, parallel = TarStats(), TarStats()
+	expected = members(make_tar(str(folder), None, in_memory = True, stats = serial))
+	assert members(make_tar(str(folder), None, in_memory = True, workers = 4, stats = parallel)) == expected
+	assert {name: content for name, (_, _, content) in expected.items()} == files
+	if os.name != 'nt':
+		assert expected['sub/deep/run.sh'][0] == 0o755 and expected['a.txt'][0] == 0o600
+
+	for stats in (serial, parallel):
+		assert stats.files == len(files) and stats.bytes == sum(map(len, files.values()))
+
+def test_compress_zip(tmp_path):
+	import zipfile
+
+	folder = tmp_path / 'folder'
+	(folder / 'sub').mkdir(parents = True)
+	files = {'a.txt': b'Lorem ipsum ' * 1000, 'sub/b.bin': os.urandom(5000), 'sub/empty': b''}
+
+	for name, content in files.items():
+		(folder / name).write_bytes(content)
+
+	for method in ('deflate', 'bzip2', 'store'):
+		data = compress(str(folder), algorithm = 'zip', output = False, zip_method = method, workers = 2)
+
+		with zipfile.ZipFile(io.BytesIO(data)) as zf:
+			assert zf.testzip() is None
+			assert {name: zf.read(name) for name in zf.namelist()} == files
+
+	# Pre-1980 mtimes are clamped, not rejected
+	os.utime(folder / 'a.txt', (0, 0))
+	with zipfile.ZipFile(io.BytesIO(compress(str(folder), algorithm = 'zip', output = False))) as zf:
+		assert zf.read('a.txt') == files['a.txt'] and zf.getinfo('a.txt').date_time[0] == 1980
+
+	# Zip file path with output False returns archive bytes, not a view of mapped file
+	path = tmp_path / 'folder.zip'
+	path.write_bytes(data)
+	for memory_map in (False, True):
+		result = decompress(str(path), output = False, memory_map = memory_map)
+		assert type(result) is bytes and result == data
+
+def test_detect_algorithm(tmp_path):
+	data = b'Lorem ipsum dolor sit amet ' * 1000
+
+	for algo in algorithms + ['brotli']:
+		path = tmp_path / f'data.{algo}'
+		path.write_bytes(compress(data, algorithm = algo, output = False))
+
+		detected = detect_algorithm(str(path))
+		assert detected == ('lzma' if algo == 'lzma2' else algo)
+		assert decompress(str(path), output = False) == data
+
+	assert detect_algorithm(data) is None
+
+def test_decompress_many(tmp_path):
+	sources = []
+
+	for i, algo in enumerate(('zstd', 'lz4', 'gzip')):
+		source = tmp_path / f'file{i}.bin.{algo}'
+		source.write_bytes(compress(bytes([i]) * 100000, algorithm = algo, output = False))
+		sources.append(str(source))
+
+	(tmp_path / 'broken.zst').write_bytes(b'garbage')
+	sources.append(str(tmp_path / 'broken.zst'))
+
+	results = decompress_many(sources, str(tmp_path / 'out'), workers = 2)
+	assert [result.size_out for result in results[:-1]] == [100000] * 3
+	assert results[-1].error
+
+	# Same names from different folders keep relative path instead of overwriting each other
+	for folder in ('x', 'y'):
+		(tmp_path / folder).mkdir()
+		(tmp_path / folder / 'data.gz').write_bytes(compress(folder.encode(), algorithm = 'gzip', output = False))
+
+	results = decompress_many([str(tmp_path / 'x' / 'data.gz'), str(tmp_path / 'y' / 'data.gz')], str(tmp_path / 'dup'))
+	assert [open(result.output, 'rb').read() for result in results] == [b'x', b'y']
+	assert results[0].output == os.path.join(str(tmp_path / 'dup'), 'x', 'data')
+
+	(tmp_path / 'x' / 'data.zst').write_bytes(compress(b'z', algorithm = 'zstd', output = False))
+	with pytest.raises(ValueError):
+		decompress_many([str(tmp_path / 'x' / 'data.gz'), str(tmp_path / 'x' / 'data.zst')], str(tmp_path / 'dup'))
+
+@pytest.mark.asyncio
+async def test_acompress():
+	data = b'Lorem ipsum dolor sit amet ' * 10000
+
+	for algo in ('gzip', 'zstd', 'lz4'):
+		compressed = await acompress(data, algo, output = False, chunk_size = 1 << 16)
+		assert await adecompress(compressed, output = False) == data
+
+@pytest.mark.skipif(os.name == 'nt', reason = 'resource module')
+def test_decompress_stream_memory(tmp_path):
+	import subprocess, sys
+
+	size = 128 << 20
+	script = f"""
+import resource, sys
+from src.sputchedtools import decompress
+
+class Sink:
+	written = 0
+	def write(self, data):
+		self.written += len(data)
+		return len(data)
+
+sink = Sink()
+base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+decompress(sys.argv[1], output = sink, stream = True)
+assert sink.written == {size}
+print((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base) * (1 if sys.platform == 'darwin' else 1024))
+"""
+
+	for algo in ('gzip', 'zstd', 'lz4', 'bzip2'):
+		path = tmp_path / f'zeros.{algo}'
+		path.write_bytes(compress(bytes(size), algo, output = False, compression_level = 1))
+
+		growth = int(subprocess.check_output([sys.executable, '-c', script, str(path)], cwd = os.path.dirname(os.path.abspath(__file__))))
+		# Output of single decompress call is limited, memory doesn't follow decompressed size
+		assert growth < 32 << 20, f'{algo}: peak RSS grew by {growth >> 20} MB'
+
 def test_decompress():
 	files = (_compress_file, compress_folder)
 
@@ -140,6 +836,70 @@ def test_page_comp():
 	assert i2.keys() == di2.keys() and all(i2[k] == di2[k] for k in i2.keys()), f'Decompressed images do not match original images!\nCompressed: {ci2}\nDecompressed: {di2}'
 	print('\nImage compression and decompression test passed\n')
 
+def test_page_comp_batch():
+	galleries = [
+		{'jpg': [1, 2, 3, 7, 8, 9], 'png': [4, 5, 6]},
+		{'webp': list(range(1, 100, 3)), 'jpg': [p for p in range(1, 100) if p % 3 != 1]},
+		{'png': [1]},
+	]
+
+	data = compress_images_2d_batch(galleries)
+	assert decompress_images_2d_batch(data) == galleries
+	assert decompress_images_2d_batch(data, 1) == galleries[1]
+	assert decompress_images_2d_batch(data, [2, 0]) == [galleries[2], galleries[0]]
+
+def test_page_comp_large(monkeypatch):
+	import sys
+
+	rng = random.Random(0)
+	images = {'jpg': [], 'png': [], 'webp': []}
+
+	for page in range(1, 20001):
+		images['jpg' if page % 700 > 40 else rng.choice(('png', 'webp'))].append(page)
+
+	compressed = {repetitive: compress_images(images, repetitive = repetitive) for repetitive in (False, True)}
+
+	for data in compressed.values():
+		assert decompress_images(data) == images
+
+	try:
+		import numpy
+	except ImportError:
+		return
+
+	# numpy path must produce byte-identical output to pure Python one
+	monkeypatch.setitem(sys.modules, 'numpy', None)
+
+	for repetitive, data in compressed.items():
+		assert compress_images(images, repetitive = repetitive) == data
+		assert decompress_images(data) == images
+
+def test_page_comp_2d_large():
+	rng = random.Random(0)
+	images = {'jpg': [], 'png': []}
+
+	# Sparse near-bitset gaps used to make the 2D encoder quadratic
+	for page in range(1, 400001):
+		images['png' if rng.random() < 0.1 else 'jpg'].append(page)
+
+	assert decompress_images_2d(compress_images_2d(images)) == images
+
+def test_page_comp_2d_optimize():
+	rng = random.Random(0)
+
+	for _ in range(50):
+		pages = sorted(rng.sample(range(1, 600), rng.randint(2, 400)))
+		images = {'jpg': [p for p in range(1, 600) if p not in pages], 'png': pages}
+
+		greedy = compress_images_2d(images, 599)
+		optimal = compress_images_2d(images, 599, optimize = True)
+
+		assert len(optimal) <= len(greedy)
+		assert decompress_images_2d(optimal) == images
+
+	galleries = [{'jpg': [1, 2, 3, 5, 8, 9, 10, 11], 'png': [4, 6, 7]}, {'webp': list(range(1, 40, 2)), 'jpg': list(range(2, 40, 2))}]
+	assert decompress_images_2d_batch(compress_images_2d_batch(galleries, optimize = True)) == galleries
+
 if __name__ == '__main__':
 	test_num()
 	test_compress()